@@ -12,10 +12,12 @@ __email__ = "aadish@ohs.stanford.edu"
 
 # Make main functions and classes available at package level
 from .main import main, Cli, Project
+from .precompute import build_time
 
 __all__ = [
     "main",
     "Cli",
     "Project",
+    "build_time",
     "__version__",
 ]
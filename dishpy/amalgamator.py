@@ -4,6 +4,8 @@ import hashlib
 from collections import defaultdict
 from rich.console import Console
 
+from . import optimizer, precompute
+
 
 class Prefixer(ast.NodeTransformer):
     """
@@ -172,21 +174,177 @@ def _get_local_module_map(project_dir, verbose=False):
     return local_module_map
 
 
-def _analyze_project(entry_file, local_module_map, verbose=False):
+def _scan_file(current_file, tree, entry_file, local_module_map, verbose=False):
+    """
+    Collects what a single file declares and imports.
+    Returns a record with the file's declared symbols, the origins of the symbols it
+    imports, its external imports, the local files it pulls in and the module names
+    it looked up without finding them locally.
+    """
+    declared = set()
+    origins = {}
+    external_imports = set()
+    local_files = []
+    unresolved_modules = set()
+
+    # Find declared symbols
+    for i, node in enumerate(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            declared.add(node.name)
+            if verbose:
+                print(
+                    f"DEBUG: Found {type(node).__name__} '{node.name}' in {os.path.basename(current_file)}"
+                )
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    declared.add(target.id)
+                    if verbose:
+                        print(
+                            f"DEBUG: Found variable '{target.id}' in {os.path.basename(current_file)}"
+                        )
+        elif current_file == entry_file and isinstance(node, ast.Expr):
+            # Handle top-level expressions only in the main entry file
+            expr_name = f"__expr_{i}"
+            declared.add(expr_name)
+            if verbose:
+                print(
+                    f"DEBUG: Found top-level expression '{expr_name}' in {os.path.basename(current_file)}"
+                )
+
+    # Find imports and dependencies
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if verbose:
+                    print(
+                        f"DEBUG: Found import '{alias.name}' in {os.path.basename(current_file)}"
+                    )
+                if alias.name == "vex" or alias.name.startswith("vex."):
+                    external_imports.add(ast.unparse(node))
+                elif alias.name in local_module_map:
+                    local_files.append(local_module_map[alias.name])
+                else:
+                    unresolved_modules.add(alias.name)
+                    external_imports.add(ast.unparse(node))
+
+        elif isinstance(node, ast.ImportFrom):
+            module_name = node.module
+            if verbose:
+                print(
+                    f"DEBUG: Found 'from {module_name} import ...' in {os.path.basename(current_file)}"
+                )
+
+            if module_name == "vex" or (module_name and module_name.startswith("vex.")):
+                external_imports.add(ast.unparse(node))
+            else:
+                is_local = module_name in local_module_map
+                origin_file = None
+
+                if is_local:
+                    origin_file = local_module_map[module_name]
+                else:
+                    if module_name:
+                        unresolved_modules.add(module_name)
+                    # Try package-relative imports
+                    current_rel_path = os.path.relpath(
+                        current_file, os.path.dirname(os.path.dirname(current_file))
+                    )
+                    current_module_path = current_rel_path.replace(os.sep, ".").replace(
+                        ".py", ""
+                    )
+                    if current_module_path.endswith(".__init__"):
+                        current_module_path = current_module_path[:-9]
+
+                    package_parts = current_module_path.split(".")
+                    for i in range(len(package_parts)):
+                        package_prefix = ".".join(package_parts[: len(package_parts) - i])
+                        if package_prefix:
+                            potential_module = f"{package_prefix}.{module_name}"
+                            if potential_module in local_module_map:
+                                origin_file = local_module_map[potential_module]
+                                is_local = True
+                                break
+                            unresolved_modules.add(potential_module)
+
+                if is_local and origin_file:
+                    local_files.append(origin_file)
+
+                    for alias in node.names:
+                        if alias.name == "*":
+                            origins["__WILDCARD_FROM__"] = origin_file
+                        else:
+                            origins[alias.name] = (origin_file, alias.name)
+                elif node.level == 0:
+                    external_imports.add(ast.unparse(node))
+
+    return {
+        "declared": declared,
+        "origins": origins,
+        "external_imports": external_imports,
+        "local_files": local_files,
+        "unresolved_modules": unresolved_modules,
+    }
+
+
+def _file_symbol_deps(file_path, tree, entry_file, origins, local_symbols):
+    """Find which symbols each top-level symbol of a file depends on."""
+    file_deps = defaultdict(set)  # symbol name -> set of symbols it depends on
+
+    for i, node in enumerate(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            deps = _find_symbol_dependencies(node, origins, local_symbols, file_path)
+            file_deps[node.name].update(deps)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    # For assignments, we need to look at the value being assigned
+                    if isinstance(node, ast.Assign):
+                        deps = _find_symbol_dependencies(
+                            node.value, origins, local_symbols, file_path
+                        )
+                    elif isinstance(node, ast.AnnAssign) and node.value:
+                        deps = _find_symbol_dependencies(
+                            node.value, origins, local_symbols, file_path
+                        )
+                    else:
+                        deps = _find_symbol_dependencies(
+                            node, origins, local_symbols, file_path
+                        )
+                    file_deps[target.id].update(deps)
+        elif file_path == entry_file and isinstance(node, ast.Expr):
+            # Handle top-level expressions only in the main entry file
+            deps = _find_symbol_dependencies(node, origins, local_symbols, file_path)
+            file_deps[f"__expr_{i}"].update(deps)
+
+    return file_deps
+
+
+def _analyze_project(
+    entry_file, local_module_map, verbose=False, precomputed=None, extra_files=()
+):
     """
     Analyzes the project to understand symbol-level dependencies.
     Returns a dependency graph where each symbol depends on other symbols.
+
+    Files with a record in `precomputed` (see `analyze_package`) are not parsed;
+    their symbols, imports and dependencies are taken from the record instead.
     """
     if verbose:
         print(f"DEBUG: Starting project analysis from entry file: {entry_file}")
+    precomputed = precomputed or {}
 
     symbol_deps = defaultdict(set)  # symbol -> set of symbols it depends on
     declared_symbols = defaultdict(set)  # file -> set of symbols declared in that file
     symbol_to_file = {}  # symbol -> file where it's declared
     symbol_origins = defaultdict(dict)  # file -> {symbol: (origin_file, original_name)}
     external_imports = set()
+    file_trees = {}  # file -> parsed AST, for files that were not precomputed
 
-    files_to_scan = [os.path.abspath(entry_file)]
+    files_to_scan = [os.path.abspath(entry_file)] if entry_file else []
+    files_to_scan.extend(extra_files)
     scanned_files = set()
 
     while files_to_scan:
@@ -195,125 +353,34 @@ def _analyze_project(entry_file, local_module_map, verbose=False):
             continue
         scanned_files.add(current_file)
 
-        if verbose:
-            print(f"DEBUG: Scanning file: {current_file}")
-
-        try:
-            with open(current_file, "r", encoding="utf-8") as f:
-                content = f.read()
-            tree = ast.parse(content, filename=current_file)
-        except Exception as e:
+        if current_file in precomputed:
             if verbose:
-                print(f"DEBUG: Error reading/parsing {current_file}: {e}")
-            continue
-
-        # Find declared symbols
-        for i, node in enumerate(tree.body):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                symbol_name = f"{current_file}::{node.name}"
-                declared_symbols[current_file].add(node.name)
-                symbol_to_file[symbol_name] = current_file
-                if verbose:
-                    print(
-                        f"DEBUG: Found {type(node).__name__} '{node.name}' in {os.path.basename(current_file)}"
-                    )
-            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
-                targets = (
-                    node.targets if isinstance(node, ast.Assign) else [node.target]
-                )
-                for target in targets:
-                    if isinstance(target, ast.Name):
-                        symbol_name = f"{current_file}::{target.id}"
-                        declared_symbols[current_file].add(target.id)
-                        symbol_to_file[symbol_name] = current_file
-                        if verbose:
-                            print(
-                                f"DEBUG: Found variable '{target.id}' in {os.path.basename(current_file)}"
-                            )
-            elif current_file == entry_file and isinstance(node, ast.Expr):
-                # Handle top-level expressions only in the main entry file
-                expr_name = f"__expr_{i}"
-                symbol_name = f"{current_file}::{expr_name}"
-                declared_symbols[current_file].add(expr_name)
-                symbol_to_file[symbol_name] = current_file
-                if verbose:
-                    print(
-                        f"DEBUG: Found top-level expression '{expr_name}' in {os.path.basename(current_file)}"
-                    )
-
-        # Find imports and dependencies
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if verbose:
-                        print(
-                            f"DEBUG: Found import '{alias.name}' in {os.path.basename(current_file)}"
-                        )
-                    if alias.name == "vex" or alias.name.startswith("vex."):
-                        external_imports.add(ast.unparse(node))
-                    elif alias.name in local_module_map:
-                        dep_path = local_module_map[alias.name]
-                        if dep_path not in scanned_files:
-                            files_to_scan.append(dep_path)
-                    else:
-                        external_imports.add(ast.unparse(node))
+                print(f"DEBUG: Using pre-analyzed bundle for: {current_file}")
+            record = precomputed[current_file]
+        else:
+            if verbose:
+                print(f"DEBUG: Scanning file: {current_file}")
 
-            elif isinstance(node, ast.ImportFrom):
-                module_name = node.module
+            try:
+                with open(current_file, "r", encoding="utf-8") as f:
+                    content = f.read()
+                tree = ast.parse(content, filename=current_file)
+            except Exception as e:
                 if verbose:
-                    print(
-                        f"DEBUG: Found 'from {module_name} import ...' in {os.path.basename(current_file)}"
-                    )
-
-                if module_name == "vex" or (
-                    module_name and module_name.startswith("vex.")
-                ):
-                    external_imports.add(ast.unparse(node))
-                else:
-                    is_local = module_name in local_module_map
-                    origin_file = None
-
-                    if is_local:
-                        origin_file = local_module_map[module_name]
-                    else:
-                        # Try package-relative imports
-                        current_rel_path = os.path.relpath(
-                            current_file, os.path.dirname(os.path.dirname(current_file))
-                        )
-                        current_module_path = current_rel_path.replace(
-                            os.sep, "."
-                        ).replace(".py", "")
-                        if current_module_path.endswith(".__init__"):
-                            current_module_path = current_module_path[:-9]
-
-                        package_parts = current_module_path.split(".")
-                        for i in range(len(package_parts)):
-                            package_prefix = ".".join(
-                                package_parts[: len(package_parts) - i]
-                            )
-                            if package_prefix:
-                                potential_module = f"{package_prefix}.{module_name}"
-                                if potential_module in local_module_map:
-                                    origin_file = local_module_map[potential_module]
-                                    is_local = True
-                                    break
-
-                    if is_local and origin_file:
-                        if origin_file not in scanned_files:
-                            files_to_scan.append(origin_file)
-
-                        for alias in node.names:
-                            if alias.name == "*":
-                                symbol_origins[current_file]["__WILDCARD_FROM__"] = (
-                                    origin_file
-                                )
-                            else:
-                                symbol_origins[current_file][alias.name] = (
-                                    origin_file,
-                                    alias.name,
-                                )
-                    elif node.level == 0:
-                        external_imports.add(ast.unparse(node))
+                    print(f"DEBUG: Error reading/parsing {current_file}: {e}")
+                continue
+            file_trees[current_file] = tree
+            record = _scan_file(current_file, tree, entry_file, local_module_map, verbose)
+
+        for symbol in record["declared"]:
+            declared_symbols[current_file].add(symbol)
+            symbol_to_file[f"{current_file}::{symbol}"] = current_file
+        if record["origins"]:
+            symbol_origins[current_file].update(record["origins"])
+        external_imports.update(record["external_imports"])
+        files_to_scan.extend(
+            path for path in record["local_files"] if path not in scanned_files
+        )
 
     # Handle wildcard imports
     for file_path, origins in symbol_origins.items():
@@ -325,65 +392,20 @@ def _analyze_project(entry_file, local_module_map, verbose=False):
 
     # Build symbol-level dependency graph
     for file_path in scanned_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            tree = ast.parse(content, filename=file_path)
-        except Exception:
+        if file_path in precomputed:
+            file_deps = precomputed[file_path]["deps"]
+        elif file_path in file_trees:
+            file_deps = _file_symbol_deps(
+                file_path,
+                file_trees[file_path],
+                entry_file,
+                symbol_origins.get(file_path, {}),
+                declared_symbols.get(file_path, set()),
+            )
+        else:
             continue
-
-        # Find which symbols each declared symbol depends on
-        for i, node in enumerate(tree.body):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                symbol_name = f"{file_path}::{node.name}"
-                deps = _find_symbol_dependencies(
-                    node,
-                    symbol_origins.get(file_path, {}),
-                    declared_symbols.get(file_path, set()),
-                    file_path,
-                )
-                symbol_deps[symbol_name].update(deps)
-            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
-                targets = (
-                    node.targets if isinstance(node, ast.Assign) else [node.target]
-                )
-                for target in targets:
-                    if isinstance(target, ast.Name):
-                        symbol_name = f"{file_path}::{target.id}"
-                        # For assignments, we need to look at the value being assigned
-                        if isinstance(node, ast.Assign):
-                            deps = _find_symbol_dependencies(
-                                node.value,
-                                symbol_origins.get(file_path, {}),
-                                declared_symbols.get(file_path, set()),
-                                file_path,
-                            )
-                        elif isinstance(node, ast.AnnAssign) and node.value:
-                            deps = _find_symbol_dependencies(
-                                node.value,
-                                symbol_origins.get(file_path, {}),
-                                declared_symbols.get(file_path, set()),
-                                file_path,
-                            )
-                        else:
-                            deps = _find_symbol_dependencies(
-                                node,
-                                symbol_origins.get(file_path, {}),
-                                declared_symbols.get(file_path, set()),
-                                file_path,
-                            )
-                        symbol_deps[symbol_name].update(deps)
-            elif file_path == entry_file and isinstance(node, ast.Expr):
-                # Handle top-level expressions only in the main entry file
-                expr_name = f"__expr_{i}"
-                symbol_name = f"{file_path}::{expr_name}"
-                deps = _find_symbol_dependencies(
-                    node,
-                    symbol_origins.get(file_path, {}),
-                    declared_symbols.get(file_path, set()),
-                    file_path,
-                )
-                symbol_deps[symbol_name].update(deps)
+        for symbol, deps in file_deps.items():
+            symbol_deps[f"{file_path}::{symbol}"].update(deps)
 
     return (
         symbol_deps,
@@ -392,6 +414,7 @@ def _analyze_project(entry_file, local_module_map, verbose=False):
         external_imports,
         scanned_files,
         symbol_to_file,
+        file_trees,
     )
 
 
@@ -448,10 +471,238 @@ def _topological_sort_symbols(symbol_deps, symbol_to_file):
     return sorted_symbols
 
 
-def combine_project(main_file, output_file, verbose=False):
+def prefixed_name(relative_path, symbol):
+    """The name a symbol of a non-entry file gets in the combined script."""
+    file_hash = hashlib.md5(relative_path.encode()).hexdigest()[:8]
+    return f"mod_{file_hash}_{symbol}"
+
+
+def combined_name(name, src):
+    """
+    The name a module-level constant has in the combined program: `KP` (or `main.KP`)
+    for one in `src/main.py` and `lib.pid.KP` for one in `src/lib/pid.py`.
+    """
+    module, _, symbol = name.rpartition(".")
+    if module in ("", "main"):
+        return symbol
+    parts = module.split(".")
+    for relative in (os.path.join(*parts) + ".py", os.path.join(*parts, "__init__.py")):
+        if os.path.exists(os.path.join(src, relative)):
+            return prefixed_name(relative, symbol)
+    raise ValueError(f"no module {module} in {src}")
+
+
+def _build_rename_map(declared_symbols, project_dir, main_file_abs):
+    """Map each non-entry file's symbols to names prefixed with a hash of its path."""
+    global_rename_map = defaultdict(dict)
+    for file_path, symbols in declared_symbols.items():
+        relative_path = os.path.relpath(file_path, project_dir)
+        if file_path == main_file_abs:
+            continue
+        for symbol in symbols:
+            global_rename_map[file_path][symbol] = prefixed_name(relative_path, symbol)
+    return global_rename_map
+
+
+def _extract_symbol_code(file_path, tree, transformer, entry_file):
+    """Transform each top-level symbol of a file and return its code by symbol name."""
+    file_code = {}
+    for i, node in enumerate(tree.body):
+        symbol = None
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            symbol = node.name
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    symbol = target.id
+                    break
+        elif file_path == entry_file and isinstance(node, ast.Expr):
+            # Handle top-level expressions only in the main entry file
+            symbol = f"__expr_{i}"
+
+        if symbol:
+            # Transform the node
+            transformed_node = transformer.visit(node)
+            ast.fix_missing_locations(transformed_node)
+            file_code[symbol] = ast.unparse(transformed_node)
+    return file_code
+
+
+def _extract_entry_code(tree, transformer):
+    """
+    Transform every top-level statement of the entry file, in source order.
+    Unlike modules, the entry file is a script: its loops, branches and repeated
+    assignments all have to run exactly as written.
+    """
+    statements = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        transformed_node = transformer.visit(node)
+        ast.fix_missing_locations(transformed_node)
+        statements.append(ast.unparse(transformed_node))
+    return statements
+
+
+BUNDLE_FORMAT = 1
+
+
+def package_content_hash(package_dir):
+    """Hash the name and Python sources of a package directory."""
+    package_dir = os.path.abspath(package_dir)
+    digest = hashlib.sha256(os.path.basename(package_dir).encode())
+    sources = []
+    for root, dirs, files in os.walk(package_dir):
+        for file in files:
+            if file.endswith(".py"):
+                sources.append(os.path.join(root, file))
+    for path in sorted(sources):
+        rel_path = os.path.relpath(path, package_dir).replace(os.sep, "/")
+        digest.update(b"\0" + rel_path.encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def analyze_package(package_dir, verbose=False):
+    """
+    Pre-analyzes a package directory as it will appear once added to `src/` of a
+    project: its symbol table, import graph, symbol dependencies and the prefixed
+    code of every symbol. `combine_project` accepts the result as a bundle and uses
+    it instead of re-parsing the package's files.
+    """
+    package_dir = os.path.abspath(package_dir)
+    project_dir = os.path.dirname(package_dir)
+    local_module_map = {
+        module: path
+        for module, path in _get_local_module_map(project_dir).items()
+        if path.startswith(package_dir + os.sep)
+    }
+    (
+        symbol_deps,
+        declared_symbols,
+        symbol_origins,
+        _,
+        scanned_files,
+        _,
+        file_trees,
+    ) = _analyze_project(
+        None, local_module_map, verbose, extra_files=sorted(local_module_map.values())
+    )
+    global_rename_map = _build_rename_map(declared_symbols, project_dir, None)
+
+    def rel(path):
+        return os.path.relpath(path, project_dir).replace(os.sep, "/")
+
+    files = {}
+    for file_path in sorted(file_trees):
+        record = _scan_file(file_path, file_trees[file_path], None, local_module_map)
+        transformer = Prefixer(
+            file_path, global_rename_map, symbol_origins, declared_symbols
+        )
+        deps = {}
+        for symbol in declared_symbols.get(file_path, set()):
+            deps[symbol] = sorted(
+                f"{rel(dep.rsplit('::', 1)[0])}::{dep.rsplit('::', 1)[1]}"
+                for dep in symbol_deps.get(f"{file_path}::{symbol}", set())
+            )
+        files[rel(file_path)] = {
+            "declared": sorted(declared_symbols.get(file_path, set())),
+            "origins": {
+                name: [rel(origin), original]
+                for name, (origin, original) in symbol_origins.get(file_path, {}).items()
+            },
+            "external_imports": sorted(record["external_imports"]),
+            "local_files": [rel(path) for path in record["local_files"]],
+            "unresolved_modules": sorted(record["unresolved_modules"]),
+            "deps": deps,
+            "code": _extract_symbol_code(
+                file_path, file_trees[file_path], transformer, None
+            ),
+        }
+    return {
+        "format": BUNDLE_FORMAT,
+        "package": os.path.basename(package_dir),
+        "content_hash": package_content_hash(package_dir),
+        "files": files,
+    }
+
+
+def _load_bundles(bundles, project_dir, local_module_map, verbose=False):
+    """
+    Turn bundles from `analyze_package` into per-file records keyed by absolute path.
+    A bundle is skipped if its files are not where it expects them to be, or if a
+    module it could not resolve on its own is local to this project.
+    """
+    precomputed = {}
+    local_files = set(local_module_map.values())
+    for bundle in bundles or []:
+        if bundle.get("format") != BUNDLE_FORMAT:
+            continue
+
+        def absolute(rel_path):
+            return os.path.abspath(os.path.join(project_dir, *rel_path.split("/")))
+
+        records = {}
+        for rel_path, entry in bundle["files"].items():
+            file_path = absolute(rel_path)
+            if file_path not in local_files or any(
+                module in local_module_map for module in entry["unresolved_modules"]
+            ):
+                records = None
+                break
+            records[file_path] = {
+                "declared": set(entry["declared"]),
+                "origins": {
+                    name: (absolute(origin), original)
+                    for name, (origin, original) in entry["origins"].items()
+                },
+                "external_imports": set(entry["external_imports"]),
+                "local_files": [absolute(path) for path in entry["local_files"]],
+                "deps": {
+                    symbol: {
+                        f"{absolute(dep.rsplit('::', 1)[0])}::{dep.rsplit('::', 1)[1]}"
+                        for dep in deps
+                    }
+                    for symbol, deps in entry["deps"].items()
+                },
+                "code": entry["code"],
+            }
+        if records is None:
+            if verbose:
+                print(
+                    f"DEBUG: Bundle for package '{bundle.get('package')}' does not match this project, re-analyzing it"
+                )
+            continue
+        precomputed.update(records)
+    return precomputed
+
+
+def combine_project(
+    main_file, output_file, verbose=False, bundles=None, optimize=True, inline=False, profile=None
+):
     """
     Combines and prefixes a multi-file Python project into a single script,
     ordering symbols by their dependencies rather than grouping by file.
+
+    `bundles` are pre-analyzed packages (see `analyze_package`) whose files are
+    used as-is instead of being parsed and transformed again.
+
+    With `optimize`, the combined script goes through the passes in `optimizer`, which
+    fold constant expressions and replace constants with their values. Leave it off to
+    keep every use of a module-level constant reading it from the module, for example
+    to change it between runs. With `inline` as well, calls to small functions are
+    replaced by what the functions return.
+
+    `profile` maps module-level constants, named like `KP` for one in the entry file or
+    `lib.pid.KP` for one in `lib/pid.py`, to the values to build the program with. With
+    a profile, the optimizer also drops the branches and definitions that can't be
+    reached, with its values or otherwise.
+
+    Returns the code written for each symbol as `(name, code)` in output order, where
+    a name is like `lib/pid.py::PID` and the entry file's statements come last under
+    its own path.
     """
     console = Console()
     try:
@@ -467,7 +718,10 @@ def combine_project(main_file, output_file, verbose=False):
     if verbose:
         print(f"DEBUG: Starting analysis of project at {project_dir}")
     local_module_map = _get_local_module_map(project_dir, verbose)
-    analysis_result = _analyze_project(main_file_abs, local_module_map, verbose)
+    precomputed = _load_bundles(bundles, project_dir, local_module_map, verbose)
+    analysis_result = _analyze_project(
+        main_file_abs, local_module_map, verbose, precomputed
+    )
     (
         symbol_deps,
         declared_symbols,
@@ -475,6 +729,7 @@ def combine_project(main_file, output_file, verbose=False):
         external_imports,
         scanned_files,
         symbol_to_file,
+        file_trees,
     ) = analysis_result
 
     if verbose:
@@ -495,16 +750,7 @@ def combine_project(main_file, output_file, verbose=False):
     # Create global rename map
     if verbose:
         print("DEBUG: Creating global rename map...")
-    global_rename_map = defaultdict(dict)
-    for file_path, symbols in declared_symbols.items():
-        relative_path = os.path.relpath(file_path, project_dir)
-        if file_path == main_file_abs:
-            continue
-        file_hash = hashlib.md5(relative_path.encode()).hexdigest()[:8]
-        prefix = f"mod_{file_hash}"
-        for symbol in symbols:
-            new_name = f"{prefix}_{symbol}"
-            global_rename_map[file_path][symbol] = new_name
+    global_rename_map = _build_rename_map(declared_symbols, project_dir, main_file_abs)
 
     # Sort symbols topologically
     if verbose:
@@ -520,47 +766,57 @@ def combine_project(main_file, output_file, verbose=False):
         print("DEBUG: Extracting and transforming symbols...")
 
     symbol_code = {}
-    file_trees = {}
-
-    # Parse all files and extract their ASTs
+    entry_code = []
     for file_path in scanned_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            file_trees[file_path] = ast.parse(content, filename=file_path)
-        except Exception as e:
-            if verbose:
-                print(f"DEBUG: Error parsing {file_path}: {e}")
+        if file_path in precomputed:
+            file_code = precomputed[file_path]["code"]
+        elif file_path in file_trees:
+            transformer = Prefixer(
+                file_path, global_rename_map, symbol_origins, declared_symbols
+            )
+            if file_path == main_file_abs:
+                entry_code = _extract_entry_code(file_trees[file_path], transformer)
+                continue
+            file_code = _extract_symbol_code(
+                file_path, file_trees[file_path], transformer, main_file_abs
+            )
+        else:
             continue
-
-    # Extract individual symbols
-    for file_path, tree in file_trees.items():
-        transformer = Prefixer(
-            file_path, global_rename_map, symbol_origins, declared_symbols
+        for symbol, code in file_code.items():
+            symbol_code[f"{file_path}::{symbol}"] = code
+
+    # Order module symbols by their dependencies, then the entry file as written
+    written_symbols = set()
+    written = []
+    for symbol in sorted_symbols:
+        if symbol in symbol_code and symbol not in written_symbols:
+            written_symbols.add(symbol)
+            file_path, _, symbol_name = symbol.rpartition("::")
+            relative_path = os.path.relpath(file_path, project_dir).replace(os.sep, "/")
+            written.append((f"{relative_path}::{symbol_name}", symbol_code[symbol]))
+            if verbose:
+                print(
+                    f"DEBUG: Wrote {symbol_name} from {os.path.basename(symbol_to_file[symbol])}"
+                )
+    if entry_code:
+        written.append((os.path.basename(main_file_abs), "\n".join(entry_code)))
+    if verbose:
+        print(
+            f"DEBUG: Wrote {len(entry_code)} statements from {os.path.basename(main_file_abs)}"
         )
 
-        for i, node in enumerate(tree.body):
-            symbol_key = None
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                symbol_key = f"{file_path}::{node.name}"
-            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
-                targets = (
-                    node.targets if isinstance(node, ast.Assign) else [node.target]
-                )
-                for target in targets:
-                    if isinstance(target, ast.Name):
-                        symbol_key = f"{file_path}::{target.id}"
-                        break
-            elif file_path == main_file_abs and isinstance(node, ast.Expr):
-                # Handle top-level expressions only in the main entry file
-                expr_name = f"__expr_{i}"
-                symbol_key = f"{file_path}::{expr_name}"
-
-            if symbol_key:
-                # Transform the node
-                transformed_node = transformer.visit(node)
-                ast.fix_missing_locations(transformed_node)
-                symbol_code[symbol_key] = ast.unparse(transformed_node)
+    # the brain has no `build_time`, so this isn't optional
+    marker_imports = {imp for imp in external_imports if precompute.is_marker_import(imp)}
+    external_imports -= marker_imports
+    written = precompute.precompute(written, sorted(external_imports), sorted(marker_imports), verbose)
+
+    if profile and not optimize:
+        raise ValueError("building with a profile needs the optimizer")
+    if optimize:
+        if verbose:
+            print("DEBUG: Optimizing the combined script...")
+        defines = {combined_name(name, project_dir): (name, value) for name, value in (profile or {}).items()}
+        written = optimizer.optimize(written, verbose, inline, defines, prune=profile is not None)
 
     # Write the final script
     with open(output_file, "w", encoding="utf-8") as f:
@@ -575,21 +831,12 @@ def combine_project(main_file, output_file, verbose=False):
             f.write("# No external imports found.\n")
         f.write("\n")
 
-        # Write symbols in dependency order
-        written_symbols = set()
-        for symbol in sorted_symbols:
-            if symbol in symbol_code and symbol not in written_symbols:
-                f.write(f"{symbol_code[symbol]}\n")
-                written_symbols.add(symbol)
-                if verbose:
-                    file_path = symbol_to_file[symbol]
-                    symbol_name = symbol.split("::")[-1]
-                    print(
-                        f"DEBUG: Wrote {symbol_name} from {os.path.basename(file_path)}"
-                    )
+        for _, code in written:
+            f.write(f"{code}\n")
 
         f.write("\n# --- End of combined script ---")
 
     console.print(
         f"✅ [green]Project combined successfully into[/green] [bold cyan]{output_file}[/bold cyan]"
     )
+    return written
@@ -0,0 +1,274 @@
+import json
+import os
+import re
+import shutil
+import time
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from rich.console import Console
+
+from .amalgamator import package_content_hash
+from .vexcom import get_vexcom_cache_dir
+
+console = Console()
+
+MAX_SIZE_ENV = "DISHPY_CACHE_MAX_SIZE"
+
+# a .part file modified this recently may still be downloading in another dishpy process
+PART_GRACE_PERIOD = 60 * 60
+
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(value: str) -> int:
+    """Parse a human-readable size such as `500MB`, `1.5G` or `2048` into bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", value, re.I)
+    if not match:
+        raise ValueError(f"Invalid size '{value}' (expected e.g. 500MB or 2G)")
+    number, unit = match.groups()
+    return int(float(number) * _UNITS[unit.upper()])
+
+
+def format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+def get_max_size() -> int | None:
+    """Get the configured cache size cap from the environment, if any"""
+    value = os.environ.get(MAX_SIZE_ENV)
+    return parse_size(value) if value else None
+
+
+def _projects_file() -> Path:
+    return get_vexcom_cache_dir() / "projects.json"
+
+
+def known_projects() -> list[Path]:
+    """Projects that have used this cache, so their dependencies are never evicted"""
+    try:
+        with open(_projects_file(), "r") as f:
+            return [Path(p) for p in json.load(f)]
+    except (OSError, json.JSONDecodeError):
+        return []
+
+
+def record_project(path: Path):
+    """Remember a project so garbage collection keeps what it references"""
+    path = Path(path).resolve()
+    projects = known_projects()
+    if path in projects:
+        return
+    projects.append(path)
+    projects_file = _projects_file()
+    projects_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = projects_file.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump([str(p) for p in projects], f, indent=2)
+    os.replace(tmp, projects_file)
+
+
+def touch(*paths: Path):
+    """Mark cache files as recently used"""
+    for path in paths:
+        if path.exists():
+            os.utime(path)
+
+
+@dataclass
+class CacheEntry:
+    """A group of cache files that are used, and evicted, together"""
+
+    kind: str
+    name: str
+    paths: list[Path]
+    pinned: bool = False
+    size: int = field(init=False)
+    last_used: float = field(init=False)
+
+    def __post_init__(self):
+        self.size = 0
+        self.last_used = 0.0
+        for path in self.paths:
+            for file in [path] if path.is_file() else path.rglob("*"):
+                if file.is_file():
+                    stat = file.stat()
+                    self.size += stat.st_size
+                    self.last_used = max(self.last_used, stat.st_mtime)
+
+    def remove(self):
+        for path in self.paths:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+
+
+def _referenced() -> tuple[set[str], set[str], list[Path]]:
+    """Collect the packages and bundle hashes referenced by known projects"""
+    packages = set()
+    bundles = set()
+    alive = []
+    for project in known_projects():
+        try:
+            with open(project / "dishpy.toml", "rb") as f:
+                config = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError):
+            continue
+        alive.append(project)
+        dependencies = config.get("dependencies", {})
+        roots = [project / "src"]
+        if package_name := config.get("package", {}).get("package_name"):
+            roots.append(project / "src" / package_name)
+        for name, version in dependencies.items():
+            packages.add(f"{name}:{version}")
+            for root in roots:
+                if (root / name).is_dir():
+                    bundles.add(package_content_hash(root / name))
+    return packages, bundles, alive
+
+
+def scan() -> list[CacheEntry]:
+    """List everything in the cache directory as evictable or pinned entries"""
+    cache_dir = get_vexcom_cache_dir()
+    if not cache_dir.exists():
+        return []
+    packages, bundles, _ = _referenced()
+    entries = []
+
+    vexcom_dir = cache_dir / "vexcom"
+    if vexcom_dir.exists():
+        # the vexcom tools take minutes to reinstall, never evict them
+        entries.append(CacheEntry("vexcom", "vexcom", [vexcom_dir], pinned=True))
+
+    packages_dir = cache_dir / "packages"
+    if packages_dir.exists():
+        for path in packages_dir.glob("*.zip"):
+            name = path.name[:-4]
+            entries.append(
+                CacheEntry("package", name, [path], pinned=name in packages)
+            )
+
+    bundles_dir = cache_dir / "bundles"
+    if bundles_dir.exists():
+        for path in bundles_dir.glob("*.json"):
+            entries.append(
+                CacheEntry("bundle", path.stem, [path], pinned=path.stem in bundles)
+            )
+
+    downloads_dir = cache_dir / "downloads"
+    if downloads_dir.exists():
+        for path in downloads_dir.glob("*.zip"):
+            entries.append(
+                CacheEntry("download", path.stem, [path, path.with_suffix(".json")])
+            )
+    return entries
+
+
+def _orphans() -> list[Path]:
+    """Leftovers from interrupted downloads and metadata without a download"""
+    downloads_dir = get_vexcom_cache_dir() / "downloads"
+    if not downloads_dir.exists():
+        return []
+    orphans = []
+    cutoff = time.time() - PART_GRACE_PERIOD
+    for part in downloads_dir.glob("*.part"):
+        try:
+            if part.stat().st_mtime < cutoff:
+                orphans.append(part)
+        except FileNotFoundError:
+            pass  # the download finished meanwhile
+    for meta in downloads_dir.glob("*.json"):
+        if not meta.with_suffix(".zip").exists():
+            orphans.append(meta)
+    return orphans
+
+
+def collect_garbage(max_size: int | None = None, quiet: bool = False) -> int:
+    """
+    Remove orphaned files, then evict the least recently used unpinned entries
+    until the cache fits in `max_size` bytes. Returns the number of bytes freed.
+    """
+    freed = 0
+    for path in _orphans():
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        freed += size
+
+    # forget projects that no longer exist
+    _, _, alive = _referenced()
+    if len(alive) != len(known_projects()):
+        with open(_projects_file(), "w") as f:
+            json.dump([str(p) for p in alive], f, indent=2)
+
+    evicted = []
+    if max_size is not None:
+        entries = scan()
+        total = sum(entry.size for entry in entries)
+        candidates = sorted(
+            (entry for entry in entries if not entry.pinned),
+            key=lambda entry: entry.last_used,
+        )
+        for entry in candidates:
+            if total <= max_size:
+                break
+            entry.remove()
+            total -= entry.size
+            freed += entry.size
+            evicted.append(entry)
+
+    if not quiet:
+        for entry in evicted:
+            console.print(f"🧹 [dim]Evicted {entry.kind} {entry.name}[/dim]")
+        console.print(f"✨ [green]Freed {format_size(freed)} from the DishPy cache[/green]")
+        if max_size is not None and total > max_size:
+            console.print(
+                f"⚠️  [yellow]Cache is still {format_size(total)}, everything left is in use[/yellow]"
+            )
+    return freed
+
+
+def enforce_size_cap():
+    """Run LRU eviction if a cache size cap is configured"""
+    max_size = get_max_size()
+    if max_size is not None:
+        collect_garbage(max_size, quiet=True)
+
+
+def print_stats():
+    entries = scan()
+    cache_dir = get_vexcom_cache_dir()
+    console.print(f"📁 [bold]Cache directory:[/bold] [cyan]{cache_dir}[/cyan]")
+    if not entries:
+        console.print("[dim]The cache is empty[/dim]")
+        return
+    labels = {
+        "vexcom": "vexcom",
+        "package": "packages",
+        "bundle": "bundles",
+        "download": "downloads",
+    }
+    kinds = {}
+    for entry in entries:
+        count, size, pinned = kinds.get(entry.kind, (0, 0, 0))
+        kinds[entry.kind] = (count + 1, size + entry.size, pinned + entry.pinned)
+    for kind, (count, size, pinned) in kinds.items():
+        console.print(
+            f"  [cyan]{labels[kind]:<10}[/cyan] {count:>4} entries  {format_size(size):>10}  [dim]({pinned} in use)[/dim]"
+        )
+    total = sum(entry.size for entry in entries)
+    console.print(f"  [bold]{'total':<10}[/bold] {len(entries):>4} entries  {format_size(total):>10}")
+    max_size = get_max_size()
+    if max_size is not None:
+        console.print(f"  [bold]{'limit':<10}[/bold] {format_size(max_size):>24}")
+    else:
+        console.print(f"  [dim]No size limit set (set {MAX_SIZE_ENV}, e.g. 500MB)[/dim]")
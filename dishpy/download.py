@@ -0,0 +1,406 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+
+import requests
+from rich.console import Console
+
+from .vexcom import get_vexcom_cache_dir
+
+console = Console()
+
+CHUNK_SIZE = 64 * 1024
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_HEADER_SIG = 0x04034B50
+_DATA_DESCRIPTOR_SIG = 0x08074B50
+_CENTRAL_DIR_SIG = 0x02014B50
+_END_OF_CENTRAL_DIR_SIG = 0x06054B50
+_ZIP64_END_SIG = 0x06064B50
+
+
+class UnsupportedStream(Exception):
+    """Raised when a zip entry cannot be extracted without seeking"""
+
+
+def get_download_cache_dir() -> Path:
+    """Get the directory that stores downloaded package archives"""
+    return get_vexcom_cache_dir() / "downloads"
+
+
+class ZipCache:
+    """A cached copy of a remote zip file, validated by ETag/Last-Modified"""
+
+    def __init__(self, url: str, cache_dir: Path | None = None):
+        self.url = url
+        self.cache_dir = cache_dir if cache_dir is not None else get_download_cache_dir()
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        self.zip_path = self.cache_dir / f"{key}.zip"
+        self.meta_path = self.cache_dir / f"{key}.json"
+
+    def exists(self) -> bool:
+        return self.zip_path.exists() and self.meta_path.exists()
+
+    def metadata(self) -> dict:
+        if not self.exists():
+            return {}
+        try:
+            with open(self.meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def conditional_headers(self) -> dict:
+        meta = self.metadata()
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def touch(self):
+        """Mark the cached copy as recently used"""
+        for path in (self.zip_path, self.meta_path):
+            if path.exists():
+                os.utime(path)
+
+    @property
+    def part_path(self) -> Path:
+        return self.zip_path.with_suffix(".part")
+
+    def open_part(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return open(self.part_path, "wb")
+
+    def commit(self, response: requests.Response):
+        """Promote a fully downloaded `.part` file to the cached copy"""
+        os.replace(self.part_path, self.zip_path)
+        with open(self.meta_path, "w") as f:
+            json.dump(
+                {
+                    "url": self.url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                },
+                f,
+            )
+
+    def discard_part(self):
+        self.part_path.unlink(missing_ok=True)
+
+
+class _ChunkReader:
+    """Buffered reader over an iterator of byte chunks, tee-ing everything it pulls"""
+
+    def __init__(self, chunks, sink=None):
+        self._chunks = iter(chunks)
+        self._sink = sink
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    def _pull(self) -> bool:
+        if self._exhausted:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if self._sink is not None:
+                self._sink.write(chunk)
+            self._buffer += chunk
+            return True
+        self._exhausted = True
+        return False
+
+    def read_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not self._pull():
+                raise EOFError("Unexpected end of zip stream")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def peek(self, size: int) -> bytes:
+        while len(self._buffer) < size and self._pull():
+            pass
+        return bytes(self._buffer[:size])
+
+    def read_some(self) -> bytes:
+        if not self._buffer and not self._pull():
+            return b""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def unread(self, data: bytes):
+        self._buffer[:0] = data
+
+    def drain(self):
+        """Consume the rest of the stream so the sink receives every byte"""
+        self._buffer.clear()
+        while self._pull():
+            self._buffer.clear()
+
+
+def _strip_path(name: str, strip_components: int) -> str | None:
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if ".." in parts:
+        raise ValueError(f"Refusing to extract unsafe path '{name}'")
+    parts = parts[strip_components:]
+    if not parts:
+        return None
+    return "/".join(parts)
+
+
+def _zip64_sizes(
+    extra: bytes, comp_size: int, uncomp_size: int
+) -> tuple[int, int, bool]:
+    offset = 0
+    while offset + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, offset)
+        if tag == 0x0001:
+            values = iter(struct.unpack_from(f"<{size // 8}Q", extra, offset + 4))
+            if uncomp_size == 0xFFFFFFFF:
+                uncomp_size = next(values)
+            if comp_size == 0xFFFFFFFF:
+                comp_size = next(values)
+            return comp_size, uncomp_size, True
+        offset += 4 + size
+    return comp_size, uncomp_size, False
+
+
+def _write_stored(reader: _ChunkReader, out, size: int) -> int:
+    """Copy a stored entry to `out`, returning the CRC32 of its data"""
+    crc = 0
+    while size > 0:
+        data = reader.read_exact(min(size, CHUNK_SIZE))
+        crc = zlib.crc32(data, crc)
+        if out is not None:
+            out.write(data)
+        size -= len(data)
+    return crc
+
+
+def _write_deflated(reader: _ChunkReader, out) -> int:
+    """Inflate a deflated entry into `out`, returning the CRC32 of its data"""
+    crc = 0
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    while not decompressor.eof:
+        data = reader.read_some()
+        if not data:
+            raise EOFError("Unexpected end of deflate stream")
+        output = decompressor.decompress(data)
+        crc = zlib.crc32(output, crc)
+        if out is not None and output:
+            out.write(output)
+    reader.unread(decompressor.unused_data)
+    return crc
+
+
+def _make_dirs(path: Path, extracted: list[Path]):
+    """Create `path` and any missing parents, recording each one created"""
+    missing = [path, *path.parents]
+    missing = [directory for directory in missing if not directory.exists()]
+    for directory in reversed(missing):
+        directory.mkdir()
+        extracted.append(directory)
+
+
+def _remove_extracted(paths: list[Path]):
+    """Delete what a failed extraction wrote, so a damaged archive leaves nothing behind"""
+    for path in reversed(paths):
+        if path.is_dir():
+            with contextlib.suppress(OSError):
+                path.rmdir()  # only if nothing else is in it
+        else:
+            path.unlink(missing_ok=True)
+
+
+def extract_zip_stream(chunks, dest: Path, strip_components: int = 1, sink=None):
+    """
+    Extracts a zip archive from an iterator of byte chunks as they arrive by
+    walking local file headers, so no seeking (and no temporary file) is needed.
+    Every byte read is also written to `sink` if given. Each entry's CRC-32 is
+    checked, and nothing extracted is left behind if the archive is damaged.
+    Raises UnsupportedStream for entries whose size is only known after the data.
+    """
+    reader = _ChunkReader(chunks, sink)
+    dest = Path(dest)
+    extracted: list[Path] = []
+    try:
+        _extract_entries(reader, dest, strip_components, extracted)
+    except BaseException:
+        _remove_extracted(extracted)
+        raise
+    reader.drain()
+
+
+def _extract_entries(reader: _ChunkReader, dest: Path, strip_components: int, extracted: list[Path]):
+    while True:
+        signature = reader.peek(4)
+        if len(signature) < 4:
+            raise EOFError("Zip stream ended before its central directory")
+        (sig,) = struct.unpack("<I", signature)
+        if sig in (_CENTRAL_DIR_SIG, _END_OF_CENTRAL_DIR_SIG, _ZIP64_END_SIG):
+            break
+        if sig != _LOCAL_HEADER_SIG:
+            raise zipfile.BadZipFile("Bad local file header signature")
+        (
+            _,
+            _version,
+            flags,
+            method,
+            _mtime,
+            _mdate,
+            expected_crc,
+            comp_size,
+            uncomp_size,
+            name_len,
+            extra_len,
+        ) = _LOCAL_HEADER.unpack(reader.read_exact(_LOCAL_HEADER.size))
+        raw_name = reader.read_exact(name_len)
+        extra = reader.read_exact(extra_len)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        comp_size, uncomp_size, zip64 = _zip64_sizes(extra, comp_size, uncomp_size)
+        has_descriptor = bool(flags & 0x08)
+
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise UnsupportedStream(f"Unsupported compression method {method}")
+        if method == zipfile.ZIP_STORED and has_descriptor:
+            raise UnsupportedStream("Stored entry without a size in its header")
+
+        target_name = _strip_path(name, strip_components)
+        target = dest / target_name if target_name else None
+        out = None
+        if target is not None and not name.endswith("/"):
+            _make_dirs(target.parent, extracted)
+            extracted.append(target)
+            out = open(target, "wb")
+        elif target is not None:
+            _make_dirs(target, extracted)
+        try:
+            if method == zipfile.ZIP_STORED:
+                crc = _write_stored(reader, out, comp_size)
+            else:
+                crc = _write_deflated(reader, out)
+        except zlib.error as e:
+            raise zipfile.BadZipFile(f"Can't decompress {name} ({e}), the download is damaged") from e
+        finally:
+            if out is not None:
+                out.close()
+
+        if has_descriptor:
+            if struct.unpack("<I", reader.peek(4))[0] == _DATA_DESCRIPTOR_SIG:
+                reader.read_exact(4)
+            (expected_crc,) = struct.unpack("<I", reader.read_exact(4))
+            # sizes are 8 bytes each for zip64 entries, 4 otherwise
+            reader.read_exact(16 if zip64 else 8)
+        if crc != expected_crc:
+            raise zipfile.BadZipFile(f"CRC-32 mismatch for {name}, the download is damaged")
+
+
+def extract_zip_file(zip_path: Path, dest: Path, strip_components: int = 1):
+    """Extracts a zip file on disk, dropping the first `strip_components` path parts"""
+    dest = Path(dest)
+    extracted: list[Path] = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                target_name = _strip_path(info.filename, strip_components)
+                if not target_name:
+                    continue
+                target = dest / target_name
+                if info.is_dir():
+                    _make_dirs(target, extracted)
+                    continue
+                _make_dirs(target.parent, extracted)
+                extracted.append(target)
+                # zipfile checks each entry's CRC-32 as it is read
+                with archive.open(info) as src, open(target, "wb") as out:
+                    try:
+                        shutil.copyfileobj(src, out)
+                    except zlib.error as e:
+                        raise zipfile.BadZipFile(
+                            f"Can't decompress {info.filename} ({e}), the archive is damaged"
+                        ) from e
+    except BaseException:
+        _remove_extracted(extracted)
+        raise
+
+
+def _is_zip_response(response: requests.Response) -> bool:
+    return "application/zip" in response.headers.get("content-type", "")
+
+
+def fetch_zip(
+    url: str,
+    dest: Path,
+    strip_components: int = 1,
+    cache_dir: Path | None = None,
+    session: requests.Session | None = None,
+) -> bool:
+    """
+    Downloads the zip at `url` and extracts it into `dest` while it streams in.
+    The archive is cached and revalidated with a single conditional request, and
+    the cached copy is used as-is when the server cannot be reached.
+    Returns False (after one request) if `url` does not serve a zip file.
+    """
+    cache = ZipCache(url, cache_dir)
+    http = session or requests
+    try:
+        response = http.get(
+            url,
+            headers=cache.conditional_headers(),
+            stream=True,
+            allow_redirects=True,
+            timeout=30,
+        )
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if not cache.exists():
+            raise
+        console.print(
+            f"📴 [yellow]Could not reach {url} ({type(e).__name__}), using cached copy[/yellow]"
+        )
+        cache.touch()
+        extract_zip_file(cache.zip_path, dest, strip_components)
+        return True
+
+    with response:
+        if response.status_code == 304 and cache.exists():
+            cache.touch()
+            extract_zip_file(cache.zip_path, dest, strip_components)
+            return True
+        if not _is_zip_response(response):
+            # not a zip download (a git repository, or an error page): let the caller clone it
+            return False
+        response.raise_for_status()
+
+        chunks = response.iter_content(CHUNK_SIZE)
+        with cache.open_part() as part:
+            try:
+                extract_zip_stream(chunks, dest, strip_components, sink=part)
+                streamed = True
+            except UnsupportedStream:
+                # finish the download, then extract from the complete file
+                for chunk in chunks:
+                    part.write(chunk)
+                streamed = False
+            except BaseException:
+                part.close()
+                cache.discard_part()
+                raise
+        if not streamed:
+            # check the archive before it is cached, so a damaged one isn't reused offline
+            try:
+                extract_zip_file(cache.part_path, dest, strip_components)
+            except BaseException:
+                cache.discard_part()
+                raise
+        cache.commit(response)
+    return True
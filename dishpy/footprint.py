@@ -0,0 +1,242 @@
+"""
+A rough cost model of what a combined script costs the brain's MicroPython once it is
+loaded: the names it interns, its constants, its compiled code and the objects its
+module level creates.
+
+The brain compiles `.out/main.py` when the program starts, so everything here is heap
+that is taken before the program's first line runs. Sizes assume the 32-bit build the
+V5 runs and are estimates, good for finding what is big rather than for exact budgets.
+"""
+
+import ast
+import builtins
+import dis
+import keyword
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from rich.console import Console
+
+from .cache import format_size
+
+console = Console()
+
+WORD = 4  # bytes in a pointer or small int on the brain
+QSTR_OVERHEAD = 3 + WORD  # hash, length and terminator, plus the pool's pointer to it
+CODE_OBJECT_BYTES = 8 * WORD  # a compiled function's header, before its bytecode
+FUNCTION_BYTES = 4 * WORD
+CLASS_BYTES = 8 * WORD
+OBJECT_BYTES = 4 * WORD  # an instance or other object whose size can't be told from the source
+BOXED_FLOAT_BYTES = 4 * WORD
+SMALL_INT_BITS = 30  # ints that fit in a tagged pointer and take no heap
+BYTES_PER_INSTRUCTION = 2  # an opcode and its (usually one byte) argument
+
+
+def _vex_names() -> set[str]:
+    """Every name the `vex` module defines, down to its classes' methods"""
+    tree = ast.parse((Path(__file__).parent / "resources" / "vex.py").read_text())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+    return names
+
+
+# names the firmware interns already, so using them costs nothing extra
+FIRMWARE_NAMES = frozenset(
+    {
+        *_vex_names(),
+        *dir(builtins),
+        *keyword.kwlist,
+        *(name for kind in (str, bytes, list, dict, tuple, set, int, float, object, Exception) for name in dir(kind)),
+        "vex",
+        "__main__",
+        "<module>",
+    }
+)
+
+
+@dataclass
+class SymbolCost:
+    """What one symbol of the combined script costs"""
+
+    name: str  # like `lib/pid.py::PID`, or `main.py` for the script itself
+    kind: str
+    source_bytes: int = 0
+    code_objects: int = 0
+    bytecode_bytes: int = 0
+    constants: int = 0
+    constant_bytes: int = 0
+    allocations: int = 0
+    allocation_bytes: int = 0
+    names: set[str] = field(default_factory=set)
+
+    @property
+    def total(self) -> int:
+        return (
+            self.code_objects * CODE_OBJECT_BYTES
+            + self.bytecode_bytes
+            + self.constants * WORD
+            + self.constant_bytes
+            + self.allocation_bytes
+        )
+
+
+@dataclass
+class Footprint:
+    symbols: list[SymbolCost]
+    qstrs: dict[str, int]  # every name the script interns that the firmware doesn't, with how many symbols use it
+
+    @property
+    def qstr_bytes(self) -> int:
+        return sum(len(name.encode()) + QSTR_OVERHEAD for name in self.qstrs)
+
+    @property
+    def total(self) -> int:
+        return self.qstr_bytes + sum(symbol.total for symbol in self.symbols)
+
+
+def _constant_bytes(value) -> int:
+    """Heap taken by a constant, beyond its slot in the constant table"""
+    if value is None or isinstance(value, (bool, type(...))):
+        return 0
+    if isinstance(value, int):
+        return 0 if -(2**SMALL_INT_BITS) <= value < 2**SMALL_INT_BITS else 4 * WORD + (value.bit_length() + 7) // 8
+    if isinstance(value, float):
+        return BOXED_FLOAT_BYTES
+    if isinstance(value, complex):
+        return 2 * BOXED_FLOAT_BYTES
+    if isinstance(value, str):
+        # short identifier-like strings are interned instead, see `_names`
+        return 0 if value.isidentifier() else 3 * WORD + len(value.encode())
+    if isinstance(value, bytes):
+        return 3 * WORD + len(value)
+    if isinstance(value, (tuple, frozenset)):
+        return 2 * WORD + len(value) * WORD + sum(_constant_bytes(item) for item in value)
+    return OBJECT_BYTES
+
+
+def _names(tree: ast.AST) -> set[str]:
+    """Every name the compiler interns for `tree`"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            names.add(node.attr)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.keyword) and node.arg:
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.isidentifier():
+            names.add(node.value)
+    return names
+
+
+def _allocation(value: ast.expr | None) -> tuple[int, int]:
+    """How many objects, and bytes, evaluating `value` at module level allocates"""
+    if value is None or isinstance(value, (ast.Constant, ast.Name, ast.Attribute)):
+        return 0, 0
+    if isinstance(value, (ast.List, ast.Tuple, ast.Set)):
+        count, size = 1, 3 * WORD + len(value.elts) * WORD
+        for item in value.elts:
+            item_count, item_size = _allocation(item)
+            count, size = count + item_count, size + item_size
+        return count, size
+    if isinstance(value, ast.Dict):
+        count, size = 1, 3 * WORD + len(value.keys) * 2 * WORD
+        for item in value.values:
+            item_count, item_size = _allocation(item)
+            count, size = count + item_count, size + item_size
+        return count, size
+    if isinstance(value, (ast.ListComp, ast.DictComp, ast.SetComp)):
+        return 1, 3 * WORD  # its length depends on what it iterates over
+    return 1, OBJECT_BYTES
+
+
+def _module_allocations(node: ast.stmt) -> tuple[int, int]:
+    """The objects a top-level statement leaves in the module's globals"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return 1, FUNCTION_BYTES + 2 * WORD
+    if isinstance(node, ast.ClassDef):
+        members = sum(isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Assign)) for item in node.body)
+        return 1 + members, CLASS_BYTES + members * (FUNCTION_BYTES + 2 * WORD)
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        count, size = _allocation(node.value)
+        return count, size + 2 * WORD  # the global's entry in the module's dict
+    if isinstance(node, ast.Expr):
+        return _allocation(node.value)
+    return 0, 0
+
+
+def _code_cost(cost: SymbolCost, code):
+    cost.code_objects += 1
+    instructions = [op for op in dis.get_instructions(code) if op.opname not in ("CACHE", "RESUME", "PRECALL")]
+    cost.bytecode_bytes += len(instructions) * BYTES_PER_INSTRUCTION
+    for value in code.co_consts:
+        if hasattr(value, "co_code"):
+            _code_cost(cost, value)
+        elif value is not None:
+            cost.constants += 1
+            cost.constant_bytes += _constant_bytes(value)
+
+
+def symbol_cost(name: str, source: str) -> SymbolCost:
+    """The cost of one symbol of the combined script, given its code"""
+    tree = ast.parse(source)
+    kinds = {ast.FunctionDef: "function", ast.AsyncFunctionDef: "function", ast.ClassDef: "class"}
+    kind = kinds.get(type(tree.body[0]), "value") if len(tree.body) == 1 else "script"
+    cost = SymbolCost(name, kind, source_bytes=len(source.encode()), names=_names(tree))
+    for node in tree.body:
+        count, size = _module_allocations(node)
+        cost.allocations += count
+        cost.allocation_bytes += size
+    _code_cost(cost, compile(tree, name, "exec"))
+    cost.code_objects -= 1  # every symbol shares the script's module
+    return cost
+
+
+def estimate(symbols: list[tuple[str, str]]) -> Footprint:
+    """The footprint of a combined script from its symbols, as `combine_project` returns them"""
+    costs = [symbol_cost(name, source) for name, source in symbols]
+    qstrs: dict[str, int] = {}
+    for cost in costs:
+        for name in cost.names - FIRMWARE_NAMES:
+            qstrs[name] = qstrs.get(name, 0) + 1
+    return Footprint(costs, qstrs)
+
+
+def print_report(footprint: Footprint, largest: int = 10):
+    symbols = footprint.symbols
+    console.print("📊 [bold]Estimated memory use on the brain[/bold]")
+    rows = [
+        ("names", f"{len(footprint.qstrs)} interned", footprint.qstr_bytes),
+        (
+            "code",
+            f"{sum(s.code_objects for s in symbols)} functions and methods",
+            sum(s.code_objects * CODE_OBJECT_BYTES + s.bytecode_bytes for s in symbols),
+        ),
+        (
+            "constants",
+            f"{sum(s.constants for s in symbols)} entries",
+            sum(s.constants * WORD + s.constant_bytes for s in symbols),
+        ),
+        ("globals", f"{sum(s.allocations for s in symbols)} objects", sum(s.allocation_bytes for s in symbols)),
+    ]
+    for label, detail, size in rows:
+        console.print(f"  [cyan]{label:<10}[/cyan] {format_size(size):>10}  [dim]{detail}[/dim]")
+    console.print(f"  [bold]{'total':<10}[/bold] {format_size(footprint.total):>10}")
+    console.print("🐘 [bold]Largest symbols[/bold]")
+    for symbol in sorted(symbols, key=lambda s: s.total, reverse=True)[:largest]:
+        console.print(f"  {format_size(symbol.total):>10}  {symbol.name} [dim]({symbol.kind})[/dim]")
+    longest = sorted(footprint.qstrs, key=len, reverse=True)[:5]
+    if longest:
+        console.print(f"  [dim]Longest interned names: {', '.join(longest)}[/dim]")
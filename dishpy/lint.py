@@ -0,0 +1,255 @@
+"""
+Checks for code that is fine on a computer but slow on the brain, over the same files
+the amalgamator would combine.
+
+The brain runs one thread at a time until it waits, so the checks look at the loops
+that run for as long as the program does (`while` loops, and everything inside them)
+and don't wait long on each pass: anything they do is paid many times a second, and a
+thread that loops without waiting starves every other thread.
+"""
+
+import ast
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from rich.console import Console
+
+from .amalgamator import _analyze_project, _get_local_module_map
+
+console = Console()
+
+DEVICES = frozenset(
+    {
+        "Brain", "Controller", "Competition", "Motor", "MotorGroup", "DriveTrain", "SmartDrive", "Inertial", "Gps",
+        "Distance", "Optical", "Rotation", "Vision", "Triport", "Limit", "Bumper", "DigitalIn", "DigitalOut", "Led",
+        "Pneumatics", "Potentiometer", "PotentiometerV2", "Line", "Light", "Gyro", "Accelerometer", "AnalogIn",
+        "Encoder", "Sonar", "Pwm", "Servo", "Motor29", "MotorVictor", "MessageLink", "SerialLink", "Electromagnet",
+        "AddressableLed",
+    }
+)  # fmt: skip
+ENUMS = frozenset(
+    {
+        "Ports", "PercentUnits", "TimeUnits", "CurrentUnits", "VoltageUnits", "PowerUnits", "TorqueUnits",
+        "RotationUnits", "VelocityUnits", "DistanceUnits", "AnalogUnits", "TemperatureUnits", "DirectionType",
+        "TurnType", "BrakeType", "GearSetting", "FontType", "ThreeWireType", "ControllerType", "AxisType",
+        "OrientationType", "ObjectSizeType", "LedStateType", "GestureType", "VexlinkType", "Color",
+    }
+)  # fmt: skip
+WAITS = frozenset({"wait", "sleep", "sleep_for", "wait_until"})
+HOT_WAIT_MS = 50  # a loop that waits at least this long on every pass runs too rarely to matter
+TIME_UNITS = {"MSEC": 1, "SECONDS": 1000, "SEC": 1000}
+SCREEN_PRINTS = frozenset({"print", "print_at", "set_cursor", "clear_screen", "clear_line", "new_line"})
+
+
+@dataclass
+class Finding:
+    path: str
+    line: int
+    column: int
+    check: str
+    message: str
+
+
+def _called_name(node: ast.Call) -> str | None:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def _wait_ms(node: ast.Call) -> float | None:
+    """How long a call like `wait(100, MSEC)` waits, in milliseconds, if the code says"""
+    if _called_name(node) not in ("wait", "sleep", "sleep_for") or not node.args:
+        return None
+    duration = node.args[0]
+    if not (isinstance(duration, ast.Constant) and isinstance(duration.value, (int, float))):
+        return None
+    units = node.args[1] if len(node.args) > 1 else None
+    for keyword in node.keywords:
+        if keyword.arg == "units":
+            units = keyword.value
+    if units is None:
+        return duration.value
+    name = units.attr if isinstance(units, ast.Attribute) else getattr(units, "id", None)
+    return duration.value * TIME_UNITS[name] if name in TIME_UNITS else None
+
+
+def _walk_body(nodes):
+    """Every node under `nodes`, without going into functions and classes defined there"""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        for child in ast.iter_child_nodes(node):
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                stack.append(child)
+
+
+def _is_forever(loop: ast.While) -> bool:
+    test = loop.test
+    return isinstance(test, ast.Constant) and bool(test.value)
+
+
+def _enum_chain(node: ast.Attribute) -> bool:
+    """Whether `node` is a lookup like `Ports.PORT1` or `vex.Ports.PORT1`"""
+    value = node.value
+    if isinstance(value, ast.Name):
+        return value.id in ENUMS
+    return (
+        isinstance(value, ast.Attribute)
+        and value.attr in ENUMS
+        and isinstance(value.value, ast.Name)
+        and value.value.id == "vex"
+    )
+
+
+class PerfLinter:
+    """The performance checks for one file"""
+
+    def __init__(self, path: str, tree: ast.Module):
+        self.path = path
+        self.tree = tree
+        self.findings: list[Finding] = []
+        self.functions = {
+            node.name: node
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+        self.waiting: set[str] = set()  # functions that wait, directly or through each other
+        self._find_waiting()
+
+    def _report(self, node: ast.AST, check: str, message: str):
+        self.findings.append(Finding(self.path, node.lineno, node.col_offset, check, message))
+
+    def _waits(self, nodes) -> bool:
+        """Whether running `nodes` waits, directly or through a function of this file"""
+        for node in _walk_body(nodes):
+            if isinstance(node, ast.Call):
+                name = _called_name(node)
+                if name in WAITS or (name in self.waiting and isinstance(node.func, ast.Name)):
+                    return True
+        return False
+
+    def _hot(self, loop: ast.While) -> bool:
+        """Whether `loop` repeats quickly: it never waits, or only briefly, on a pass"""
+        for node in _walk_body(loop.body):
+            if isinstance(node, ast.Call):
+                name = _called_name(node)
+                if name in WAITS:
+                    duration = _wait_ms(node)
+                    # a wait we can't measure is given the benefit of the doubt
+                    if duration is None or duration >= HOT_WAIT_MS:
+                        return False
+                elif name in self.waiting and isinstance(node.func, ast.Name):
+                    return False
+        return True
+
+    def _find_waiting(self):
+        changed = True
+        while changed:
+            changed = False
+            for name, function in self.functions.items():
+                if name not in self.waiting and self._waits(function.body):
+                    self.waiting.add(name)
+                    changed = True
+
+    def _thread_targets(self) -> set[str]:
+        targets = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Call) and _called_name(node) == "Thread" and node.args:
+                target = node.args[0]
+                if isinstance(target, ast.Name):
+                    targets.add(target.id)
+        return targets
+
+    def run(self) -> list[Finding]:
+        for name in self._thread_targets():
+            function = self.functions.get(name)
+            if function is None:
+                continue
+            for node in _walk_body(function.body):
+                if isinstance(node, ast.While) and _is_forever(node) and not self._waits(node.body):
+                    self._report(
+                        node,
+                        "busy-loop",
+                        f"thread {name} loops without wait(), so no other thread runs until it returns",
+                    )
+        self._visit(self.tree, hot=False)
+        return self.findings
+
+    def _visit(self, node: ast.AST, hot: bool):
+        """Check `node` and everything under it, `hot` if a quickly repeating `while` loop runs it"""
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            # defining a function in a loop doesn't run it there
+            hot = False
+        elif isinstance(node, ast.While):
+            hot = self._hot(node)
+        elif isinstance(node, ast.FormattedValue):
+            # its format spec is part of the f-string already checked
+            self._visit(node.value, hot)
+            return
+        elif hot:
+            self._check(node)
+        for child in ast.iter_child_nodes(node):
+            self._visit(child, hot)
+
+    def _check(self, node: ast.AST):
+        if isinstance(node, ast.Call):
+            name = _called_name(node)
+            if name in DEVICES:
+                self._report(node, "device-in-loop", f"{name}(...) is created on every pass of a loop, create it once")
+            elif name in SCREEN_PRINTS and _on_screen(node):
+                self._report(node, "screen-in-loop", "drawing on the screen in a loop is slow, update it from a slower loop")
+            elif name == "format" and isinstance(node.func, ast.Attribute):
+                self._report(node, "format-in-loop", "string formatting in a loop allocates on every pass")
+        elif isinstance(node, ast.JoinedStr):
+            self._report(node, "format-in-loop", "f-string in a loop allocates on every pass")
+        elif (
+            isinstance(node, ast.BinOp)
+            and isinstance(node.op, ast.Mod)
+            and isinstance(node.left, ast.Constant)
+            and isinstance(node.left.value, str)
+        ):
+            self._report(node, "format-in-loop", "string formatting in a loop allocates on every pass")
+        elif isinstance(node, ast.Attribute) and _enum_chain(node):
+            self._report(
+                node,
+                "enum-lookup",
+                f"{ast.unparse(node)} is looked up on every pass, keep it in a variable outside the loop",
+            )
+
+
+def _on_screen(node: ast.Call) -> bool:
+    """Whether `node` calls a method of a brain's or controller's screen, like `brain.screen.print`"""
+    owner = node.func.value if isinstance(node.func, ast.Attribute) else None
+    return (isinstance(owner, ast.Attribute) and owner.attr == "screen") or (
+        isinstance(owner, ast.Name) and owner.id == "screen"
+    )
+
+
+def lint_project(main_file: Path) -> list[Finding]:
+    """Run the performance checks over every file `main_file` pulls in, like a build would"""
+    main_file = os.path.abspath(main_file)
+    project_dir = os.path.dirname(main_file)
+    local_module_map = _get_local_module_map(project_dir)
+    file_trees = _analyze_project(main_file, local_module_map)[-1]
+    findings = []
+    for path in sorted(file_trees):
+        relative_path = os.path.relpath(path, project_dir).replace(os.sep, "/")
+        findings.extend(PerfLinter(relative_path, file_trees[path]).run())
+    return sorted(findings, key=lambda finding: (finding.path, finding.line, finding.column))
+
+
+def print_findings(findings: list[Finding], src: Path):
+    for finding in findings:
+        console.print(
+            f"⚠️  [cyan]{src.name}/{finding.path}:{finding.line}:{finding.column + 1}[/cyan] "
+            f"[yellow]{finding.check}[/yellow] {finding.message}"
+        )
+    if findings:
+        console.print(f"🐢 [yellow]Found {len(findings)} performance problem{'s' * (len(findings) != 1)}[/yellow]")
+    else:
+        console.print("✨ [green]No performance problems found[/green]")
@@ -1,26 +1,57 @@
 import sys
 import os
 import shutil
+import tempfile
 import argparse
 from pathlib import Path
 from . import __version__
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
-from .vexcom import run_vexcom, get_vexcom_cache_dir, run_in_process
-from .utils import get_url_file_type, dir_path
-from .amalgamator import combine_project
+from .vexcom import run_vexcom, get_vexcom_cache_dir, run_in_process, open_vexcom
+from .utils import dir_path
+from .download import fetch_zip, extract_zip_file
+from .registry import serve, sync, DEFAULT_PORT
+from .cache import (
+    record_project,
+    touch,
+    enforce_size_cap,
+    collect_garbage,
+    get_max_size,
+    print_stats,
+    parse_size,
+)
+from .amalgamator import combine_project, analyze_package, package_content_hash
+from .footprint import estimate, print_report
+from .lint import lint_project, print_findings
+from .sim import Simulation
+from .sim.competition import Field
+from .sim.profiler import JITTER_BINS, Profiler
+from .sim.recording import ControllerRecorder, load_input
+from .sim.screen import PngFrames, TerminalPreview
+from .sim.sweep import Sweep, parse_grid, parse_range
+from .sim.trajectory import TrajectoryRecorder
 import tomllib
 import tomli_w
 import textcase
 import validators
 import hashlib
+import json
 import subprocess
+import time
+import contextlib
+import io
 from copy import copy
+from concurrent.futures import ThreadPoolExecutor
 
 console = Console()
 
 
+def get_bundles_dir() -> Path:
+    """Get the directory that stores pre-analyzed package bundles, keyed by content hash"""
+    return get_vexcom_cache_dir() / "bundles"
+
+
 class Project:
     def __init__(self, path: Path, name: str, slot: int):
         self.path = path
@@ -78,39 +109,87 @@ class Project:
     def upload(self, path: Path):
         run_vexcom("--name", self.name, "--slot", str(self.slot), "--write", str(path), "--timer", "--progress")
 
-    def build(self, verbose=False):
+    def build(self, verbose=False, report=False, optimize=True, inline=False, profile=None):
         console.print("📦 [yellow]Combining project into a single file...[/yellow]")
-        combine_project(self.main_file, self.out_dir / "main.py", verbose)
+        record_project(self.path)
+        constants = self.profile_constants(profile) if profile else None
+        if constants is not None:
+            console.print(f"🎛️  [yellow]Using profile [bold cyan]{profile}[/bold cyan][/yellow]")
+        symbols = combine_project(
+            self.main_file, self.out_dir / "main.py", verbose, self.dependency_bundles(), optimize, inline, constants
+        )
+        if report:
+            print_report(estimate(symbols))
+
+    def profile_constants(self, profile: str) -> dict:
+        """The constants a `[profiles.<name>]` section of dishpy.toml sets"""
+        with open(self.path / "dishpy.toml", "rb") as f:
+            config = tomllib.load(f)
+        profiles = config.get("profiles", {})
+        if profile not in profiles:
+            known = ", ".join(profiles) or "none"
+            raise ValueError(f"no profile {profile} in dishpy.toml (profiles: {known})")
+        constants = profiles[profile]
+        for name, value in constants.items():
+            if not isinstance(value, (bool, int, float, str)):
+                raise ValueError(f"{name} in profile {profile} has to be a number, string or boolean")
+        return constants
 
-    def add(self, package: str, path_to_go: Path | None = None):
-        package_path = get_vexcom_cache_dir() / "packages" / f"{package}.zip"
-        # this *will* panic if the package is not found, but we try `list` first so it's not a huge deal
-        name, version = package.split(":")
+    def dependency_bundles(self) -> list[dict]:
+        """Load the pre-analyzed bundles of dependencies that are unchanged since registration"""
+        with open(self.path / "dishpy.toml", "rb") as f:
+            config = tomllib.load(f)
+        bundles = []
+        for name in config.get("dependencies", {}):
+            package_dir = self.src / name
+            if not package_dir.is_dir():
+                continue
+            bundle_path = get_bundles_dir() / f"{package_content_hash(package_dir)}.json"
+            if bundle_path.exists():
+                touch(bundle_path)
+                with open(bundle_path, "r") as f:
+                    bundles.append(json.load(f))
+        return bundles
+
+    def add(self, packages: list[str], path_to_go: Path | None = None):
+        packages_path = get_vexcom_cache_dir() / "packages"
+        # this *will* panic if a package is not found, but we try `list` first so it's not a huge deal
+        versions = dict(package.split(":") for package in packages)
         if not path_to_go:
             path_to_go = self.src
-        path_to_go = path_to_go / name
-        subprocess.run(
-            [
-                "unzip",
-                "-o",  # overwrite existing files without prompting
-                str(package_path),
-                "-d",
-                str(path_to_go),
-            ],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        record_project(self.path)
+        touch(*(packages_path / f"{package}.zip" for package in packages))
+        # Extract every package concurrently into a staging directory, and only copy them
+        # over the project once all of them succeeded, so a damaged archive can't lose the
+        # files of a package that is already there
+        with tempfile.TemporaryDirectory() as staging:
+            staging = Path(staging)
+            with ThreadPoolExecutor() as pool:
+                futures = [
+                    pool.submit(
+                        extract_zip_file,
+                        packages_path / f"{package}.zip",
+                        staging / name,
+                        0,
+                    )
+                    for package, name in zip(packages, versions)
+                ]
+                for future in futures:
+                    future.result()
+            for name in versions:
+                if (staging / name).exists():
+                    shutil.copytree(staging / name, path_to_go / name, dirs_exist_ok=True)
         with open(self.path / "dishpy.toml", "rb") as f:
             config = tomllib.load(f)
         if "dependencies" not in config:
             config["dependencies"] = {}
-        config["dependencies"][name] = version
+        config["dependencies"].update(versions)
         with open(self.path / "dishpy.toml", "wb") as f:
             tomli_w.dump(config, f)
-        console.print(
-            f"✨ [green]Added package [bold cyan]{package}[/bold cyan][/green]"
-        )
+        for package in packages:
+            console.print(
+                f"✨ [green]Added package [bold cyan]{package}[/bold cyan][/green]"
+            )
 
 
 class Package(Project):
@@ -179,6 +258,12 @@ class Package(Project):
             capture_output=True,
             text=True,
         )
+        # Store the amalgamator's analysis so projects using this package skip re-parsing it
+        bundle = analyze_package(package_path)
+        bundles_path = get_bundles_dir()
+        bundles_path.mkdir(parents=True, exist_ok=True)
+        with open(bundles_path / f"{bundle['content_hash']}.json", "w") as f:
+            json.dump(bundle, f)
         console.print(
             f"✨ [green]Registered package [bold cyan]{self.package_name + ':' + self.version}[/bold cyan][/green]"
         )
@@ -205,37 +290,19 @@ class Package(Project):
             package_hashed += hashlib.md5(package.encode()).hexdigest()[:8]
             package_path = Path(hashlib.md5(package_hashed.encode()).hexdigest()[:8])
         package_path.mkdir()
-        if validators.url(package) and "application/zip" in get_url_file_type(package):
-            # This is a zip file, download & unzip
-            subprocess.run(
-                ["curl", "-s", "-L", package, "-o", str(package_path / "pkg.zip")],
-                check=True,
-            )
-            subprocess.run(
-                [
-                    "bsdtar",
-                    "--strip-components=1",
-                    "-xvf",
-                    str(package_path / "pkg.zip"),
-                    "-C",
-                    str(package_path),
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        else:
+        # Zip files are streamed & extracted through the download cache
+        if not (validators.url(package) and fetch_zip(package, package_path)):
             # This is a git repo, clone
             subprocess.run(
                 ["git", "clone", str(package), str(package_path), "-q"], check=True, text=True
             )
         return package_path, lambda: shutil.rmtree(package_path)
 
-    def add(self, package: str):
+    def add(self, packages):
         console.print(
-            f"✨ [yellow]This project is a package, adding package [bold cyan]{package}[/bold cyan] [i]into the package directory[/i] to avoid conflicts when importing package {self.package_name} into other projects[/yellow]"
+            f"✨ [yellow]This project is a package, adding {'package' if len(packages) == 1 else 'packages'} [bold cyan]{', '.join(packages)}[/bold cyan] [i]into the package directory[/i] to avoid conflicts when importing package {self.package_name} into other projects[/yellow]"
         )
-        super().add(package, self.src / self.package_name)
+        super().add(packages, self.src / self.package_name)
 
 
 class DishPy:
@@ -286,8 +353,9 @@ class Cli:
             "help": "Add a previously registered package to a project",
             "arguments": [
                 {
-                    "name": "package",
-                    "help": "Package name in name:version format (required)",
+                    "name": "packages",
+                    "nargs": "+",
+                    "help": "One or more packages in name:version format (required)",
                 },
             ],
         },
@@ -298,7 +366,11 @@ class Cli:
                     "name": "--verbose",
                     "action": "store_true",
                     "help": "Enable verbose output",
-                }
+                },
+                {
+                    "name": "--profile",
+                    "help": "Build with the constants of a [profiles.<name>] section of dishpy.toml",
+                },
             ],
         },
         "mut": {
@@ -312,7 +384,39 @@ class Cli:
                     "name": "--verbose",
                     "action": "store_true",
                     "help": "Enable verbose output",
-                }
+                },
+                {
+                    "name": "--report",
+                    "action": "store_true",
+                    "help": "Estimate how much of the brain's memory the built program takes, and what takes it",
+                },
+                {
+                    "name": "--no-optimize",
+                    "action": "store_true",
+                    "help": "Don't fold constants into the code that uses them",
+                    "exclusive": "optimizer",
+                },
+                {
+                    "name": "--inline",
+                    "action": "store_true",
+                    "help": "Replace calls to small helper functions with the expressions they return",
+                },
+                {
+                    "name": "--profile",
+                    "help": "Build with the constants of a [profiles.<name>] section of dishpy.toml",
+                    "exclusive": "optimizer",
+                },
+            ],
+        },
+        "lint": {
+            "help": "Check the project for code that is slow on the brain",
+            "arguments": [
+                {
+                    "name": "--perf",
+                    "action": "store_true",
+                    "help": "Look for loops that starve other threads, and work repeated on every pass of a loop "
+                    "(the default, and currently the only check)",
+                },
             ],
         },
         "upload": {
@@ -361,6 +465,265 @@ class Cli:
             "help": "open terminal for the V5 brain",
             "arguments": [],
         },
+        "sim": {
+            "help": "Run the project on a simulated robot on this computer",
+            "subcommands": {
+                "run": {
+                    "help": "Build the project and run it headless, faster than realtime",
+                    "arguments": [
+                        {
+                            "name": "--time",
+                            "type": float,
+                            "default": 15.0,
+                            "help": "Simulated seconds to run for (defaults to 15, the length of autonomous)",
+                        },
+                        {
+                            "name": "--step",
+                            "type": float,
+                            "default": 10.0,
+                            "help": "Physics step in milliseconds",
+                        },
+                        {
+                            "name": "--screen",
+                            "type": Path,
+                            "metavar": "DIR",
+                            "help": "Save each frame the program draws on the brain's screen as a PNG in this directory",
+                        },
+                        {
+                            "name": "--preview",
+                            "action": "store_true",
+                            "help": "Show each frame the program draws on the brain's screen in the terminal",
+                        },
+                        {
+                            "name": "--record",
+                            "type": Path,
+                            "metavar": "DIR",
+                            "help": "Record the robot's pose, motors and sensors at every physics step as .npy columns "
+                            "in this directory",
+                        },
+                        {
+                            "name": "--build-profile",
+                            "metavar": "NAME",
+                            "help": "Build with the constants of a [profiles.<name>] section of dishpy.toml",
+                        },
+                        {
+                            "name": "--profile",
+                            "action": "store_true",
+                            "help": "Report each thread's CPU time, how fast each loop would run on the brain and the "
+                            "most expensive functions",
+                        },
+                    ],
+                },
+                "sweep": {
+                    "help": "Simulate the project with many values of its module-level constants",
+                    "arguments": [
+                        {
+                            "name": "--grid",
+                            "action": "append",
+                            "default": [],
+                            "metavar": "NAME=VALUES",
+                            "help": "Values to try for a constant, as KP=0.1,0.2,0.5 or KP=0:1:11 (start:stop:count). "
+                            "Constants in other modules are named like lib.pid.KP",
+                        },
+                        {
+                            "name": "--random",
+                            "action": "append",
+                            "default": [],
+                            "metavar": "NAME=LOW:HIGH",
+                            "help": "Draw a constant uniformly between two bounds",
+                        },
+                        {
+                            "name": "--samples",
+                            "type": int,
+                            "default": 100,
+                            "help": "Random draws per grid point (defaults to 100)",
+                        },
+                        {
+                            "name": "--seed",
+                            "type": int,
+                            "default": 0,
+                            "help": "Seed for the random draws",
+                        },
+                        {
+                            "name": "--score",
+                            "metavar": "FILE[:FUNCTION]",
+                            "help": "Function that takes the finished Simulation and returns a score, higher is better "
+                            "(defaults to the function named score)",
+                        },
+                        {
+                            "name": "--output",
+                            "type": Path,
+                            "default": Path(".out") / "sweep.jsonl",
+                            "help": "File to stream results to, one JSON line per run",
+                        },
+                        {
+                            "name": "--time",
+                            "type": float,
+                            "default": 15.0,
+                            "help": "Simulated seconds per run",
+                        },
+                        {
+                            "name": "--step",
+                            "type": float,
+                            "default": 10.0,
+                            "help": "Physics step in milliseconds",
+                        },
+                        {
+                            "name": "--jobs",
+                            "type": int,
+                            "help": "Processes to run on (defaults to one per CPU core)",
+                        },
+                        {
+                            "name": "--chunk",
+                            "type": int,
+                            "help": "Runs handed to a process at a time (picked automatically by default)",
+                        },
+                        {
+                            "name": "--fork-at",
+                            "type": float,
+                            "metavar": "SECONDS",
+                            "help": "Simulate the first SECONDS once with the built constants, then fork a copy of "
+                            "that run for each set of values",
+                        },
+                    ],
+                },
+                "match": {
+                    "help": "Simulate a full match, with the field switching the program's Competition between periods",
+                    "arguments": [
+                        {
+                            "name": "--input",
+                            "type": Path,
+                            "help": "Controller input for driver control: a log from dishpy sim record, "
+                            'or JSON lines like {"t": 1.5, "axis3": 100}',
+                        },
+                        {
+                            "name": "--disabled",
+                            "type": float,
+                            "default": 2.0,
+                            "help": "Seconds disabled before autonomous",
+                        },
+                        {
+                            "name": "--autonomous",
+                            "type": float,
+                            "default": 15.0,
+                            "help": "Length of autonomous in seconds",
+                        },
+                        {
+                            "name": "--pause",
+                            "type": float,
+                            "default": 1.0,
+                            "help": "Seconds disabled between autonomous and driver control",
+                        },
+                        {
+                            "name": "--driver",
+                            "type": float,
+                            "default": 105.0,
+                            "help": "Length of driver control in seconds",
+                        },
+                        {
+                            "name": "--step",
+                            "type": float,
+                            "default": 10.0,
+                            "help": "Physics step in milliseconds",
+                        },
+                        {
+                            "name": "--screen",
+                            "type": Path,
+                            "metavar": "DIR",
+                            "help": "Save each frame the program draws on the brain's screen as a PNG in this directory",
+                        },
+                        {
+                            "name": "--preview",
+                            "action": "store_true",
+                            "help": "Show each frame the program draws on the brain's screen in the terminal",
+                        },
+                        {
+                            "name": "--record",
+                            "type": Path,
+                            "metavar": "DIR",
+                            "help": "Record the robot's pose, motors and sensors at every physics step as .npy columns "
+                            "in this directory",
+                        },
+                        {
+                            "name": "--build-profile",
+                            "metavar": "NAME",
+                            "help": "Build with the constants of a [profiles.<name>] section of dishpy.toml",
+                        },
+                    ],
+                },
+                "record": {
+                    "help": "Record controller input streamed from the brain over the terminal, for sim match --input",
+                    "arguments": [
+                        {
+                            "name": "--output",
+                            "type": Path,
+                            "default": Path(".out") / "driver.ctl",
+                            "help": "File to write the recording to",
+                        },
+                        {
+                            "name": "--from",
+                            "dest": "source",
+                            "type": Path,
+                            "help": "Read a saved terminal capture instead of the brain",
+                        },
+                    ],
+                },
+            },
+        },
+        "registry": {
+            "help": "Share the local package registry over the network",
+            "subcommands": {
+                "serve": {
+                    "help": "Serve the local registry over HTTP so other computers can sync from it",
+                    "arguments": [
+                        {
+                            "name": "--host",
+                            "default": "0.0.0.0",
+                            "help": "Address to listen on (defaults to all interfaces)",
+                        },
+                        {
+                            "name": "--port",
+                            "type": int,
+                            "default": DEFAULT_PORT,
+                            "help": f"Port to listen on (defaults to {DEFAULT_PORT})",
+                        },
+                    ],
+                },
+                "sync": {
+                    "help": "Download every package from a registry server that is missing locally",
+                    "arguments": [
+                        {
+                            "name": "url",
+                            "help": "URL printed by `dishpy registry serve`",
+                        },
+                        {
+                            "name": "--jobs",
+                            "type": int,
+                            "default": 8,
+                            "help": "Number of parallel downloads",
+                        },
+                    ],
+                },
+            },
+        },
+        "cache": {
+            "help": "Inspect and clean up the DishPy cache directory",
+            "subcommands": {
+                "stats": {
+                    "help": "Show what the cache contains and how much space it uses",
+                    "arguments": [],
+                },
+                "gc": {
+                    "help": "Remove leftovers and evict least recently used entries not used by any project",
+                    "arguments": [
+                        {
+                            "name": "--max-size",
+                            "help": "Shrink the cache to this size, e.g. 500MB (defaults to $DISHPY_CACHE_MAX_SIZE)",
+                        }
+                    ],
+                },
+            },
+        },
     }
 
     @staticmethod
@@ -440,20 +803,27 @@ class Cli:
                     sub_parser = sub_subparsers.add_parser(
                         sub_name, help=sub_info["help"]
                     )
-                    for arg in sub_info["arguments"]:
-                        arg_kwargs = {k: v for k, v in arg.items() if k != "name"}
-                        if arg_kwargs.get("type") == "dir_path":
-                            arg_kwargs["type"] = dir_path
-                        sub_parser.add_argument(arg["name"], **arg_kwargs)
+                    Cli._add_arguments(sub_parser, sub_info["arguments"])
             else:
-                for arg in cmd_info["arguments"]:
-                    arg_kwargs = {k: v for k, v in arg.items() if k != "name"}
-                    if arg_kwargs.get("type") == "dir_path":
-                        arg_kwargs["type"] = dir_path
-                    cmd_parser.add_argument(arg["name"], **arg_kwargs)
+                Cli._add_arguments(cmd_parser, cmd_info["arguments"])
 
         return parser
 
+    @staticmethod
+    def _add_arguments(parser, arguments):
+        # arguments with the same "exclusive" key can't be used together
+        groups = {}
+        for arg in arguments:
+            arg_kwargs = {k: v for k, v in arg.items() if k not in ("name", "exclusive")}
+            if arg_kwargs.get("type") == "dir_path":
+                arg_kwargs["type"] = dir_path
+            target = parser
+            if "exclusive" in arg:
+                if arg["exclusive"] not in groups:
+                    groups[arg["exclusive"]] = parser.add_mutually_exclusive_group()
+                target = groups[arg["exclusive"]]
+            target.add_argument(arg["name"], **arg_kwargs)
+
     def __init__(self):
         self.console = console
 
@@ -471,19 +841,29 @@ class Cli:
             self.console.print(f"❌ [red]Error: {e}[/red]")
 
     def add(self, args):
+        # Validate everything against the registry once, before touching the project
         try:
-            assert args.package in Package.list()
+            registered = set(Package.list())
         except Exception:
+            registered = set()
+        missing = [package for package in args.packages if package not in registered]
+        names = [package.split(":")[0] for package in args.packages]
+        if missing:
             self.console.print(
-                f"❌ [red]Error: {args.package} is not a registered package[/red]"
+                f"❌ [red]Error: {', '.join(missing)} {'is not a registered package' if len(missing) == 1 else 'are not registered packages'}[/red]"
             )
             self.console.print(
                 "[red]Run `dishpy package list` to see a list of registered packages[/red]"
             )
             return
+        if len(set(names)) != len(names):
+            self.console.print(
+                "❌ [red]Error: Each package can only be added once per command[/red]"
+            )
+            return
         instance = DishPy(Path())
         try:
-            instance.instance.add(args.package)
+            instance.instance.add(args.packages)
         except Exception as e:
             self.console.print(f"❌ [red]Error: {e}[/red]")
 
@@ -524,10 +904,201 @@ class Cli:
                 raise Exception(f"{path} is a DishPy project, not a package")
             dishpy.instance.register()
             cleanup()
+            enforce_size_cap()
         except Exception as e:
             console.print(f"❌ [red]Error: {e}[/red]")
             return
 
+    def sync(self, args):
+        try:
+            synced = sync(args.url, args.jobs)
+            if synced:
+                console.print(
+                    f"✨ [green]Synced packages [bold cyan]{', '.join(synced)}[/bold cyan][/green]"
+                )
+            else:
+                console.print("✨ [green]Already up to date[/green]")
+            enforce_size_cap()
+        except Exception as e:
+            console.print(f"❌ [red]Error: {e}[/red]")
+
+    def gc(self, args):
+        try:
+            max_size = parse_size(args.max_size) if args.max_size else get_max_size()
+            collect_garbage(max_size)
+        except Exception as e:
+            console.print(f"❌ [red]Error: {e}[/red]")
+
+    @staticmethod
+    def show_screen(sim: Simulation, args):
+        if args.screen:
+            sim.screen.sinks.append(PngFrames(args.screen))
+        if args.preview:
+            sim.screen.sinks.append(TerminalPreview())
+
+    def simulate(self, args):
+        try:
+            instance = DishPy(Path())
+            instance.instance.build(profile=args.build_profile)
+            program = instance.instance.out_dir / "main.py"
+            console.print(f"🤖 [yellow]Simulating {program} for {args.time:g}s...[/yellow]")
+            start = time.perf_counter()
+            sim = Simulation(step_ms=args.step)
+            self.show_screen(sim, args)
+            if args.record:
+                sim.recorder = TrajectoryRecorder(sim, args.record)
+            profiler = Profiler(sim) if args.profile else None
+            sim.run(program, args.time)
+            elapsed = time.perf_counter() - start
+            robot = sim.robot
+            console.print(
+                f"✨ [green]Simulated {sim.clock.seconds:g}s in {elapsed:.2f}s "
+                f"({sim.clock.seconds / max(elapsed, 1e-9):.0f}x realtime)[/green]"
+            )
+            console.print(
+                f"[dim]Robot ended at x={robot.x:.0f}mm y={robot.y:.0f}mm heading={robot.heading:.1f}°[/dim]"
+            )
+            if args.screen:
+                console.print(f"[dim]Saved {sim.screen.frames} frames of the brain's screen to {args.screen}[/dim]")
+            if args.record:
+                sim.recorder.close()
+                console.print(f"[dim]Recorded {sim.recorder.rows} steps to {args.record}[/dim]")
+            if profiler is not None:
+                # the same run again under cProfile, which would have thrown the timings off
+                functions = Profiler(Simulation(step_ms=args.step), functions=True)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    functions.sim.run(program, args.time)
+                self.show_profile(profiler, functions.top_functions())
+        except Exception as e:
+            self.console.print(f"❌ [red]Error: {e}[/red]")
+
+    @staticmethod
+    def show_profile(profiler: Profiler, functions):
+        total = sum(thread.cpu_s for thread in profiler.threads.values()) or 1e-9
+        console.print(f"🔬 [bold]Threads[/bold] [dim](brain times are host times x{profiler.slowdown:g})[/dim]")
+        for thread in sorted(profiler.threads.values(), key=lambda thread: thread.cpu_s, reverse=True):
+            console.print(
+                f"  [bold]{thread.name}[/bold]: {thread.cpu_s * 1000:.1f}ms CPU ({thread.cpu_s / total:.0%}), "
+                f"{thread.slices} slices, longest {thread.longest_slice_s * profiler.slowdown * 1000:.1f}ms on the brain, "
+                f"{thread.read_us / 1000:.1f}ms of device reads"
+            )
+        loops = profiler.loops()
+        if loops:
+            console.print("🔁 [bold]Loops[/bold] [dim](late by ≤" + " ≤".join(f"{edge:g}" for edge in JITTER_BINS[:-1]) + " >ms)[/dim]")
+        for loop in loops:
+            color = "red" if loop.slow else "green"
+            console.print(
+                f"  [{color}]{loop.hz:.1f}Hz[/{color}] of {loop.target_hz:.1f}Hz, jitter {loop.jitter_ms:.2f}ms  "
+                f"[bold]{loop.thread}[/bold] {loop.site}  [dim]{' '.join(str(n) for n in loop.histogram())}[/dim]"
+            )
+        if functions:
+            console.print("🔥 [bold]Most expensive functions[/bold] [dim](own / total CPU time on this computer)[/dim]")
+        for name, calls, own, total in functions:
+            console.print(f"  {own * 1000:8.1f}ms {total * 1000:8.1f}ms {calls:7d}x  {name}")
+
+    def sweep(self, args):
+        try:
+            instance = DishPy(Path())
+            # the sweep replaces constants where they're assigned, so they can't be inlined
+            instance.instance.build(optimize=False)
+            sweep = Sweep(
+                instance.instance.out_dir / "main.py",
+                instance.instance.src,
+                grid=dict(parse_grid(spec) for spec in args.grid),
+                ranges=dict(parse_range(spec) for spec in args.random),
+                samples=args.samples,
+                seed=args.seed,
+            )
+            console.print(f"🧪 [yellow]Sweeping {len(sweep)} runs of {args.time:g}s...[/yellow]")
+            start = time.perf_counter()
+            best = sweep.run(
+                args.output,
+                score=args.score,
+                duration=args.time,
+                step_ms=args.step,
+                jobs=args.jobs,
+                chunk_size=args.chunk,
+                fork_at=args.fork_at,
+            )
+            elapsed = time.perf_counter() - start
+            console.print(
+                f"✨ [green]Finished {len(sweep)} runs in {elapsed:.1f}s, results are in "
+                f"[bold cyan]{args.output}[/bold cyan][/green]"
+            )
+            for row in best:
+                params = ", ".join(f"{k}={v:g}" if isinstance(v, float) else f"{k}={v}" for k, v in row["params"].items())
+                console.print(f"  [bold]{row['score']:.4g}[/bold] {params}")
+        except Exception as e:
+            self.console.print(f"❌ [red]Error: {e}[/red]")
+
+    def match(self, args):
+        try:
+            instance = DishPy(Path())
+            instance.instance.build(profile=args.build_profile)
+            program = instance.instance.out_dir / "main.py"
+            script = load_input(args.input) if args.input else None
+            sim = Simulation(step_ms=args.step)
+            self.show_screen(sim, args)
+            if args.record:
+                sim.recorder = TrajectoryRecorder(sim, args.record)
+            field = Field(
+                sim,
+                disabled=args.disabled,
+                autonomous=args.autonomous,
+                pause=args.pause,
+                driver=args.driver,
+                script=script,
+            )
+            console.print(f"🏁 [yellow]Simulating a {field.duration:g}s match of {program}...[/yellow]")
+            start = time.perf_counter()
+            sim.run(program, field.duration)
+            elapsed = time.perf_counter() - start
+            for seconds, phase in field.log:
+                console.print(f"  [dim]{seconds:6.2f}s[/dim] {phase}")
+            robot = sim.robot
+            console.print(
+                f"✨ [green]Simulated {sim.clock.seconds:g}s in {elapsed:.2f}s "
+                f"({sim.clock.seconds / max(elapsed, 1e-9):.0f}x realtime)[/green]"
+            )
+            console.print(
+                f"[dim]Robot ended at x={robot.x:.0f}mm y={robot.y:.0f}mm heading={robot.heading:.1f}°[/dim]"
+            )
+            if args.screen:
+                console.print(f"[dim]Saved {sim.screen.frames} frames of the brain's screen to {args.screen}[/dim]")
+            if args.record:
+                sim.recorder.close()
+                console.print(f"[dim]Recorded {sim.recorder.rows} steps to {args.record}[/dim]")
+        except Exception as e:
+            self.console.print(f"❌ [red]Error: {e}[/red]")
+
+    def record(self, args):
+        process = None
+        try:
+            if args.source:
+                lines = args.source.open(encoding="utf-8", errors="replace")
+                console.print(f"🎮 [yellow]Recording controller input from {args.source}...[/yellow]")
+            else:
+                process = open_vexcom("--user")
+                lines = process.stdout
+                console.print("🎮 [yellow]Recording controller input from the brain, press Ctrl+C to stop...[/yellow]")
+            with ControllerRecorder(args.output) as recorder, lines:
+                try:
+                    for line in lines:
+                        # everything else the program prints still shows up like in dishpy terminal
+                        if not recorder.feed(line):
+                            sys.stdout.write(line)
+                except KeyboardInterrupt:
+                    pass
+            console.print(
+                f"✨ [green]Recorded {recorder.samples} samples ({recorder.duration:.1f}s) as "
+                f"{args.output.stat().st_size} bytes in [bold cyan]{args.output}[/bold cyan][/green]"
+            )
+        except Exception as e:
+            self.console.print(f"❌ [red]Error: {e}[/red]")
+        finally:
+            if process is not None:
+                process.terminate()
+
     def route(self):
         if len(sys.argv) <= 1 or sys.argv[1] in ["-h", "--help", "help"]:
             self.show_help()
@@ -560,12 +1131,40 @@ class Cli:
                         self.list()
                     case _:
                         self.show_help()
+            case "registry":
+                match args.subcommand:
+                    case "serve":
+                        serve(args.host, args.port)
+                    case "sync":
+                        self.sync(args)
+                    case _:
+                        self.show_help()
+            case "cache":
+                match args.subcommand:
+                    case "stats":
+                        print_stats()
+                    case "gc":
+                        self.gc(args)
+                    case _:
+                        self.show_help()
+            case "sim":
+                match args.subcommand:
+                    case "run":
+                        self.simulate(args)
+                    case "sweep":
+                        self.sweep(args)
+                    case "match":
+                        self.match(args)
+                    case "record":
+                        self.record(args)
+                    case _:
+                        self.show_help()
             case "create":
                 self.create(args)
             case "mu":
                 try:
                     instance = DishPy(Path())
-                    instance.instance.build(args.verbose)
+                    instance.instance.build(args.verbose, profile=args.profile)
                     instance.instance.upload(instance.instance.out_dir / "main.py")
                 except Exception as e:
                     self.console.print(f"❌ [red]Error: {e}[/red]")
@@ -581,7 +1180,15 @@ class Cli:
             case "build":
                 try:
                     instance = DishPy(Path())
-                    instance.instance.build(args.verbose)
+                    instance.instance.build(
+                        args.verbose, args.report, not args.no_optimize, args.inline, args.profile
+                    )
+                except Exception as e:
+                    self.console.print(f"❌ [red]Error: {e}[/red]")
+            case "lint":
+                try:
+                    instance = DishPy(Path())
+                    print_findings(lint_project(instance.instance.main_file), instance.instance.src)
                 except Exception as e:
                     self.console.print(f"❌ [red]Error: {e}[/red]")
             case "upload":
@@ -0,0 +1,764 @@
+"""
+Optimization passes over the combined script, run by `combine_project` after every
+file's symbols have been prefixed, so each module-level name is unique in the whole
+program.
+
+MicroPython looks a global up in the module's dict every time it is used and only folds
+constant integer arithmetic itself, so a tuning constant like
+`WHEEL_MM = 3.25 * 25.4` costs a multiplication when the program loads and a dict
+lookup every time a control loop reads it. Folding and propagating it at build time
+leaves just the number.
+
+Calls are just as expensive: every call to a helper like `clamp` allocates a frame, so
+with `inline` small helpers are also expanded where they're called.
+"""
+
+import ast
+import copy
+import math
+import operator
+
+from rich.console import Console
+
+console = Console()
+
+# constants worth copying to where they're used: anything bigger is cheaper to look up
+MAX_INLINED_STR = 32
+MAX_FOLDED_STR = 256
+MAX_FOLDED_INT_BITS = 64
+# how big a function's returned expression can be, in AST nodes, to be inlined
+MAX_INLINED_NODES = 40
+# builtins that only compute a value, so calling them from an inlined function is fine
+PURE_BUILTINS = frozenset({"abs", "min", "max", "round", "int", "float", "bool", "len", "divmod", "pow"})
+PURE_NODES = (
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Name, ast.Constant, ast.Attribute,
+    ast.Subscript, ast.Slice, ast.Tuple, ast.operator, ast.unaryop, ast.boolop, ast.cmpop, ast.expr_context,
+)  # fmt: skip
+# parts of an expression that can't raise on their own
+QUIET_NODES = (ast.Constant, ast.expr_context, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+# names that let a program reach its globals without naming them, so nothing can be
+# known to be unused
+DYNAMIC_NAMES = frozenset({"globals", "locals", "vars", "eval", "exec", "__import__"})
+# bodies that need at least one statement
+BODIES = (
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.If, ast.For, ast.AsyncFor, ast.While, ast.With,
+    ast.AsyncWith, ast.Try, ast.ExceptHandler, ast.match_case,
+)  # fmt: skip
+
+BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg, ast.Not: operator.not_, ast.Invert: operator.invert}
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _foldable(value) -> bool:
+    """Whether `value` can be written as a literal without growing the script much"""
+    if value is None or isinstance(value, (bool, float)):
+        return not isinstance(value, float) or math.isfinite(value)
+    if isinstance(value, int):
+        return value.bit_length() <= MAX_FOLDED_INT_BITS
+    if isinstance(value, (str, bytes)):
+        return len(value) <= MAX_FOLDED_STR
+    if isinstance(value, tuple):
+        return len(value) <= 16 and all(_foldable(item) for item in value)
+    return False
+
+
+def _too_long(left, right) -> bool:
+    """Whether repeating a sequence would make one too long to fold, checked before building it"""
+    for sequence, count in ((left, right), (right, left)):
+        if isinstance(sequence, (str, bytes, tuple)) and isinstance(count, int):
+            return len(sequence) * count > MAX_FOLDED_STR
+    return False
+
+
+def _inlinable(value) -> bool:
+    """Whether uses of a constant with this value should be replaced by the value itself"""
+    if isinstance(value, str):
+        return len(value) <= MAX_INLINED_STR
+    return value is None or isinstance(value, (bool, int, float))
+
+
+def _literal(node: ast.expr):
+    """The value of a constant expression, or `...` if it isn't one"""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        value = node.operand.value
+        return -value if isinstance(value, (int, float)) and not isinstance(value, bool) else ...
+    if isinstance(node, ast.Tuple) and isinstance(node.ctx, ast.Load):
+        items = tuple(_literal(item) for item in node.elts)
+        return ... if ... in items else items
+    return ...
+
+
+def _constant(value, like: ast.AST) -> ast.expr:
+    if isinstance(value, tuple):
+        node = ast.Tuple([_constant(item, like) for item in value], ast.Load())
+    elif isinstance(value, (int, float)) and not isinstance(value, bool) and math.copysign(1, value) < 0:
+        # a minus sign and a number, so that `unparse` keeps it together in `(-5) ** x` and `(-5).real`
+        node = ast.UnaryOp(ast.USub(), ast.Constant(-value))
+    else:
+        node = ast.Constant(value)
+    return ast.copy_location(node, like)
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """Evaluates arithmetic on literals, and replaces names with the `constants` they hold"""
+
+    def __init__(self, constants: dict[str, object] | None = None):
+        self.constants = dict(constants or {})
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return _constant(self.constants[node.id], node)
+        return node
+
+    def visit_BinOp(self, node: ast.BinOp):
+        self.generic_visit(node)
+        left, right = _literal(node.left), _literal(node.right)
+        op = BINARY.get(type(node.op))
+        if left is ... or right is ... or op is None:
+            return node
+        if isinstance(node.op, ast.Pow) and isinstance(right, int) and abs(right) > MAX_FOLDED_INT_BITS:
+            return node
+        if isinstance(node.op, ast.LShift) and isinstance(right, int) and right > MAX_FOLDED_INT_BITS:
+            return node
+        if isinstance(node.op, ast.Mult) and _too_long(left, right):
+            return node
+        return self._result(node, op, left, right)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        self.generic_visit(node)
+        operand = _literal(node.operand)
+        if operand is ...:
+            return node
+        return self._result(node, UNARY[type(node.op)], operand)
+
+    def visit_Compare(self, node: ast.Compare):
+        self.generic_visit(node)
+        operands = [_literal(operand) for operand in (node.left, *node.comparators)]
+        if ... in operands or not all(type(op) in COMPARE for op in node.ops):
+            return node
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if isinstance(op, (ast.Is, ast.IsNot)) and not {type(left), type(right)} & {type(None), bool}:
+                return node  # identity of other constants isn't the same everywhere
+        try:
+            value = all(COMPARE[type(op)](left, right) for op, left, right in zip(node.ops, operands, operands[1:]))
+        except Exception:
+            return node
+        return _constant(value, node)
+
+    def visit_BoolOp(self, node: ast.BoolOp):
+        self.generic_visit(node)
+        # `True and x` is `x`, and `False and x` is `False`, whatever `x` is
+        deciding = (lambda value: not value) if isinstance(node.op, ast.And) else bool
+        values = []
+        for i, operand in enumerate(node.values):
+            value = _literal(operand)
+            if value is ...:
+                values.append(operand)
+            elif deciding(value):
+                values.append(operand)
+                break
+            elif i == len(node.values) - 1:
+                values.append(operand)
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node: ast.IfExp):
+        self.generic_visit(node)
+        test = _literal(node.test)
+        if test is ...:
+            return node
+        return node.body if test else node.orelse
+
+    @staticmethod
+    def _result(node: ast.expr, op, *args) -> ast.expr:
+        try:
+            value = op(*args)
+        except Exception:
+            # leave it to fail at runtime, where it would have
+            return node
+        return _constant(value, node) if _foldable(value) and not isinstance(value, complex) else node
+
+    def _visit_scope(self, node, shadowed: set[str], body_fields: tuple[str, ...]):
+        """Visit the parts of `node` in its own scope without the constants its names shadow"""
+        outer = self.constants
+        self.constants = {name: value for name, value in outer.items() if name not in shadowed}
+        for field in body_fields:
+            value = getattr(node, field)
+            if isinstance(value, list):
+                setattr(node, field, [self.visit(item) for item in value])
+            elif value is not None:
+                setattr(node, field, self.visit(value))
+        self.constants = outer
+
+    def visit_FunctionDef(self, node):
+        # defaults, decorators and annotations are evaluated where the function is defined
+        node.decorator_list = [self.visit(item) for item in node.decorator_list]
+        node.args.defaults = [self.visit(item) for item in node.args.defaults]
+        node.args.kw_defaults = [item if item is None else self.visit(item) for item in node.args.kw_defaults]
+        self._visit_scope(node, _local_names(node), ("body",))
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        node.args.defaults = [self.visit(item) for item in node.args.defaults]
+        node.args.kw_defaults = [item if item is None else self.visit(item) for item in node.args.kw_defaults]
+        self._visit_scope(node, _local_names(node), ("body",))
+        return node
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        node.decorator_list = [self.visit(item) for item in node.decorator_list]
+        node.bases = [self.visit(item) for item in node.bases]
+        node.keywords = [self.visit(item) for item in node.keywords]
+        self._visit_scope(node, _stored_names(node.body), ("body",))
+        return node
+
+    def _visit_comprehension(self, node):
+        shadowed = set()
+        for generator in node.generators:
+            shadowed |= _stored_names([generator.target])
+        # the first iterable is evaluated outside the comprehension
+        node.generators[0].iter = self.visit(node.generators[0].iter)
+        fields = ("key", "value") if isinstance(node, ast.DictComp) else ("elt",)
+        outer = self.constants
+        self.constants = {name: value for name, value in outer.items() if name not in shadowed}
+        for i, generator in enumerate(node.generators):
+            generator.target = self.visit(generator.target)
+            if i:
+                generator.iter = self.visit(generator.iter)
+            generator.ifs = [self.visit(item) for item in generator.ifs]
+        for field in fields:
+            setattr(node, field, self.visit(getattr(node, field)))
+        self.constants = outer
+        return node
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+
+def _stored_names(nodes) -> set[str]:
+    """Names bound by `nodes` in their own scope, not counting nested functions and classes"""
+    names = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+        elif isinstance(node, ast.Lambda) or isinstance(node, COMPREHENSIONS):
+            continue
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def _local_names(node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda) -> set[str]:
+    args = node.args
+    names = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs}
+    names |= {arg.arg for arg in (args.vararg, args.kwarg) if arg is not None}
+    body = node.body if isinstance(node.body, list) else [node.body]
+    declared = set()
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            declared.update(child.names)
+    return names | (_stored_names(body) - declared)
+
+
+def _rebound_names(tree: ast.Module) -> set[str]:
+    """Module-level names that something other than one plain assignment or definition binds"""
+    counts: dict[str, int] = {}
+    for name in _stored_names_list(tree.body):
+        counts[name] = counts.get(name, 0) + 1
+    rebound = {name for name, count in counts.items() if count > 1}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            rebound.update(node.names)
+        elif isinstance(node, ast.NamedExpr):
+            rebound.add(node.target.id)
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue  # bound once, by the definition
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1) and not (
+            isinstance(node, ast.AnnAssign) and node.value is not None and node.simple
+        ):
+            rebound |= _stored_names([node])
+    return rebound
+
+
+def _stored_names_list(nodes) -> list[str]:
+    """Like `_stored_names`, once for every binding"""
+    names = []
+    for node in nodes:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            names.append(node.targets[0].id)
+            names.extend(_stored_names([node.value]))
+        else:
+            names.extend(_stored_names([node]))
+    return names
+
+
+def fold_constants(tree: ast.Module) -> dict[str, object]:
+    """
+    Fold constant expressions in `tree` and replace every use of a module-level name
+    that is assigned once, to a constant, and never rebound, by that constant. Returns
+    the constants that were propagated.
+    """
+    rebound = _rebound_names(tree)
+    constants: dict[str, object] = {}
+    changed = True
+    while changed:
+        changed = False
+        folder = ConstantFolder(constants)
+        for node in tree.body:
+            if isinstance(node, ast.Assign):
+                target = node.targets[0] if len(node.targets) == 1 else None
+            elif isinstance(node, ast.AnnAssign) and node.value is not None:
+                target = node.target
+            else:
+                continue
+            if not isinstance(target, ast.Name) or target.id in rebound or target.id in constants:
+                continue
+            node.value = folder.visit(node.value)
+            value = _literal(node.value)
+            if value is not ... and _inlinable(value):
+                constants[target.id] = value
+                changed = True
+    ConstantFolder(constants).visit(tree)
+    return constants
+
+
+def _nodes(node: ast.AST) -> int:
+    return sum(1 for _ in ast.walk(node))
+
+
+def _called_functions(node: ast.AST) -> set[str]:
+    return {
+        call.func.id for call in ast.walk(node) if isinstance(call, ast.Call) and isinstance(call.func, ast.Name)
+    }
+
+
+def _conditional_names(node: ast.expr) -> set[str]:
+    """Names in `node` that are only evaluated depending on a condition"""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.IfExp):
+            parts = [child.body, child.orelse]
+        elif isinstance(child, ast.BoolOp):
+            parts = child.values[1:]
+        elif isinstance(child, ast.Compare):
+            parts = child.comparators[1:]
+        else:
+            continue
+        for part in parts:
+            names |= {name.id for name in ast.walk(part) if isinstance(name, ast.Name)}
+    return names
+
+
+def _evaluation_order(node: ast.AST):
+    """The nodes of an expression the optimizer inlines, each after its operands, in the order Python evaluates them"""
+    for child in ast.iter_child_nodes(node):
+        yield from _evaluation_order(child)
+    yield node
+
+
+class Inlinable:
+    """A module-level function that just returns an expression, and can be expanded where it's called"""
+
+    def __init__(self, node: ast.FunctionDef, returned: ast.expr):
+        self.name = node.name
+        self.params = [arg.arg for arg in node.args.args]
+        defaults = node.args.defaults
+        self.defaults = dict(zip(self.params[len(self.params) - len(defaults) :], defaults))
+        self.returned = returned
+        self.uses = {param: 0 for param in self.params}
+        for child in ast.walk(returned):
+            if isinstance(child, ast.Name) and child.id in self.uses:
+                self.uses[child.id] += 1
+        self.conditional = _conditional_names(returned)
+        # the steps of the expression in the order they run, as the parameter each one reads
+        # (or None) and whether it could raise or see a change made by an argument; calling
+        # builtins, `math` and other inlinable functions can raise but changes nothing
+        called = {id(child.func) for child in ast.walk(returned) if isinstance(child, ast.Call)}
+        self.steps = []
+        for child in _evaluation_order(returned):
+            if isinstance(child, ast.Name):
+                quiet = child.id in self.uses or child.id == "math" or id(child) in called
+                self.steps.append((child.id if child.id in self.uses else None, quiet))
+            elif isinstance(child, ast.Attribute) and id(child) in called:
+                self.steps.append((None, True))  # the lookup of `math.sqrt`, the call raises
+            elif not isinstance(child, QUIET_NODES):
+                self.steps.append((None, False))
+        self.free = {
+            child.id for child in ast.walk(returned) if isinstance(child, ast.Name) and child.id not in self.uses
+        }
+        self.calls = _called_functions(returned)
+
+    @classmethod
+    def of(cls, node: ast.stmt) -> "Inlinable | None":
+        """`node` as an `Inlinable`, if it's a function simple enough to inline"""
+        if not isinstance(node, ast.FunctionDef) or node.decorator_list:
+            return None
+        args = node.args
+        if args.posonlyargs or args.kwonlyargs or args.vararg or args.kwarg:
+            return None
+        if not all(isinstance(default, ast.Constant) for default in args.defaults):
+            return None
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+            body = body[1:]  # the docstring
+        if len(body) != 1 or not isinstance(body[0], ast.Return) or body[0].value is None:
+            return None
+        returned = body[0].value
+        if _nodes(returned) > MAX_INLINED_NODES:
+            return None
+        for child in ast.walk(returned):
+            if isinstance(child, ast.Call):
+                if child.keywords or any(isinstance(arg, ast.Starred) for arg in child.args):
+                    return None
+                if not isinstance(child.func, (ast.Name, ast.Attribute)):
+                    return None
+                if isinstance(child.func, ast.Attribute) and not (
+                    isinstance(child.func.value, ast.Name) and child.func.value.id == "math"
+                ):
+                    return None
+            elif not isinstance(child, PURE_NODES):
+                return None
+        return cls(node, returned)
+
+
+def _inlinable_functions(tree: ast.Module) -> dict[str, Inlinable]:
+    """The functions of `tree` that can be inlined, without any that call themselves, even through others"""
+    rebound = _rebound_names(tree)
+    functions = {}
+    for node in tree.body:
+        function = Inlinable.of(node)
+        if function is not None and function.name not in rebound:
+            functions[function.name] = function
+    changed = True
+    while changed:
+        changed = False
+        for name, function in list(functions.items()):
+            calls_other = any(call not in functions and call not in PURE_BUILTINS for call in function.calls)
+            if calls_other or _reaches(functions, name, name):
+                del functions[name]
+                changed = True
+    return functions
+
+
+def _reaches(functions: dict[str, Inlinable], start: str, target: str) -> bool:
+    seen = set()
+    stack = [call for call in functions[start].calls if call in functions]
+    while stack:
+        name = stack.pop()
+        if name == target:
+            return True
+        if name not in seen:
+            seen.add(name)
+            stack.extend(call for call in functions[name].calls if call in functions)
+    return False
+
+
+def _pure(node: ast.expr) -> bool:
+    return all(isinstance(child, PURE_NODES) for child in ast.walk(node))
+
+
+class _Substitute(ast.NodeTransformer):
+    def __init__(self, values: dict[str, ast.expr]):
+        self.values = values
+
+    def visit_Name(self, node: ast.Name):
+        value = self.values.get(node.id)
+        return copy.deepcopy(value) if value is not None else node
+
+
+class Inliner(ast.NodeTransformer):
+    """Replaces calls to `functions` with the expressions they return"""
+
+    def __init__(self, functions: dict[str, Inlinable]):
+        self.functions = functions
+        self.shadowed: list[set[str]] = [set()]
+        self.inlined: dict[str, int] = {}
+
+    def _in_scope(self, node, shadowed: set[str]):
+        self.shadowed.append(self.shadowed[-1] | shadowed)
+        self.generic_visit(node)
+        self.shadowed.pop()
+        return node
+
+    def visit_FunctionDef(self, node):
+        return self._in_scope(node, _local_names(node))
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        return self._in_scope(node, _stored_names(node.body))
+
+    def _visit_comprehension(self, node):
+        targets = set()
+        for generator in node.generators:
+            targets |= _stored_names([generator.target])
+        return self._in_scope(node, targets)
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        function = self.functions.get(node.func.id) if isinstance(node.func, ast.Name) else None
+        if function is None or node.func.id in self.shadowed[-1]:
+            return node
+        values = self._arguments(function, node)
+        if values is None or function.free & self.shadowed[-1]:
+            return node
+        inlined = _Substitute(values).visit(copy.deepcopy(function.returned))
+        self.inlined[function.name] = self.inlined.get(function.name, 0) + 1
+        # the function may have called other functions that can be inlined
+        return self.visit(ast.copy_location(inlined, node))
+
+    @staticmethod
+    def _arguments(function: Inlinable, call: ast.Call) -> dict[str, ast.expr] | None:
+        """What to replace each parameter with, or None if the call can't be inlined"""
+        if len(call.args) > len(function.params) or any(isinstance(arg, ast.Starred) for arg in call.args):
+            return None
+        values = dict(zip(function.params, call.args))
+        for keyword in call.keywords:
+            if keyword.arg is None or keyword.arg not in function.uses or keyword.arg in values:
+                return None
+            values[keyword.arg] = keyword.value
+        for param in function.params:
+            if param not in values:
+                if param not in function.defaults:
+                    return None
+                values[param] = function.defaults[param]
+        # the call evaluates every argument that isn't a constant exactly once, in order, and
+        # before the function's expression, so the inlined expression has to as well: an
+        # argument that is dropped or moved could raise or change something at another time.
+        # Reading a variable can't, so variables can be read in any order, or more than once.
+        evaluated = [param for param, value in values.items() if _literal(value) is ...]
+        if any(function.uses[param] == 0 for param in evaluated):
+            return None
+        if all(isinstance(values[param], ast.Name) for param in evaluated):
+            return values
+        if any(function.uses[param] != 1 or param in function.conditional for param in evaluated):
+            return None
+        reads = [i for i, (param, _) in enumerate(function.steps) if param in evaluated]
+        if [function.steps[i][0] for i in reads] != evaluated:
+            return None
+        # and nothing else that could raise or see what they change can run before the last of them
+        if not all(quiet for _, quiet in function.steps[: reads[-1]]):
+            return None
+        return values
+
+
+def inline_functions(tree: ast.Module) -> dict[str, int]:
+    """
+    Expand calls to small functions of `tree` where they're called: ones that return an
+    expression of their arguments and only compute, don't call themselves, and aren't
+    rebound. The functions stay defined for anything that doesn't call them directly.
+    Returns how many calls of each function were inlined.
+    """
+    functions = _inlinable_functions(tree)
+    inliner = Inliner(functions)
+    tree.body = [
+        node if isinstance(node, ast.FunctionDef) and node.name in functions else inliner.visit(node)
+        for node in tree.body
+    ]
+    return inliner.inlined
+
+
+def set_constants(tree: ast.Module, values: dict[str, object]) -> set[str]:
+    """
+    Assign `values` to the module-level names of `tree` wherever they're assigned at the
+    top level, and return the names that aren't
+    """
+    missing = set(values)
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in values:
+                node.value = _constant(values[target.id], node.value)
+                missing.discard(target.id)
+    return missing
+
+
+class DeadBranches(ast.NodeTransformer):
+    """Replaces `if` statements whose condition is a constant with the branch that runs"""
+
+    def visit_If(self, node: ast.If):
+        self.generic_visit(node)
+        test = _literal(node.test)
+        if test is ...:
+            return node
+        return node.body if test else node.orelse
+
+    def visit_While(self, node: ast.While):
+        self.generic_visit(node)
+        test = _literal(node.test)
+        if test is ... or test:
+            return node
+        return node.orelse
+
+
+def remove_dead_branches(nodes: list[ast.stmt]) -> list[ast.stmt]:
+    """`nodes` without the branches that can never run"""
+    remover = DeadBranches()
+    kept = []
+    for node in nodes:
+        result = remover.visit(node)
+        kept.extend(result if isinstance(result, list) else [result])
+    for node in kept:
+        for child in ast.walk(node):
+            if isinstance(child, BODIES) and not child.body:
+                child.body = [ast.copy_location(ast.Pass(), child)]
+    return kept
+
+
+def _removable(node: ast.stmt) -> str | None:
+    """The name `node` defines, if it only defines it and removing it can't change anything else"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return None if node.decorator_list else node.name
+    if isinstance(node, ast.ClassDef):
+        if node.decorator_list or node.keywords or not all(_pure(base) for base in node.bases):
+            return None
+        for item in node.body:
+            if isinstance(item, ast.Assign) and not _pure(item.value):
+                return None
+            if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Assign, ast.Pass, ast.Expr)):
+                return None
+            if isinstance(item, ast.Expr) and not isinstance(item.value, ast.Constant):
+                return None
+        return node.name
+    if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+        values = ast.walk(node.value)
+        if all(isinstance(child, (*PURE_NODES, ast.List, ast.Dict, ast.Set)) for child in values):
+            return node.targets[0].id
+    return None
+
+
+def unused_definitions(tree: ast.Module) -> list[ast.stmt]:
+    """
+    The module-level definitions of functions, classes and constants that nothing in
+    `tree` uses, including ones only used by other unused definitions
+    """
+    if any(isinstance(node, ast.Name) and node.id in DYNAMIC_NAMES for node in ast.walk(tree)):
+        return []
+    rebound = _rebound_names(tree)
+    uses = [
+        {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+        for node in tree.body
+    ]
+    defines = [_removable(node) for node in tree.body]
+    removed = set()
+    changed = True
+    while changed:
+        changed = False
+        used = set()
+        for i, names in enumerate(uses):
+            if i not in removed:
+                used |= names - {defines[i]}
+        for i, name in enumerate(defines):
+            if name is not None and i not in removed and name not in used and name not in rebound:
+                removed.add(i)
+                changed = True
+    return [tree.body[i] for i in sorted(removed)]
+
+
+def optimize(
+    symbols: list[tuple[str, str]],
+    verbose: bool = False,
+    inline: bool = False,
+    defines: dict[str, tuple[str, object]] | None = None,
+    prune: bool = False,
+) -> list[tuple[str, str]]:
+    """
+    Run the optimization passes over the combined script, given as the code of each
+    symbol in output order (see `combine_project`), and return the new code of each.
+    With `inline`, small functions are also inlined, and what was inlined is reported.
+
+    `defines` maps module-level names to `(name as the user wrote it, value)`, to build
+    the program as if those were the values assigned to them. With `prune`, branches
+    that can never run and definitions nothing uses are removed too, leaving out
+    symbols that were removed entirely.
+    """
+    bodies = [ast.parse(code).body for _, code in symbols]
+    # the passes over the whole program change statements in place, so `bodies` stays in step
+    module = ast.Module([node for body in bodies for node in body], [])
+    if defines:
+        missing = set_constants(module, {name: value for name, (_, value) in defines.items()})
+        if missing:
+            names = ", ".join(sorted(defines[name][0] for name in missing))
+            raise ValueError(f"{names} not assigned at the top level of the program")
+    constants = fold_constants(module)
+    if verbose:
+        print(f"DEBUG: Propagated {len(constants)} constants: {sorted(constants)}")
+    if inline:
+        inlined = inline_functions(module)
+        # arguments that were constants may have made more of the code constant
+        ConstantFolder(constants).visit(module)
+        # the entry file's functions are all in one symbol, the file itself
+        labels = {
+            node.name: name if "::" in name else f"{name}::{node.name}"
+            for (name, _), body in zip(symbols, bodies)
+            for node in body
+            if isinstance(node, ast.FunctionDef)
+        }
+        for function, calls in sorted(inlined.items(), key=lambda item: labels.get(item[0], item[0])):
+            console.print(
+                f"⚡ [green]Inlined[/green] {labels.get(function, function)} [dim]({calls} call{'s' * (calls != 1)})[/dim]"
+            )
+        if not inlined:
+            console.print("⚡ [yellow]No calls could be inlined[/yellow]")
+    unused = set()
+    if prune:
+        bodies = [remove_dead_branches(body) for body in bodies]
+        unused = {id(node) for node in unused_definitions(ast.Module([node for body in bodies for node in body], []))}
+        if verbose and unused:
+            print(f"DEBUG: Removed {len(unused)} unused definitions")
+    optimized = []
+    for (name, _), body in zip(symbols, bodies):
+        body = [node for node in body if id(node) not in unused]
+        if body:
+            optimized.append((name, "\n".join(ast.unparse(ast.fix_missing_locations(node)) for node in body)))
+    return optimized
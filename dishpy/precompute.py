@@ -0,0 +1,372 @@
+"""
+Values worked out when the project is built instead of when the brain starts the
+program: lookup tables, motion profiles, waypoints, anything that only depends on
+constants. Mark a module-level function or assignment with `build_time`:
+
+```python
+from dishpy import build_time
+
+@build_time
+def SINES():
+    return tuple(math.sin(math.radians(degrees)) for degrees in range(360))
+
+SQUARES = build_time(bytes(i * i % 256 for i in range(256)))
+```
+
+The build runs them on this computer, with the module-level statements before them that
+bind or change the names they use (loops, `+=`, `.append(...)` and so on, not just
+assignments), and writes the results into `.out/main.py` as literals
+(`SINES = (0.0, 0.01745..., ...)`), so the brain doesn't spend the start of a match
+computing them. Run without building, in a Python that has dishpy installed, `build_time`
+just evaluates them there and then.
+"""
+
+import ast
+import builtins
+import copy
+import math
+from pathlib import Path
+
+from rich.console import Console
+
+from .optimizer import COMPREHENSIONS, _constant, _local_names, _stored_names
+
+console = Console()
+
+MARKER = "build_time"
+
+
+def build_time(value):
+    """Mark a function or value to be computed when the project is built (see `dishpy.precompute`)"""
+    return value() if callable(value) else value
+
+
+def _vex_exports() -> set[str]:
+    """The names `from vex import *` gives a program"""
+    tree = ast.parse((Path(__file__).parent / "resources" / "vex.py").read_text())
+    names = {"vex"}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            names |= _stored_names([node])
+    return names
+
+
+VEX_NAMES = frozenset(_vex_exports())
+
+
+def is_marker_import(line: str) -> bool:
+    """Whether an import of the combined script only brings in `build_time`, which the brain doesn't have"""
+    node = ast.parse(line).body[0]
+    if isinstance(node, ast.ImportFrom):
+        return node.module is not None and node.module.split(".")[0] == "dishpy"
+    return all(alias.name.split(".")[0] == "dishpy" for alias in node.names)
+
+
+def marker_names(imports: list[str]) -> tuple[set[str], set[str]]:
+    """
+    The ways the `dishpy` imports of the combined script (see `is_marker_import`) let it
+    write `build_time`, like `bt` or `dishpy.build_time`, and every name they bind
+    """
+    markers = {MARKER}
+    bound = {MARKER}
+    for line in imports:
+        node = ast.parse(line).body[0]
+        for alias in node.names:
+            if isinstance(node, ast.ImportFrom):
+                if alias.name in (MARKER, "*"):
+                    markers.add(alias.asname or MARKER)
+                bound.add(alias.asname or alias.name)
+            elif alias.asname:
+                markers.add(f"{alias.asname}.{MARKER}")
+                if alias.name == "dishpy":
+                    markers.add(f"{alias.asname}.precompute.{MARKER}")
+                bound.add(alias.asname)
+            else:
+                markers |= {f"dishpy.{MARKER}", f"dishpy.precompute.{MARKER}"}
+                bound.add("dishpy")
+    return markers, bound
+
+
+def _dotted(node: ast.expr) -> str | None:
+    """`a.b.c` for the expression `a.b.c`, or None if it isn't made of names"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    return ".".join([node.id, *reversed(parts)])
+
+
+def _free_names(node: ast.AST) -> set[str]:
+    """The names `node` reads from the module's globals"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        body = node.body if isinstance(node.body, list) else [node.body]
+        inner = set().union(*(_free_names(item) for item in body)) - _local_names(node)
+        outer = [*getattr(node, "decorator_list", []), *node.args.defaults]
+        outer += [default for default in node.args.kw_defaults if default is not None]
+        return inner.union(*(_free_names(item) for item in outer))
+    if isinstance(node, ast.ClassDef):
+        inner = set().union(*(_free_names(item) for item in node.body)) - _stored_names(node.body)
+        outer = [*node.decorator_list, *node.bases, *(keyword.value for keyword in node.keywords)]
+        return inner.union(*(_free_names(item) for item in outer))
+    if isinstance(node, COMPREHENSIONS):
+        targets = set().union(*(_stored_names([generator.target]) for generator in node.generators))
+        parts = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        for i, generator in enumerate(node.generators):
+            parts += generator.ifs if i == 0 else [generator.iter, *generator.ifs]
+        inner = set().union(*(_free_names(part) for part in parts)) - targets
+        return inner | _free_names(node.generators[0].iter)
+    if isinstance(node, ast.Name):
+        return {node.id} if isinstance(node.ctx, ast.Load) else set()
+    return set().union(*(_free_names(child) for child in ast.iter_child_nodes(node)))
+
+
+def _walk_code(node: ast.AST):
+    """Every node of `node` that runs with it, leaving out the bodies of functions and classes"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            stack.extend([*getattr(node, "decorator_list", []), *node.args.defaults])
+            stack.extend(default for default in node.args.kw_defaults if default is not None)
+        elif isinstance(node, ast.ClassDef):
+            stack.extend([*node.decorator_list, *node.bases, *(keyword.value for keyword in node.keywords)])
+        else:
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _base_name(node: ast.expr) -> str | None:
+    """`x` for `x`, `x.a`, `x[0].b` and so on"""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _reads(node: ast.stmt) -> set[str]:
+    """The names running `node` needs, counting the ones `+=` and its kind update"""
+    names = _free_names(node)
+    for child in _walk_code(node):
+        if isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+            names.add(child.target.id)
+    return names
+
+
+def _marked(node: ast.stmt, markers: set[str]) -> tuple[str, ast.AST] | None:
+    """
+    The name `node` defines and what to evaluate for it, if it is marked with `build_time`,
+    written any of the ways in `markers`
+    """
+    if isinstance(node, ast.FunctionDef) and any(
+        _dotted(decorator) in markers for decorator in node.decorator_list
+    ):
+        if len(node.decorator_list) > 1:
+            raise ValueError(f"{node.name} can't have other decorators than {MARKER}")
+        return node.name, node
+    if isinstance(node, ast.Assign) and len(node.targets) == 1:
+        target, value = node.targets[0], node.value
+    elif isinstance(node, ast.AnnAssign) and node.value is not None:
+        target, value = node.target, node.value
+    else:
+        return None
+    if (
+        isinstance(value, ast.Call)
+        and _dotted(value.func) in markers
+        and isinstance(target, ast.Name)
+    ):
+        if len(value.args) != 1 or value.keywords:
+            raise ValueError(f"{MARKER}() takes exactly one value, for {target.id}")
+        return target.id, value.args[0]
+    return None
+
+
+def _literal_node(value, label: str) -> ast.expr:
+    """`value` written as an expression, or a `ValueError` if it can't be"""
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"{label} contains {value}, which can't be written into the program")
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return _constant(value, ast.Constant(None))
+    if isinstance(value, bytearray):
+        return ast.Call(ast.Name("bytearray", ast.Load()), [ast.Constant(bytes(value))], [])
+    if isinstance(value, tuple):
+        return ast.Tuple([_literal_node(item, label) for item in value], ast.Load())
+    if isinstance(value, list):
+        return ast.List([_literal_node(item, label) for item in value], ast.Load())
+    if isinstance(value, dict):
+        keys = [_literal_node(key, label) for key in value]
+        return ast.Dict(keys, [_literal_node(item, label) for item in value.values()])
+    raise ValueError(
+        f"{label} computed a {type(value).__name__}, which can't be written into the program "
+        "(use numbers, strings, bytes, tuples, lists and dicts)"
+    )
+
+
+def _size(value) -> str:
+    return f"{len(value)} items" if isinstance(value, (tuple, list, dict, bytes, bytearray, str)) else "1 value"
+
+
+class Precomputer:
+    """Evaluates the marked definitions of one combined script, in order"""
+
+    def __init__(self, imports: list[str]):
+        self.imports: dict[str, str] = {}  # name to the import that binds it
+        self.star_imports: list[str] = []
+        for line in imports:
+            node = ast.parse(line).body[0]
+            if isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] == "vex":
+                continue
+            for alias in node.names:
+                if alias.name == "*":
+                    self.star_imports.append(line)
+                elif not (isinstance(node, ast.Import) and alias.name.split(".")[0] == "vex"):
+                    self.imports[(alias.asname or alias.name).split(".")[0]] = line
+        # the module-level statements so far that bind or change each name, which have to
+        # run again, in order, to get its value
+        self.definitions: dict[str, list[ast.stmt]] = {}
+        self.functions: dict[str, ast.FunctionDef | ast.AsyncFunctionDef] = {}
+        self.order: dict[int, int] = {}
+
+    def _effects(self, name: str, seen: set[str]) -> set[str]:
+        """The module-level names calling the function `name` may bind or change"""
+        function = self.functions.get(name)
+        if function is None or name in seen:
+            return set()
+        seen.add(name)
+        local = _local_names(function)
+        names = set()
+        for child in ast.walk(function):
+            if isinstance(child, ast.Global):
+                names.update(child.names)
+        for statement in function.body:
+            names |= self._changed(statement, seen) - local
+        return names
+
+    def _changed(self, node: ast.AST, seen: set[str]) -> set[str]:
+        """Names whose values running `node` may change without binding them"""
+        names = set()
+        for child in _walk_code(node):
+            if isinstance(child, (ast.Attribute, ast.Subscript)) and not isinstance(child.ctx, ast.Load):
+                names.add(_base_name(child.value))
+            elif isinstance(child, ast.Call):
+                if isinstance(child.func, ast.Name) and child.func.id in self.functions:
+                    names |= self._effects(child.func.id, seen)
+                    called = True
+                else:
+                    called = _base_name(child.func) in self.imports
+                if isinstance(child.func, ast.Attribute):
+                    # a method like `append` changes what it is called on, but modules aren't changed
+                    receiver = _base_name(child.func.value)
+                    if receiver not in self.imports:
+                        names.add(receiver)
+                if called:
+                    # and a function of the program or a module may change what it is given
+                    names.update(_base_name(arg) for arg in child.args)
+        return names - VEX_NAMES - {None}
+
+    def define(self, node: ast.stmt):
+        self.order[id(node)] = len(self.order)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self.functions[node.name] = node
+        for name in _stored_names([node]) | self._changed(node, set()):
+            self.definitions.setdefault(name, []).append(node)
+
+    def evaluate(self, label: str, target: ast.AST):
+        """Run `target` with everything it uses, checking that none of it is from `vex`"""
+        if isinstance(target, ast.FunctionDef):
+            target = copy.copy(target)
+            target.decorator_list = []
+        statements: dict[int, ast.stmt] = {}
+        imports = set()
+        seen = set()
+        stack = sorted(_free_names(target) - {MARKER})
+        through: dict[str, str] = {}  # the name whose definition uses each name
+        missing = []
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in self.definitions:
+                for node in self.definitions[name]:
+                    if id(node) not in statements:
+                        statements[id(node)] = node
+                        for used in sorted(_reads(node) - seen):
+                            through.setdefault(used, name)
+                            stack.append(used)
+            elif name in self.imports:
+                imports.add(self.imports[name])
+            elif name in VEX_NAMES:
+                chain = [name]
+                while chain[-1] in through:
+                    chain.append(through[chain[-1]])
+                via = f" (through {', '.join(chain[1:])})" if len(chain) > 1 else ""
+                raise ValueError(f"{label} uses {name} from vex{via}, which only exists on the brain")
+            elif not hasattr(builtins, name):
+                missing.append(name)
+        if missing:
+            if not self.star_imports:
+                raise ValueError(f"{label} uses {', '.join(sorted(missing))}, which isn't defined before it")
+            imports.update(self.star_imports)
+        namespace = {"__name__": "__build_time__"}
+        try:
+            for line in sorted(imports):
+                exec(line, namespace)
+            for node in sorted(statements.values(), key=lambda node: self.order[id(node)]):
+                exec(compile(ast.Module([node], []), label, "exec"), namespace)
+            if isinstance(target, ast.FunctionDef):
+                exec(compile(ast.fix_missing_locations(ast.Module([target], [])), label, "exec"), namespace)
+                return namespace[target.name]()
+            value = eval(compile(ast.fix_missing_locations(ast.Expression(target)), label, "eval"), namespace)
+            return value() if callable(value) else value
+        except Exception as e:
+            raise ValueError(f"computing {label} at build time failed: {type(e).__name__}: {e}") from e
+
+
+def precompute(
+    symbols: list[tuple[str, str]], imports: list[str], marker_imports: list[str], verbose: bool = False
+) -> list[tuple[str, str]]:
+    """
+    Replace the definitions marked with `build_time` in the combined script, given as
+    the code of each symbol in output order (see `combine_project`), by the values they
+    compute. `imports` are the script's external imports, which they may use, and
+    `marker_imports` the `dishpy` ones left out of it.
+    """
+    markers, bound = marker_names(marker_imports)
+    if not any(name in code for _, code in symbols for name in bound):
+        return symbols
+    precomputer = Precomputer(imports)
+    computed = []
+    count = 0
+    for name, code in symbols:
+        body = ast.parse(code).body
+        for i, node in enumerate(body):
+            marked = _marked(node, markers)
+            if marked is not None:
+                symbol, target = marked
+                label = name if "::" in name else f"{name}::{symbol}"
+                value = precomputer.evaluate(label, target)
+                count += 1
+                node = body[i] = ast.copy_location(
+                    ast.Assign([ast.Name(symbol, ast.Store())], _literal_node(value, label)), node
+                )
+                size = len(ast.unparse(node).encode())
+                console.print(
+                    f"🧮 [green]Computed[/green] {label} [dim]({_size(value)}, {size:,} bytes of code)[/dim]"
+                )
+            precomputer.define(node)
+        for child in ast.walk(ast.Module(body, [])):
+            if isinstance(child, (ast.Name, ast.Attribute)) and _dotted(child) in markers:
+                raise ValueError(f"{MARKER} in {name} has to mark a module-level function or assignment")
+        for child in ast.walk(ast.Module(body, [])):
+            if isinstance(child, ast.Name) and child.id in bound:
+                raise ValueError(
+                    f"{name} uses {child.id} from dishpy, which the brain doesn't have "
+                    f"(only {MARKER} can be used, to mark definitions)"
+                )
+        computed.append((name, "\n".join(ast.unparse(ast.fix_missing_locations(node)) for node in body)))
+    if verbose:
+        print(f"DEBUG: Precomputed {count} definitions")
+    return computed
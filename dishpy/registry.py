@@ -0,0 +1,262 @@
+import hashlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import requests
+from rich.console import Console
+
+from .amalgamator import analyze_package
+from .download import extract_zip_file
+from .vexcom import get_vexcom_cache_dir
+
+console = Console()
+
+DEFAULT_PORT = 8787
+CHUNK_SIZE = 64 * 1024
+
+_digests: dict[Path, tuple[float, int, str]] = {}
+
+
+def _sha256(path: Path) -> str:
+    """Hash a file, reusing the previous result while its mtime and size are unchanged"""
+    stat = path.stat()
+    cached = _digests.get(path)
+    if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    _digests[path] = (stat.st_mtime, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _registry_files() -> tuple[dict[str, Path], dict[str, Path]]:
+    cache_dir = get_vexcom_cache_dir()
+    packages = {}
+    bundles = {}
+    if (cache_dir / "packages").exists():
+        for path in (cache_dir / "packages").glob("*.zip"):
+            packages[path.name[:-4]] = path
+    if (cache_dir / "bundles").exists():
+        for path in (cache_dir / "bundles").glob("*.json"):
+            bundles[path.stem] = path
+    return packages, bundles
+
+
+def build_index() -> dict:
+    """Describe every registered package and bundle in the local registry"""
+    packages, bundles = _registry_files()
+    return {
+        "packages": {
+            name: {"sha256": _sha256(path), "size": path.stat().st_size}
+            for name, path in sorted(packages.items())
+        },
+        "bundles": {
+            name: {"sha256": _sha256(path), "size": path.stat().st_size}
+            for name, path in sorted(bundles.items())
+        },
+    }
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    """
+    Serves the local registry:
+
+    * `/index.json` lists every package and bundle with its hash and size
+    * `/packages/<name:version>.zip` and `/bundles/<hash>.json` serve single files
+    * `/archive?packages=a:1,b:2` bundles the given (or all) packages and every
+      bundle into one zip, for seeding machines with a single download
+    """
+
+    server_version = "DishPyRegistry"
+
+    def log_message(self, format, *args):
+        console.print(f"[dim]{self.address_string()} {format % args}[/dim]")
+
+    def _send_bytes(self, data: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_file(self, path: Path, content_type: str):
+        etag = _sha256(path)
+        if self.headers.get("If-None-Match") == f'"{etag}"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.send_header("ETag", f'"{etag}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                self.wfile.write(chunk)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        packages, bundles = _registry_files()
+
+        if path in ("/", "/index.json"):
+            index = json.dumps(build_index()).encode()
+            self._send_bytes(index, "application/json")
+        elif path.startswith("/packages/") and path.endswith(".zip"):
+            name = path[len("/packages/") : -len(".zip")]
+            if name not in packages:
+                self.send_error(404, f"Package {name} is not registered")
+                return
+            self._send_file(packages[name], "application/zip")
+        elif path.startswith("/bundles/") and path.endswith(".json"):
+            name = path[len("/bundles/") : -len(".json")]
+            if name not in bundles:
+                self.send_error(404, f"Bundle {name} not found")
+                return
+            self._send_file(bundles[name], "application/json")
+        elif path == "/archive":
+            requested = parse_qs(url.query).get("packages")
+            names = requested[0].split(",") if requested else sorted(packages)
+            missing = [name for name in names if name not in packages]
+            if missing:
+                self.send_error(404, f"Not registered: {', '.join(missing)}")
+                return
+            buffer = io.BytesIO()
+            # the entries are already compressed, so store them as-is
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+                for name in names:
+                    archive.write(packages[name], f"packages/{name}.zip")
+                for name, bundle in sorted(bundles.items()):
+                    archive.write(bundle, f"bundles/{name}.json")
+            self._send_bytes(buffer.getvalue(), "application/zip")
+        else:
+            self.send_error(404)
+
+
+def _lan_address() -> str:
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            # no packets are sent, this just picks the outgoing interface
+            s.connect(("10.255.255.255", 1))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+
+def serve(host: str = "0.0.0.0", port: int = DEFAULT_PORT):
+    """Serve the local registry over HTTP until interrupted"""
+    server = ThreadingHTTPServer((host, port), RegistryHandler)
+    packages, _ = _registry_files()
+    address = _lan_address() if host == "0.0.0.0" else host
+    console.print(
+        f"📡 [green]Serving {len(packages)} packages at[/green] [bold cyan]http://{address}:{server.server_port}[/bold cyan]"
+    )
+    console.print(
+        f"[dim]Other computers can run `dishpy registry sync http://{address}:{server.server_port}`. Press Ctrl+C to stop.[/dim]"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """The calling thread's own session, since sessions aren't safe to share between threads"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _download(url: str, target: Path, sha256: str):
+    """Download `url` to `target`, verifying its hash before replacing anything"""
+    part = target.with_name(target.name + ".part")
+    digest = hashlib.sha256()
+    with _session().get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(part, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+    if digest.hexdigest() != sha256:
+        part.unlink()
+        raise ValueError(f"Checksum mismatch for {url}")
+    os.replace(part, target)
+
+
+def _build_bundle(zip_path: Path, bundles_dir: Path):
+    """
+    Analyze a package the way registering it does, so a project using it can skip that.
+    Bundles are code that goes into builds, so they're never taken from the server.
+    """
+    name = zip_path.name[: -len(".zip")].split(":")[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        package_dir = Path(tmp) / name
+        extract_zip_file(zip_path, package_dir, 0)
+        bundle = analyze_package(package_dir)
+    part = bundles_dir / f"{bundle['content_hash']}.json.part"
+    with open(part, "w") as f:
+        json.dump(bundle, f)
+    os.replace(part, part.with_suffix(""))
+
+
+def _cache_path(directory: Path, name: str, suffix: str) -> Path:
+    """Where to store the file the server calls `name`, refusing names that would land outside `directory`"""
+    if not name or name in (".", "..") or any(c in name for c in "/\\\0") or name != name.strip():
+        raise ValueError(f"Registry sent an invalid file name {name!r}")
+    target = directory / f"{name}{suffix}"
+    if target.resolve().parent != directory.resolve():
+        raise ValueError(f"Registry sent an invalid file name {name!r}")
+    return target
+
+
+def sync(url: str, jobs: int = 8) -> list[str]:
+    """
+    Fetch every package from a registry server that is missing or different locally,
+    using parallel downloads, and analyze each one into a bundle here. Returns the synced
+    package names.
+    """
+    url = url.rstrip("/")
+    cache_dir = get_vexcom_cache_dir()
+    packages_dir = cache_dir / "packages"
+    bundles_dir = cache_dir / "bundles"
+    packages_dir.mkdir(parents=True, exist_ok=True)
+    bundles_dir.mkdir(parents=True, exist_ok=True)
+
+    response = _session().get(f"{url}/index.json", timeout=30)
+    response.raise_for_status()
+    index = response.json()
+    local_packages, _ = _registry_files()
+
+    downloads = []
+    synced = []
+    for name, info in index.get("packages", {}).items():
+        local = local_packages.get(name)
+        if local is None or _sha256(local) != info["sha256"]:
+            target = _cache_path(packages_dir, name, ".zip")
+            downloads.append((f"{url}/packages/{quote(name)}.zip", target, info["sha256"]))
+            synced.append(name)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(_download, file_url, target, sha256) for file_url, target, sha256 in downloads]
+        for future in futures:
+            future.result()
+        futures = [pool.submit(_build_bundle, target, bundles_dir) for _, target, _ in downloads]
+        for future in futures:
+            future.result()
+    return synced
@@ -524,7 +524,7 @@ REVERSE = DirectionType.REVERSE
 """A direction unit that is defined as backward."""
 LEFT = TurnType.LEFT
 """A turn unit that is defined as left turning."""
-RIGHT = TurnType.LEFT
+RIGHT = TurnType.RIGHT
 """A turn unit that is defined as right turning."""
 DEGREES = RotationUnits.DEG
 """A rotation unit that is measured in degrees."""
@@ -0,0 +1,10 @@
+"""
+Host simulation backend for the `vex` stubs.
+
+`Simulation` loads a private copy of `resources/vex.py`, swaps its devices for
+simulated ones driven by a virtual clock, and runs DishPy programs against it.
+"""
+
+from .runtime import Simulation, SimulationEnd
+
+__all__ = ["Simulation", "SimulationEnd"]
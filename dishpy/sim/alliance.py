@@ -0,0 +1,88 @@
+"""
+Several simulated robots, each running its own program on one virtual clock, so that
+code coordinating two robots over VEXlink can be run without two brains.
+"""
+
+import sys
+from pathlib import Path
+
+from .clock import VirtualClock, to_us
+from .link import Radio
+from .runtime import Simulation
+from .scheduler import Scheduler
+
+
+class Alliance:
+    """
+    Runs a program on each of several `Simulation`s at once. Their threads share one
+    cooperative scheduler and their physics steps together, and their `MessageLink`s
+    and `SerialLink`s connect through one `Radio`.
+
+    ```python
+    alliance = Alliance(Simulation(x=-1200), Simulation(x=1200))
+    alliance.run(["manager/.out/main.py", "worker/.out/main.py"], duration=15)
+    print(alliance.sims[1].robot.x)
+    ```
+
+    Set anything that schedules on a simulation's clock, like a competition `Field`,
+    up after creating the alliance.
+    """
+
+    # the clock steps exactly like a single simulation's
+    next_step_us = Simulation.next_step_us
+    advance_to = Simulation.advance_to
+
+    def __init__(self, *sims: Simulation, radio: Radio | None = None):
+        if len({sim.step_us for sim in sims}) > 1:
+            raise ValueError("every robot in an alliance needs the same physics step")
+        self.sims = list(sims)
+        self.clock = VirtualClock()
+        self.step_us = sims[0].step_us
+        self.radio = radio or Radio()
+        self.deadline_us: int | None = None
+        self._next_step_us = self.step_us
+        self.scheduler = Scheduler(self)
+        for sim in sims:
+            sim.clock = self.clock
+            sim.scheduler = self.scheduler
+            sim.radio = self.radio
+            sim._next_step_us = self._next_step_us
+
+    def step(self):
+        for sim in self.sims:
+            sim.step()
+            sim._next_step_us = self._next_step_us + self.step_us
+
+    def run(self, programs: list[Path | str], duration: float | None = None) -> "Alliance":
+        """Run `programs[i]` on robot `i` until they all finish or `duration` seconds pass"""
+        if len(programs) != len(self.sims):
+            raise ValueError(f"the alliance has {len(self.sims)} robots but {len(programs)} programs were given")
+        programs = [Path(program).resolve() for program in programs]
+        codes = [compile(program.read_text(), str(program), "exec") for program in programs]
+        if duration is not None:
+            self.deadline_us = self.clock.us + to_us(duration * 1000)
+        for sim in self.sims:
+            sim.deadline_us = self.deadline_us
+
+        def run_robot(sim: Simulation, program: Path, code):
+            # each program imports its own robot's `vex` when it starts
+            sys.modules["vex"] = sim.vex
+            exec(code, {"__name__": "__main__", "__file__": str(program)})
+
+        def start():
+            for i, (sim, program, code) in enumerate(zip(self.sims, programs, codes)):
+                self.scheduler.spawn(run_robot, (sim, program, code), f"robot {i}")
+
+        previous = sys.modules.get("vex")
+        paths = list(dict.fromkeys(str(program.parent) for program in programs))
+        sys.path[:0] = paths
+        try:
+            self.scheduler.run(start)
+        finally:
+            for path in paths:
+                sys.path.remove(path)
+            if previous is None:
+                sys.modules.pop("vex", None)
+            else:
+                sys.modules["vex"] = previous
+        return self
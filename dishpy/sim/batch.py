@@ -0,0 +1,480 @@
+"""
+Batch simulation: one program run on many robots at once, for example to see how an
+autonomous copes with differences in mass, wheels, cartridges and friction.
+
+Every robot runs its own copy of the program on a shared virtual clock, so closed loop
+code reacts to its own robot, while the motor and drivetrain physics of all of them
+advance together as NumPy arrays.
+"""
+
+import math
+import sys
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("batch simulation needs NumPy, install it with `pip install 'dishpy[sim]'`") from e
+
+from .clock import VirtualClock, to_us
+from .events import Events
+from .geometry import FieldGeometry
+from .link import Radio
+from .models import (
+    CARTRIDGE_RPM,
+    MAX_VOLTAGE,
+    STALL_CURRENT,
+    STALL_TORQUE_100RPM,
+    DrivetrainModel,
+    MotorModel,
+    Robot,
+)
+from .runtime import Simulation, load_vex
+from .scheduler import Scheduler
+from .screen import Screen
+from .sensors import SensorBank
+
+MODES = ("stop", "velocity", "voltage", "position")
+BRAKES = ("COAST", "BRAKE", "HOLD")
+STOP, VELOCITY, VOLTAGE, POSITION = range(4)
+COAST, BRAKE, HOLD = range(3)
+
+
+def approach_speeds(error, velocity, rate, tau, max_rpm, speed):
+    """`models.approach_speed` over arrays"""
+    predicted = error - rate * velocity * tau
+    decel = rate * max_rpm / (2 * tau)
+    return np.copysign(np.minimum(speed, np.sqrt(2 * decel * np.abs(predicted)) / rate), predicted)
+
+
+class MotorBank:
+    """The state of every motor of every robot in a batch, one array entry per motor"""
+
+    FIELDS = (
+        "max_rpm",
+        "stall_torque",
+        "friction",
+        "load_time_constant",
+        "torque_limit",
+        "target",
+        "max_speed",
+        "hold",
+        "position",
+        "velocity",
+        "command",
+        "voltage",
+        "current",
+        "temperature",
+        "disabled",
+    )
+
+    def __init__(self, capacity: int = 64):
+        self.count = 0
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity))
+        self.mode = np.zeros(capacity, np.int8)
+        self.brake = np.zeros(capacity, np.int8)
+        self.stop_at = np.full(capacity, -1, np.int64)
+
+    def add(self, max_rpm: float) -> int:
+        if self.count == len(self.position):
+            self._grow()
+        i = self.count
+        self.count += 1
+        self.max_rpm[i] = max_rpm
+        self.stall_torque[i] = STALL_TORQUE_100RPM * 100 / max_rpm
+        self.torque_limit[i] = 1.0
+        self.max_speed[i] = max_rpm
+        self.temperature[i] = 25.0
+        return i
+
+    def _grow(self):
+        for name in (*self.FIELDS, "mode", "brake", "stop_at"):
+            old = getattr(self, name)
+            new = np.full(len(old) * 2, -1 if name == "stop_at" else 0, old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _stop(self, motors):
+        self.mode[motors] = STOP
+        self.hold[motors] = self.position[motors]
+        self.stop_at[motors] = -1
+
+    def update(self, dt: float, now_us: int):
+        """`MotorModel.update` for every motor at once"""
+        n = self.count
+        ended = (self.stop_at[:n] >= 0) & (self.stop_at[:n] <= now_us)
+        if ended.any():
+            self._stop(np.flatnonzero(ended))
+
+        mode = self.mode[:n]
+        brake = self.brake[:n]
+        target = self.target[:n]
+        position = self.position[:n]
+        velocity = self.velocity[:n]
+        load = self.load_time_constant[:n]
+        tau = MotorModel.time_constant + load
+        limit = self.max_rpm[:n] * (1 - self.friction[:n])
+
+        error = target - position
+        settled = (mode == POSITION) & (np.abs(error) <= MotorModel.settle_tolerance)
+        if settled.any():
+            self._stop(np.flatnonzero(settled))
+
+        desired = np.zeros(n)
+        spinning = mode == VELOCITY
+        desired[spinning] = np.clip(target[spinning], -limit[spinning], limit[spinning])
+        powered = mode == VOLTAGE
+        desired[powered] = target[powered] / MAX_VOLTAGE * limit[powered]
+        moving = mode == POSITION
+        speed = np.minimum(self.max_speed[:n][moving], limit[moving])
+        desired[moving] = approach_speeds(
+            error[moving], velocity[moving], 6, tau[moving], limit[moving], speed
+        )
+        holding = (mode == STOP) & (brake == HOLD)
+        desired[holding] = approach_speeds(
+            self.hold[:n][holding] - position[holding],
+            velocity[holding],
+            6,
+            tau[holding],
+            limit[holding],
+            limit[holding],
+        )
+        braking = (mode == STOP) & (brake == BRAKE)
+        tau[braking] = MotorModel.brake_time_constant + load[braking]
+        coasting = ((mode == STOP) & (brake == COAST)) | (self.disabled[:n] > 0)
+        desired[coasting] = 0.0
+        tau[coasting] = MotorModel.coast_time_constant + load[coasting]
+
+        torque_limit = self.torque_limit[:n]
+        tau /= np.where(torque_limit > 0, torque_limit, 1e-9)
+        previous = velocity.copy()
+        velocity += (desired - previous) * (1 - np.exp(-dt / tau))
+        position += (previous + velocity) * 3 * dt
+
+        max_rpm = self.max_rpm[:n]
+        self.command[:n] = desired
+        self.voltage[:n] = desired / max_rpm * MAX_VOLTAGE
+        effort = np.abs(desired - velocity) / max_rpm * 4 + self.friction[:n]
+        current = np.where(coasting, 0.0, STALL_CURRENT * np.minimum(effort, torque_limit))
+        self.current[:n] = current
+        temperature = self.temperature[:n]
+        temperature += (current**2 * 0.5 - (temperature - 25) * 0.01) * dt
+
+
+def _bank_field(name: str):
+    def get(self):
+        return float(getattr(self._bank, name)[self._index])
+
+    def set(self, value):
+        getattr(self._bank, name)[self._index] = value
+
+    return property(get, set)
+
+
+class MotorView(MotorModel):
+    """A `MotorModel` whose state lives in a `MotorBank`, so the devices work unchanged"""
+
+    def __init__(self, bank: MotorBank, index: int, port: int):
+        self._bank = bank
+        self._index = index
+        self.port = port
+
+    @property
+    def mode(self) -> str:
+        return MODES[self._bank.mode[self._index]]
+
+    @mode.setter
+    def mode(self, value: str):
+        self._bank.mode[self._index] = MODES.index(value)
+
+    @property
+    def brake(self) -> str:
+        return BRAKES[self._bank.brake[self._index]]
+
+    @brake.setter
+    def brake(self, value: str):
+        self._bank.brake[self._index] = BRAKES.index(value)
+
+    @property
+    def stop_at(self) -> int | None:
+        stop_at = int(self._bank.stop_at[self._index])
+        return None if stop_at < 0 else stop_at
+
+    @stop_at.setter
+    def stop_at(self, value: int | None):
+        self._bank.stop_at[self._index] = -1 if value is None else value
+
+
+for _name in MotorBank.FIELDS:
+    setattr(MotorView, _name, _bank_field(_name))
+
+
+class RobotBank:
+    """The pose and motion of every robot in a batch"""
+
+    FIELDS = ("x", "y", "rotation", "mass", "velocity", "angular_velocity", "acceleration", "distance")
+
+    def __init__(self, n: int, x, y, heading, mass):
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(n))
+        self.x[:], self.y[:], self.rotation[:], self.mass[:] = x, y, heading, mass
+
+    @property
+    def heading(self):
+        return self.rotation % 360
+
+    def move(self, robots, left, right, track_width, dt: float):
+        """`Robot.move` for the robots at indices `robots`"""
+        velocity = (left + right) / 2
+        omega = np.degrees((left - right) / track_width)
+        mid = np.radians(self.rotation[robots] + omega * dt / 2)
+        self.x[robots] += velocity * np.sin(mid) * dt
+        self.y[robots] += velocity * np.cos(mid) * dt
+        self.rotation[robots] += omega * dt
+        self.distance[robots] += velocity * dt
+        self.acceleration[robots] = (velocity - self.velocity[robots]) / dt
+        self.velocity[robots] = velocity
+        self.angular_velocity[robots] = omega
+
+
+class RobotView(Robot):
+    """A `Robot` whose state lives in a `RobotBank`"""
+
+    def __init__(self, bank: RobotBank, index: int):
+        self._bank = bank
+        self._index = index
+
+
+for _name in RobotBank.FIELDS:
+    setattr(RobotView, _name, _bank_field(_name))
+
+
+def _per_robot(value, n: int, dtype=float):
+    return np.broadcast_to(np.asarray(value, dtype), (n,)).copy()
+
+
+class Lane(Simulation):
+    """
+    One robot of a `BatchSimulation`. It is the `Simulation` its program's devices see,
+    but its clock, threads and events are the batch's and its models are views into the
+    batch's arrays.
+    """
+
+    def __init__(self, batch: "BatchSimulation", index: int):
+        self.batch = batch
+        self.index = index
+        self.clock = batch.clock
+        self.step_us = batch.step_us
+        self.robot = RobotView(batch.robots, index)
+        self.motors: list[MotorView] = []
+        self.drivetrains: list[DrivetrainModel] = []
+        self.devices = []
+        self.controllers = batch.controllers
+        self._read_cost_us = 0
+        self.scheduler = batch.scheduler
+        self.events = batch.events
+        self.field = None
+        self.enabled = True
+        self.inputs = {}
+        # thousands of robots drawing their dashboards would only cost memory and time
+        self.screen = Screen(self, rasterize=False)
+        self.geometry = batch.geometry
+        self.radio = batch.radio
+        self.sensors = batch.sensors
+        self.mounts = batch.mounts
+        self.vex = load_vex(self)
+
+    @property
+    def deadline_us(self) -> int | None:
+        return self.batch.deadline_us
+
+    @property
+    def next_step_us(self) -> int:
+        return self.batch.next_step_us
+
+    def add_motor(self, port: int, max_rpm: int, device=None) -> MotorView:
+        model = MotorView(self.batch.motors, self.batch.motors.add(max_rpm), port)
+        model.friction = self.batch.friction[self.index]
+        self.motors.append(model)
+        if device is not None:
+            self.devices.append(device)
+        return model
+
+    def add_drivetrain(self, model: DrivetrainModel) -> DrivetrainModel:
+        if not self.drivetrains:
+            self.drivetrains.append(model)
+            self.batch._add_drivetrain(self.index, model)
+        return model
+
+    def advance_to(self, us: int):
+        self.batch.advance_to(us)
+
+    def step(self):
+        self.batch.step()
+
+
+class BatchSimulation:
+    """
+    Runs one DishPy program on `n` simulated robots at once.
+
+    Any robot parameter can be a single value for every robot or a sequence with one
+    value per robot: the starting pose, `mass` in kg, `wheel_scale` (multiplies the
+    drivetrain's wheel travel, e.g. for worn wheels), `gearing` (a `GearSetting` or its
+    name, replacing the cartridges the program gives its drive motors) and `friction`
+    (the fraction of free speed each motor loses).
+
+    ```python
+    rng = np.random.default_rng(0)
+    batch = BatchSimulation(1000, mass=rng.normal(6.8, 0.5, 1000))
+    batch.run(".out/main.py", duration=15)
+    print(batch.robots.x, batch.trajectories.shape)  # (1000, 1500, 3)
+    ```
+    """
+
+    # the clock steps exactly like a single simulation's
+    next_step_us = Simulation.next_step_us
+    advance_to = Simulation.advance_to
+
+    def __init__(
+        self,
+        n: int,
+        step_ms: float = 10,
+        x=0.0,
+        y=0.0,
+        heading=0.0,
+        mass=6.8,
+        wheel_scale=1.0,
+        gearing=None,
+        friction=0.0,
+        seed: int = 0,
+    ):
+        self.n = n
+        self.clock = VirtualClock()
+        self.step_us = to_us(step_ms)
+        self.robots = RobotBank(n, x, y, heading, _per_robot(mass, n))
+        self.motors = MotorBank(max(64, n * 8))
+        self.wheel_scale = _per_robot(wheel_scale, n)
+        self.gearing = [getattr(g, "name", g) for g in _per_robot(gearing, n, object)]
+        self.friction = _per_robot(friction, n)
+        self.controllers = []
+        self.deadline_us: int | None = None
+        self._next_step_us = self.step_us
+        self._drivetrains: dict[tuple[int, int], list[tuple[int, list[int], list[int], float, float]]] = {}
+        self._groups = None
+        self.times: list[int] = []
+        self._poses = []
+        self.scheduler = Scheduler(self)
+        self.events = Events(self)
+        # the field is shared, so its movable elements stay put rather than being
+        # pushed around by every robot at once
+        self.geometry = FieldGeometry()
+        self._near = None
+        self.radio = Radio()
+        # every robot's sensors are sampled together, each with its own noise
+        self.sensors = SensorBank(self, seed)
+        self.mounts = {}
+        self.lanes = [Lane(self, i) for i in range(n)]
+
+    def _add_drivetrain(self, index: int, model: DrivetrainModel):
+        gearing = self.gearing[index]
+        for motor in model.left + model.right:
+            if gearing is not None:
+                motor.max_rpm = motor.max_speed = CARTRIDGE_RPM[gearing]
+                motor.stall_torque = STALL_TORQUE_100RPM * 100 / motor.max_rpm
+        model.wheel_travel *= self.wheel_scale[index]
+        # robots are grouped by their number of left and right motors, so each group
+        # is a rectangular block of motor indices
+        left = [m._index for m in model.left]
+        right = [m._index for m in model.right]
+        self._drivetrains.setdefault((len(left), len(right)), []).append(
+            (index, left, right, model.wheel_travel / 60 / model.gear_ratio, model.track_width)
+        )
+        self._groups = None
+
+    def _drive_groups(self):
+        if self._groups is None:
+            self._groups = [
+                tuple(np.array(column) for column in zip(*drivetrains))
+                for drivetrains in self._drivetrains.values()
+            ]
+        return self._groups
+
+    def step(self):
+        dt = self.step_us / 1_000_000
+        if self.controllers:
+            self.controllers[:] = [c for c in self.controllers if not c()]
+        self.motors.update(dt, self.clock.us)
+        velocity = self.motors.velocity
+        for robots, left, right, scale, track_width in self._drive_groups():
+            left_speed = velocity[left].mean(axis=1) * scale
+            right_speed = -velocity[right].mean(axis=1) * scale
+            self.robots.move(robots, left_speed, right_speed, track_width, dt)
+        self._collide(dt)
+        self.sensors.sample(self.clock.us)
+        robots = self.robots
+        self.times.append(self.clock.us)
+        self._poses.append(np.stack((robots.x, robots.y, robots.heading), axis=1))
+
+    def _near_cells(self):
+        """Which grid cells a robot could touch a field element from, with the grid's origin"""
+        geometry = self.geometry
+        if self._near is None or self._near[0] != geometry.version:
+            cells = geometry.grid.cells
+            reach = math.ceil(math.hypot(Robot.width, Robot.length) / 2 / geometry.grid.cell)
+            i0 = min(i for i, _ in cells) - reach
+            j0 = min(j for _, j in cells) - reach
+            shape = (max(i for i, _ in cells) + reach + 1 - i0, max(j for _, j in cells) + reach + 1 - j0)
+            near = np.zeros(shape, bool)
+            for i, j in cells:
+                near[i - i0 - reach : i - i0 + reach + 1, j - j0 - reach : j - j0 + reach + 1] = True
+            self._near = (geometry.version, near, i0, j0)
+        return self._near[1:]
+
+    def _collide(self, dt: float):
+        if not self.geometry.elements:
+            return
+        # only robots close to some element need the exact (and much slower) check
+        near, i0, j0 = self._near_cells()
+        robots = self.robots
+        i = np.floor(robots.x / self.geometry.grid.cell).astype(int) - i0
+        j = np.floor(robots.y / self.geometry.grid.cell).astype(int) - j0
+        inside = (i >= 0) & (i < near.shape[0]) & (j >= 0) & (j < near.shape[1])
+        candidates = np.flatnonzero(inside)
+        for index in candidates[near[i[candidates], j[candidates]]]:
+            self.geometry.collide(self.lanes[index].robot, dt, push_objects=False)
+
+    @property
+    def trajectories(self):
+        """Every robot's `(x, y, heading)` after each step, shaped `(n, steps, 3)`"""
+        if not self._poses:
+            return np.zeros((self.n, 0, 3))
+        return np.stack(self._poses, axis=1)
+
+    def run(self, program: Path | str, duration: float | None = None) -> "BatchSimulation":
+        """Run a program on every robot until they all finish or `duration` seconds pass"""
+        program = Path(program).resolve()
+        code = compile(program.read_text(), str(program), "exec")
+        if duration is not None:
+            self.deadline_us = self.clock.us + to_us(duration * 1000)
+
+        def run_lane(lane: Lane):
+            # each robot's copy of the program imports its own `vex` when it starts
+            sys.modules["vex"] = lane.vex
+            exec(code, {"__name__": "__main__", "__file__": str(program)})
+
+        def start():
+            for lane in self.lanes:
+                self.scheduler.spawn(run_lane, (lane,), f"robot {lane.index}")
+
+        previous = sys.modules.get("vex")
+        sys.path.insert(0, str(program.parent))
+        try:
+            self.scheduler.run(start)
+        finally:
+            sys.path.remove(str(program.parent))
+            if previous is None:
+                sys.modules.pop("vex", None)
+            else:
+                sys.modules["vex"] = previous
+        return self
@@ -0,0 +1,25 @@
+class SimulationEnd(BaseException):
+    """Raised when the simulation reaches its deadline, to unwind the running program"""
+
+
+class VirtualClock:
+    """
+    Simulated time, kept in integer microseconds so runs are exactly reproducible
+    no matter how many small waits they add up.
+    """
+
+    def __init__(self):
+        self.us = 0
+
+    @property
+    def msec(self) -> float:
+        return self.us / 1000
+
+    @property
+    def seconds(self) -> float:
+        return self.us / 1_000_000
+
+
+def to_us(ms: float) -> int:
+    """Convert milliseconds to whole clock microseconds"""
+    return int(round(ms * 1000))
@@ -0,0 +1,155 @@
+"""
+Match simulation: a field controller that runs `vex.Competition` programs through the
+phases of a match, and scripted controller input for driver control.
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from .clock import to_us
+
+AXES = ("axis1", "axis2", "axis3", "axis4")
+BUTTONS = (
+    "buttonL1",
+    "buttonL2",
+    "buttonR1",
+    "buttonR2",
+    "buttonUp",
+    "buttonDown",
+    "buttonLeft",
+    "buttonRight",
+    "buttonX",
+    "buttonB",
+    "buttonY",
+    "buttonA",
+)
+
+
+class ControllerInput:
+    """The live state of one simulated controller: axes in percent, buttons as booleans"""
+
+    def __init__(self):
+        self.values: dict[str, Any] = {name: 0 for name in AXES} | {name: False for name in BUTTONS}
+
+    def set(self, **values):
+        unknown = set(values) - set(self.values)
+        if unknown:
+            raise ValueError(f"unknown controls {', '.join(sorted(unknown))}")
+        for name, value in values.items():
+            self.values[name] = max(-100, min(100, value)) if name in AXES else bool(value)
+
+
+class ControllerScript:
+    """
+    Timed controller input, with times in seconds from the start of driver control.
+
+    ```python
+    script = ControllerScript().at(0, axis3=100).at(1.5, axis3=0, axis1=50).at(2, buttonA=True)
+    ```
+
+    Scripts can also be loaded from JSON lines such as `{"t": 1.5, "axis3": 0}`, with an
+    optional `"controller": "PARTNER"`.
+    """
+
+    def __init__(self):
+        self.keyframes: list[tuple[float, str, dict[str, Any]]] = []
+
+    def at(self, seconds: float, controller: str = "PRIMARY", **values) -> "ControllerScript":
+        self.keyframes.append((seconds, controller, values))
+        return self
+
+    @classmethod
+    def load(cls, path: Path | str) -> "ControllerScript":
+        script = cls()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    values = json.loads(line)
+                    script.at(values.pop("t"), values.pop("controller", "PRIMARY"), **values)
+        return script
+
+    def frames(self) -> list[tuple[float, str, dict[str, Any]]]:
+        """The keyframes in the order they happen"""
+        return sorted(self.keyframes, key=lambda keyframe: keyframe[0])
+
+    @property
+    def duration(self) -> float:
+        return max((t for t, _, _ in self.keyframes), default=0.0)
+
+
+class Field:
+    """
+    A simulated field controller. Creating one before `Simulation.run` makes the
+    program's `Competition` go through a match on the virtual clock: disabled, then
+    autonomous, then driver control, then disabled again once the match is over.
+
+    Like on a real field, each period's callback runs in its own thread that is stopped
+    when the period ends, other threads keep running, and motors get no power while the
+    robot is disabled. `script` (a `ControllerScript` or a recorded `ControllerLog`) is
+    played back from the start of driver control.
+    """
+
+    def __init__(
+        self,
+        sim,
+        disabled: float = 2.0,
+        autonomous: float = 15.0,
+        pause: float = 1.0,
+        driver: float = 105.0,
+        script=None,
+    ):
+        self.sim = sim
+        self.script = script
+        self.phase = "disabled"
+        self.log: list[tuple[float, str]] = []
+        self.competitions = []
+        self._threads = []
+        sim.field = self
+        self._set_enabled(False)
+
+        start = sim.clock.us
+        for phase, seconds in (
+            ("autonomous", disabled),
+            ("disabled", disabled + autonomous),
+            ("driver", disabled + autonomous + pause),
+            ("disabled", disabled + autonomous + pause + driver),
+        ):
+            sim.scheduler.call_at(start + to_us(seconds * 1000), lambda phase=phase: self._enter(phase))
+        self.duration = disabled + autonomous + pause + driver
+
+    @property
+    def enabled(self) -> bool:
+        return self.phase != "disabled"
+
+    def register(self, competition):
+        self.competitions.append(competition)
+        # a program that is late to create its Competition still gets the current period
+        if self.enabled:
+            self._start(competition)
+
+    def _set_enabled(self, enabled: bool):
+        self.sim.enabled = enabled
+        for motor in self.sim.motors:
+            motor.disabled = not enabled
+
+    def _enter(self, phase: str):
+        for task in self._threads:
+            self.sim.scheduler.stop(task)
+        self._threads = []
+        self.phase = phase
+        self.log.append((self.sim.clock.seconds, phase))
+        self._set_enabled(self.enabled)
+        if phase == "driver" and self.script is not None:
+            self.sim.play(self.script)
+        for competition in self.competitions:
+            self._start(competition)
+
+    def _start(self, competition):
+        if self.phase == "autonomous":
+            callback, name = competition._auton_cb, "autonomous"
+        elif self.phase == "driver":
+            callback, name = competition._driver_cb, "driver"
+        else:
+            return
+        self._threads.append(self.sim.scheduler.spawn(callback, name=name))
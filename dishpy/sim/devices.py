@@ -0,0 +1,1243 @@
+"""
+Simulated versions of the `vex` classes.
+
+Each class here is a mixin that `install` layers over the matching stub class of a freshly
+loaded `vex` module, so docstrings, signatures and `isinstance` checks keep working while
+the behavior comes from the models of the owning `Simulation` (`self._sim`).
+"""
+
+import colorsys
+import math
+import sys
+from typing import Callable
+
+from .clock import to_us
+from .competition import AXES, BUTTONS
+from .events import changed, falling, rising
+from .models import CARTRIDGE_RPM, STALL_CURRENT, DrivetrainModel, approach_speed, clamp
+from .screen import FONT_CELLS, HEIGHT, WIDTH
+from .geometry import PERIMETER
+from .link import pack_message, unpack_message
+from .sensors import DISTANCE_RANGE, NOTHING_DETECTED, SensorMount, TrackingWheel
+
+MIN_TURN_SPEED = 2.0  # rpm
+COLLISION_G = 1.0  # acceleration that counts as a collision for `Inertial.collision`
+RAW_SIZES = {"NONE": 0, "SMALL": 100, "MEDIUM": 250, "LARGE": 400}  # `Distance.object_rawsize` by size
+
+
+def _name(units) -> str | None:
+    return None if units is None else units.name
+
+
+def to_msec(value: float, units) -> float:
+    return value * 1000 if _name(units) == "SECONDS" else value
+
+
+def to_rpm(value: float, units, max_rpm: float) -> float:
+    match _name(units):
+        case "PCT" | "PERCENT":
+            return value / 100 * max_rpm
+        case "DPS":
+            return value / 6
+        case _:
+            return value
+
+
+def from_rpm(rpm: float, units, max_rpm: float) -> float:
+    match _name(units):
+        case "PCT" | "PERCENT":
+            return rpm / max_rpm * 100
+        case "DPS":
+            return rpm * 6
+        case _:
+            return rpm
+
+
+def to_degrees(value: float, units) -> float:
+    return value * 360 if _name(units) == "REV" else value
+
+
+def from_degrees(degrees: float, units) -> float:
+    return degrees / 360 if _name(units) == "REV" else degrees
+
+
+def to_mm(value: float, units) -> float:
+    match _name(units):
+        case "IN":
+            return value * 25.4
+        case "CM":
+            return value * 10
+        case _:
+            return value
+
+
+def from_mm(mm: float, units) -> float:
+    match _name(units):
+        case "IN":
+            return mm / 25.4
+        case "CM":
+            return mm / 10
+        case _:
+            return mm
+
+
+def direction_sign(direction) -> int:
+    return -1 if _name(direction) == "REVERSE" else 1
+
+
+def _move_args(args: tuple, kwargs: dict) -> dict:
+    """Sort the positional arguments of `spin_for`-style calls, which may stop early at `wait`"""
+    values = {"units": None, "velocity": None, "units_v": None, "wait": True}
+    for name, arg in zip(values, args):
+        if isinstance(arg, bool):
+            values["wait"] = arg
+            break
+        values[name] = arg
+    values.update(kwargs)
+    return values
+
+
+def _watch(device, name: str, sample, callback, arg, trigger=changed):
+    """Register `callback` to run whenever `trigger` holds for a sampled device value"""
+    event = device._vex.Event(callback, arg)
+    device._sim.events.watch((id(device), name), sample, trigger).events.append(event)
+    return event
+
+
+def _motors(motor_or_group) -> list:
+    return list(getattr(motor_or_group, "_motors", [motor_or_group]))
+
+
+class Timer:
+    def __init__(self):
+        super().__init__()
+        self._start = self._sim.clock.us
+
+    def time(self, units=None):
+        self._sim.poll()
+        elapsed = (self._sim.clock.us - self._start) / 1000
+        return elapsed / 1000 if _name(units) == "SECONDS" else elapsed
+
+    def value(self):
+        return self.time() / 1000
+
+    def clear(self):
+        self._start = self._sim.clock.us
+
+    def reset(self):
+        self.clear()
+
+    def system(self):
+        self._sim.poll()
+        return self._sim.clock.us // 1000
+
+    def system_high_res(self):
+        self._sim.poll()
+        return self._sim.clock.us
+
+    def event(self, callback, delay, arg=()):
+        self._sim.events.call_later(delay, callback, tuple(arg))
+
+
+class Event:
+    def __init__(self, callback=None, arg=()):
+        super().__init__(callback, arg)
+        self._handlers = []
+        if callback is not None:
+            self.set(callback, arg)
+
+    def __call__(self, callback, arg=()):
+        self.set(callback, arg)
+
+    def set(self, callback, arg=()):
+        self._handlers.append((callback, tuple(arg)))
+
+    def broadcast(self):
+        self._sim.events.start(self._handlers)
+
+    def broadcast_and_wait(self, timeout=60000):
+        broadcast = self._sim.events.start(self._handlers)
+        self._sim.wait_until(lambda: broadcast.done, timeout)
+
+
+class Thread:
+    def __init__(self, callback, arg=()):
+        super().__init__(callback, arg)
+        self._task = self._sim.scheduler.spawn(callback, tuple(arg))
+
+    def stop(self):
+        self._sim.scheduler.stop(self._task)
+
+    @classmethod
+    def sleep_for(cls, duration, units=None):
+        cls._sim.sleep(to_msec(duration, units))
+
+
+class Competition:
+    def __init__(self, driver, autonomous):
+        super().__init__(driver, autonomous)
+        field = self._sim.field
+        if field is None:
+            # like a brain with nothing plugged into its controller's competition port
+            self._driver_thread = self._sim.scheduler.spawn(driver, name="driver")
+        else:
+            field.register(self)
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._sim.enabled
+
+    @classmethod
+    def is_driver_control(cls):
+        field = cls._sim.field
+        return field is None or field.phase == "driver"
+
+    @classmethod
+    def is_autonomous(cls):
+        field = cls._sim.field
+        return field is not None and field.phase == "autonomous"
+
+    @classmethod
+    def is_competition_switch(cls):
+        return False
+
+    @classmethod
+    def is_field_control(cls):
+        return cls._sim.field is not None
+
+
+class ControllerAxis:
+    # the stub `Controller` creates its axes with no arguments before they are replaced
+    def __init__(self, controller: str = "PRIMARY", name: str = "axis1"):
+        super().__init__()
+        self._controller = controller
+        self._control = name
+
+    def _read(self):
+        return self._sim.controller_input(self._controller).values[self._control]
+
+    def position(self):
+        return self._read()
+
+    def value(self):
+        return int(self._read() * 127 / 100)
+
+    def changed(self, callback, arg=()):
+        return _watch(self, "changed", self._read, callback, arg)
+
+
+class ControllerButton:
+    def __init__(self, controller: str = "PRIMARY", name: str = "buttonA"):
+        super().__init__()
+        self._controller = controller
+        self._control = name
+
+    def pressing(self):
+        return self._sim.controller_input(self._controller).values[self._control]
+
+    def pressed(self, callback, arg=()):
+        return _watch(self, "pressed", self.pressing, callback, arg, rising)
+
+    def released(self, callback, arg=()):
+        return _watch(self, "released", self.pressing, callback, arg, falling)
+
+
+class Controller:
+    _nested = {"Axis": ControllerAxis, "Button": ControllerButton}
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        controller = _name(args[0]) if args else "PRIMARY"
+        for name in AXES:
+            setattr(self, name, self.Axis(controller, name))
+        for name in BUTTONS:
+            setattr(self, name, self.Button(controller, name))
+
+
+def _web(text: str) -> int:
+    digits = text.lstrip("#")
+    if len(digits) == 3:
+        digits = "".join(digit * 2 for digit in digits)
+    return int(digits, 16)
+
+
+def _color(vex, color) -> bytes | None:
+    """RGB bytes for any of the ways `vex` takes a color, or None for transparent"""
+    if color is vex.Color.TRANSPARENT or getattr(color, "_transparent", False):
+        return None
+    value = getattr(color, "value", color)
+    if isinstance(value, str):
+        value = _web(value)
+    return (int(value) & 0xFFFFFF).to_bytes(3, "big")
+
+
+def _format(args: tuple, kwargs: dict) -> str:
+    precision = kwargs.get("precision", 2)
+    return kwargs.get("sep", " ").join(f"{arg:.{precision}f}" if isinstance(arg, float) else str(arg) for arg in args)
+
+
+class Color:
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.value = 0
+        self._transparent = False
+        if args:
+            self.rgb(*args)
+
+    def rgb(self, *args):
+        if len(args) == 3:
+            red, green, blue = (int(value) & 0xFF for value in args)
+            self.value = red << 16 | green << 8 | blue
+        else:
+            self._transparent = args[0] is self._vex.Color.TRANSPARENT
+            rgb = _color(self._vex, args[0])
+            self.value = 0 if rgb is None else int.from_bytes(rgb, "big")
+        return self.value
+
+    def hsv(self, hue, saturation, value):
+        red, green, blue = colorsys.hsv_to_rgb(hue % 360 / 360, saturation, value)
+        return self.rgb(round(red * 255), round(green * 255), round(blue * 255))
+
+    def web(self, value):
+        return self.rgb(value)
+
+    def is_transparent(self):
+        return self._transparent
+
+
+class BrainLcd:
+    # everything is drawn by the simulation's `Screen`, shared by every `Brain`
+    def __init__(self):
+        super().__init__()
+        self._screen = self._sim.screen
+
+    def set_cursor(self, row, col):
+        self._screen.row, self._screen.column = int(row), int(col)
+
+    def column(self):
+        return self._screen.column
+
+    def row(self):
+        return self._screen.row
+
+    def set_origin(self, x, y):
+        self._screen.origin = (int(x), int(y))
+
+    def set_font(self, fontname):
+        self._screen.font = FONT_CELLS.get(_name(fontname), FONT_CELLS["MONO20"])
+
+    def set_pen_width(self, width):
+        self._screen.pen_width = int(width)
+
+    def set_pen_color(self, color):
+        self._screen.pen = _color(self._vex, color)
+
+    def set_fill_color(self, color):
+        self._screen.fill = _color(self._vex, color)
+
+    def clear_screen(self, color=None):
+        self._screen.clear(_color(self._vex, self._vex.Color.BLACK if color is None else color))
+
+    def clear_line(self, number=None, color=None):
+        self.clear_row(number, color)
+
+    def clear_row(self, number=None, color=None):
+        row = self._screen.row if number is None else int(number)
+        self._screen.clear_row(row, _color(self._vex, self._vex.Color.BLACK if color is None else color))
+
+    def new_line(self):
+        self.next_row()
+
+    def next_row(self):
+        self._screen.row, self._screen.column = self._screen.row + 1, 1
+
+    def draw_pixel(self, x, y):
+        self._screen.draw_pixel(int(x), int(y))
+
+    def draw_line(self, x1, y1, x2, y2):
+        self._screen.draw_line(int(x1), int(y1), int(x2), int(y2))
+
+    def draw_rectangle(self, x, y, width, height, color=None):
+        fill = self._screen.fill if color is None else _color(self._vex, color)
+        self._screen.draw_rectangle(int(x), int(y), int(width), int(height), fill)
+
+    def draw_circle(self, x, y, radius, color=None):
+        fill = self._screen.fill if color is None else _color(self._vex, color)
+        self._screen.draw_circle(int(x), int(y), int(radius), fill)
+
+    def get_string_width(self, *args):
+        return len(_format(args, {})) * self._screen.font[0]
+
+    def get_string_height(self, *args):
+        return self._screen.font[1]
+
+    def print(self, *args, **kwargs):
+        self._screen.print(_format(args, kwargs))
+
+    def print_at(self, *args, x=0, y=0, opaque=True, **kwargs):
+        # `y` is where the text sits, so it is drawn above it
+        top = int(y) - self._screen.font[1] * 7 // 8
+        self._screen.text(_format(args, kwargs), int(x), top, opaque)
+
+    def render(self):
+        self._screen.render()
+        return True
+
+    def set_clip_region(self, x, y, width, height):
+        ox, oy = self._screen.origin
+        x, y = int(x) + ox, int(y) + oy
+        self._screen.clip = (max(x, 0), max(y, 0), min(x + int(width), WIDTH), min(y + int(height), HEIGHT))
+
+
+class Brain:
+    _nested = {"Lcd": BrainLcd}
+
+
+class Motor:
+    def __init__(self, port: int, *args):
+        super().__init__(port, *args)
+        cartridge = "RATIO18_1"
+        reverse = False
+        for arg in args:
+            if isinstance(arg, bool):
+                reverse = arg
+            elif arg is not None:
+                cartridge = arg.name
+        self._model = self._sim.add_motor(port, CARTRIDGE_RPM.get(cartridge, 200), self)
+        self._sign = -1 if reverse else 1
+        self._offset = 0.0
+        self._default_rpm = self._model.max_rpm / 2
+        self._brake = "COAST"
+
+    def _user_position(self) -> float:
+        return self._sign * self._model.position + self._offset
+
+    def _speed(self, velocity, units) -> float:
+        if velocity is None:
+            return self._default_rpm
+        return to_rpm(velocity, units, self._model.max_rpm)
+
+    def _wait(self) -> bool:
+        done = self._sim.wait_until(lambda: self._model.done, self._timeout)
+        if not done:
+            self.stop()
+        return done
+
+    def set_velocity(self, value, units=None):
+        self._default_rpm = to_rpm(value, units, self._model.max_rpm)
+
+    def set_reversed(self, value: bool):
+        position = self._user_position()
+        self._sign = -1 if value else 1
+        self._offset = position - self._sign * self._model.position
+
+    def set_stopping(self, value):
+        self._brake = value.name
+        if self._model.mode == "stop":
+            self._model.brake = self._brake
+
+    def reset_position(self):
+        self.set_position(0)
+
+    def set_position(self, value, units=None):
+        self._offset = to_degrees(value, units) - self._sign * self._model.position
+
+    def set_timeout(self, value, units=None):
+        self._timeout = to_msec(value, units)
+
+    def get_timeout(self):
+        return self._timeout
+
+    def spin(self, direction, *args, **kwargs):
+        velocity = kwargs.get("velocity", args[0] if args else None)
+        units = kwargs.get("units", args[1] if len(args) > 1 else None)
+        sign = self._sign * direction_sign(direction)
+        if units is not None and type(units).__name__ == "VoltageUnits":
+            volts = velocity / 1000 if units.name == "mV" else velocity
+            self._model.spin_voltage(sign * volts)
+        else:
+            self._model.spin(sign * self._speed(velocity, units))
+
+    def spin_to_position(self, rotation, *args, **kwargs):
+        move = _move_args(args, kwargs)
+        target = (to_degrees(rotation, move["units"]) - self._offset) * self._sign
+        self._model.move_to(target, self._speed(move["velocity"], move["units_v"]))
+        self._model.brake = self._brake
+        return self._wait() if move["wait"] else False
+
+    def spin_for(self, direction, rot_or_time, *args, **kwargs):
+        move = _move_args(args, kwargs)
+        units = move["units"]
+        sign = self._sign * direction_sign(direction)
+        speed = self._speed(move["velocity"], move["units_v"])
+        if units is not None and type(units).__name__ == "TimeUnits":
+            self._model.spin(sign * speed)
+            self._model.stop_at = self._sim.clock.us + to_us(to_msec(rot_or_time, units))
+        else:
+            target = self._model.position + sign * to_degrees(rot_or_time, units)
+            self._model.move_to(target, speed)
+        self._model.brake = self._brake
+        return self._wait() if move["wait"] else False
+
+    def is_spinning(self):
+        self._sim.poll()
+        return not self._model.done
+
+    def is_done(self):
+        self._sim.poll()
+        return self._model.done
+
+    def is_spinning_mode(self):
+        return self._model.mode in ("velocity", "voltage")
+
+    def stop(self, mode=None):
+        self._model.stop(mode.name if mode is not None else self._brake)
+
+    def set_max_torque(self, value, units=None):
+        match _name(units):
+            case "PERCENT":
+                limit = value / 100
+            case "AMP":
+                limit = value / STALL_CURRENT
+            case _:
+                limit = value / self._model.stall_torque
+        self._model.torque_limit = clamp(limit, 0.0, 1.0)
+
+    def direction(self):
+        velocity = self._sign * self._model.velocity
+        return self._vex.REVERSE if velocity < 0 else self._vex.FORWARD
+
+    def position(self, *args):
+        self._sim.poll()
+        return from_degrees(self._user_position(), args[0] if args else None)
+
+    def velocity(self, *args):
+        self._sim.poll()
+        rpm = self._sign * self._model.velocity
+        return from_rpm(rpm, args[0] if args else None, self._model.max_rpm)
+
+    def current(self, *args):
+        self._sim.poll()
+        if _name(args[0] if args else None) == "PERCENT":
+            return self._model.current / STALL_CURRENT * 100
+        return self._model.current
+
+    def power(self, *args):
+        self._sim.poll()
+        return self._model.power
+
+    def torque(self, *args):
+        self._sim.poll()
+        if _name(args[0] if args else None) == "INLB":
+            return self._model.torque * 8.8507
+        return self._model.torque
+
+    def efficiency(self, *args):
+        self._sim.poll()
+        return self._model.efficiency
+
+    def temperature(self, *args):
+        self._sim.poll()
+        celsius = self._model.temperature
+        match _name(args[0] if args else None):
+            case "PERCENT":
+                # the brain reports 0% at 20C and 100% at the 70C cutoff
+                return clamp((celsius - 20) * 2, 0, 100)
+            case "FAHRENHEIT":
+                return celsius * 9 / 5 + 32
+            case _:
+                return celsius
+
+    def command(self, *args):
+        rpm = self._sign * self._model.command
+        return from_rpm(rpm, args[0] if args else None, self._model.max_rpm)
+
+
+class MotorGroup:
+    def __waitForCompletionAll(self):
+        # block until the moves finish, rather than polling every 10ms like the stub
+        models = [m._model for m in self._motors]
+        timeout = self._timeout if self._timeout < sys.maxsize else None
+        done = self._sim.wait_until(lambda: all(m.done for m in models), timeout)
+        if not done:
+            self.stop()
+        return done
+
+
+class DriveTrain:
+    def __init__(
+        self,
+        lm,
+        rm,
+        wheelTravel=300,
+        trackWidth=320,
+        wheelBase=320,
+        units=None,
+        externalGearRatio=1.0,
+    ):
+        Motor = self._vex.Motor
+        MotorGroup = self._vex.MotorGroup
+        if not isinstance(lm, (Motor, MotorGroup)) or not isinstance(rm, (Motor, MotorGroup)):
+            raise TypeError("must pass two motors or motor groups")
+        self.lm = lm
+        self.rm = rm
+        self._left = _motors(lm)
+        self._right = _motors(rm)
+        self._model = self._sim.add_drivetrain(
+            DrivetrainModel(
+                self._sim.robot,
+                [m._model for m in self._left],
+                [m._model for m in self._right],
+                to_mm(wheelTravel, units),
+                to_mm(trackWidth, units),
+                to_mm(wheelBase, units),
+                externalGearRatio,
+            )
+        )
+        max_rpm = self._left[0]._model.max_rpm
+        self._drive_rpm = max_rpm / 2
+        self._turn_rpm = max_rpm / 2
+        self._timeout = 0
+        self._turning = False
+        self._sim.devices.append(self)
+
+    @property
+    def _all(self) -> list:
+        return self._left + self._right
+
+    def _rpm(self, velocity, units, default: float) -> float:
+        if velocity is None:
+            return default
+        return to_rpm(velocity, units, self._left[0]._model.max_rpm)
+
+    def _wheel_degrees(self, mm: float) -> float:
+        return mm / self._model.wheel_travel * 360 * self._model.gear_ratio
+
+    def _wait(self, condition) -> bool:
+        done = self._sim.wait_until(condition, self._timeout or None)
+        if not done:
+            self.stop()
+        return done
+
+    def _run(self, left_direction, right_direction, degrees: float, rpm: float, wait: bool):
+        self._turning = False
+        for motors, direction in ((self._left, left_direction), (self._right, right_direction)):
+            for m in motors:
+                m.spin_for(direction, degrees, self._vex.DEGREES, rpm, self._vex.RPM, False)
+        if wait:
+            return self._wait(lambda: all(m._model.done for m in self._all))
+        return False
+
+    def set_drive_velocity(self, velocity, units=None):
+        self._drive_rpm = self._rpm(velocity, units, self._drive_rpm)
+
+    def set_turn_velocity(self, velocity, units=None):
+        self._turn_rpm = self._rpm(velocity, units, self._turn_rpm)
+
+    def set_stopping(self, mode=None):
+        for m in self._all:
+            m.set_stopping(mode if mode is not None else self._vex.COAST)
+
+    def set_timeout(self, timeout, units=None):
+        self._timeout = max(0, to_msec(timeout, units))
+
+    def get_timeout(self):
+        return self._timeout
+
+    def drive(self, direction, velocity=None, units=None):
+        rpm = self._rpm(velocity, units, self._drive_rpm)
+        self._turning = False
+        for m in self._all:
+            m.spin(direction, rpm, self._vex.RPM)
+
+    def drive_for(self, direction, distance, units=None, velocity=None, units_v=None, wait=True):
+        if units is None:
+            units = self._vex.INCHES
+        degrees = self._wheel_degrees(to_mm(distance, units))
+        rpm = self._rpm(velocity, units_v, self._drive_rpm)
+        return self._run(direction, direction, degrees, rpm, wait)
+
+    def _turn_directions(self, direction):
+        forward, reverse = self._vex.FORWARD, self._vex.REVERSE
+        return (forward, reverse) if _name(direction) == "RIGHT" else (reverse, forward)
+
+    def turn(self, direction, velocity=None, units=None):
+        rpm = self._rpm(velocity, units, self._turn_rpm)
+        left, right = self._turn_directions(direction)
+        self._turning = False
+        for motors, spin_direction in ((self._left, left), (self._right, right)):
+            for m in motors:
+                m.spin(spin_direction, rpm, self._vex.RPM)
+
+    def turn_for(self, direction, angle, units=None, velocity=None, units_v=None, wait=True):
+        arc = math.radians(to_degrees(angle, units)) * self._model.track_width / 2
+        rpm = self._rpm(velocity, units_v, self._turn_rpm)
+        left, right = self._turn_directions(direction)
+        return self._run(left, right, self._wheel_degrees(arc), rpm, wait)
+
+    def is_moving(self):
+        self._sim.poll()
+        return self._turning or not all(m._model.done for m in self._all)
+
+    def is_done(self):
+        return not self.is_moving()
+
+    def stop(self, mode=None):
+        self._turning = False
+        for m in self._all:
+            m.stop(mode)
+
+    def velocity(self, units=None):
+        self._sim.poll()
+        left = self._left[0]
+        right = self._right[0]
+        rpm = (left._sign * left._model.velocity + right._sign * right._model.velocity) / 2
+        return from_rpm(rpm, units, left._model.max_rpm)
+
+    def current(self, units=None):
+        return sum(m.current(units) for m in self._all)
+
+    def power(self, units=None):
+        return sum(m.power(units) for m in self._all)
+
+    def torque(self, units=None):
+        return sum(m.torque(units) for m in self._all)
+
+    def efficiency(self, units=None):
+        return sum(m.efficiency(units) for m in self._all) / len(self._all)
+
+    def temperature(self, units=None):
+        return sum(m.temperature(units) for m in self._all) / len(self._all)
+
+
+class SmartDrive(DriveTrain):
+    def __init__(
+        self,
+        lm,
+        rm,
+        g,
+        wheelTravel=300,
+        trackWidth=320,
+        wheelBase=320,
+        units=None,
+        externalGearRatio=1.0,
+    ):
+        if not isinstance(g, (self._vex.Gyro, self._vex.Inertial, self._vex.Gps)):
+            raise TypeError("must pass Gyro, Inertial or Gps instance")
+        DriveTrain.__init__(self, lm, rm, wheelTravel, trackWidth, wheelBase, units, externalGearRatio)
+        self.g = g
+        self._turn_threshold = 1.0
+        self._turn_constant = 1.0
+        self._turn_sign = 1
+
+    def _turn_to(self, target: float, velocity, units_v, wait: bool):
+        """Turn until the sensor's rotation reaches `target`, closing the loop every physics step"""
+        speed = self._rpm(velocity, units_v, self._turn_rpm)
+        self._turning = True
+
+        def control():
+            if not self._turning:
+                return True
+            error = target - self.g._sim_rotation()
+            if abs(error) <= self._turn_threshold:
+                for m in self._all:
+                    m._model.stop(m._brake)
+                self._turning = False
+                return True
+            model = self._model
+            motor = model.left[0]
+            rate = model.turn_rate
+            rpm = approach_speed(
+                error,
+                model.robot.angular_velocity / rate,
+                rate,
+                motor.time_constant + motor.load_time_constant,
+                motor.max_rpm * self._turn_constant,
+                speed,
+            )
+            if abs(rpm) < MIN_TURN_SPEED:
+                rpm = math.copysign(MIN_TURN_SPEED, rpm)
+            rpm *= self._turn_sign
+            for m in self._left:
+                m._model.spin(m._sign * rpm)
+            for m in self._right:
+                m._model.spin(-m._sign * rpm)
+            return False
+
+        self._sim.add_controller(control)
+        if wait:
+            return self._wait(lambda: not self._turning)
+        return False
+
+    def set_turn_threshold(self, value):
+        self._turn_threshold = value
+
+    def set_turn_constant(self, value):
+        self._turn_constant = value
+
+    def set_turn_direction_reverse(self, value):
+        self._turn_sign = -1 if value else 1
+
+    def set_heading(self, value, units=None):
+        self.g.set_heading(value, units)
+
+    def heading(self, units=None):
+        return self.g.heading(units)
+
+    def set_rotation(self, value, units=None):
+        self.g.set_rotation(value, units)
+
+    def rotation(self, units=None):
+        return self.g.rotation(units)
+
+    def turn_to_heading(self, angle, units=None, velocity=None, units_v=None, wait=True):
+        heading = self.g._sim_rotation() % 360
+        error = (to_degrees(angle, units) - heading + 180) % 360 - 180
+        return self._turn_to(self.g._sim_rotation() + error, velocity, units_v, wait)
+
+    def turn_to_rotation(self, angle, units=None, velocity=None, units_v=None, wait=True):
+        return self._turn_to(to_degrees(angle, units), velocity, units_v, wait)
+
+    def turn_for(self, direction, angle, units=None, velocity=None, units_v=None, wait=True):
+        sign = 1 if _name(direction) == "RIGHT" else -1
+        target = self.g._sim_rotation() + sign * to_degrees(angle, units)
+        return self._turn_to(target, velocity, units_v, wait)
+
+    def is_turning(self):
+        self._sim.poll()
+        return self._turning
+
+
+class Inertial:
+    calibration_ms = 2000
+    _rotation_kind = "Inertial.rotation"
+
+    def __init__(self, port, *args):
+        super().__init__(port, *args)
+        robot = self._robot = self._sim.robot
+        self._label = f"{type(self).__name__.lower()}{port + 1}"
+        self._rotation = self._sim.sensors.add(self._rotation_kind, lambda: robot.rotation, f"{self._label}.rotation")
+        self._rate = self._sim.sensors.add("Inertial.rate", lambda: robot.angular_velocity, f"{self._label}.rate")
+        self._heading_offset = 0.0
+        self._rotation_offset = 0.0
+        self._calibrated_at = 0
+        self._sim.devices.append(self)
+
+    def _sim_rotation(self) -> float:
+        return self._rotation.value + self._rotation_offset
+
+    def set_heading(self, value, units=None):
+        self._heading_offset = to_degrees(value, units) - self._rotation.value
+
+    def reset_heading(self):
+        self.set_heading(0)
+
+    def heading(self, units=None):
+        self._sim.poll()
+        return from_degrees((self._rotation.value + self._heading_offset) % 360, units)
+
+    def set_rotation(self, value, units=None):
+        self._rotation_offset = to_degrees(value, units) - self._rotation.value
+
+    def reset_rotation(self):
+        self.set_rotation(0)
+
+    def rotation(self, units=None):
+        self._sim.poll()
+        return from_degrees(self._sim_rotation(), units)
+
+    def changed(self, callback, arg=()):
+        reading = self._rotation
+        return _watch(self, "changed", lambda: round((reading.value + self._heading_offset) % 360, 2), callback, arg)
+
+    def collision(self, callback, arg=()):
+        robot = self._robot
+        return _watch(self, "collision", lambda: abs(robot.acceleration) / 9806.65 > COLLISION_G, callback, arg, rising)
+
+    def calibrate(self):
+        self._calibrated_at = self._sim.clock.us + to_us(self.calibration_ms)
+
+    def is_calibrating(self):
+        self._sim.poll()
+        return self._sim.clock.us < self._calibrated_at
+
+    def orientation(self, axis, units=None):
+        self._sim.poll()
+        if _name(axis) != "YAW":
+            return 0.0
+        yaw = (self._rotation.value + self._heading_offset + 180) % 360 - 180
+        return from_degrees(yaw, units)
+
+    def gyro_rate(self, axis, units=None):
+        self._sim.poll()
+        return self._rate.value if _name(axis) == "ZAXIS" else 0.0
+
+    def acceleration(self, axis):
+        """Acceleration in g, with +X to the robot's right and +Y forwards"""
+        self._sim.poll()
+        robot = self._robot
+        match _name(axis):
+            case "XAXIS":
+                return robot.velocity * math.radians(robot.angular_velocity) / 9806.65
+            case "YAXIS":
+                return robot.acceleration / 9806.65
+            case _:
+                return 1.0
+
+
+class Gps(Inertial):
+    calibration_ms = 0
+    _rotation_kind = "Gps.heading"
+
+    def __init__(self, port, *args):
+        super().__init__(port, *args)
+        robot = self._robot
+        self._sensor_angle = 0.0
+        self._fix_us = None
+        self._in_view = True
+        self._fix = (robot.x, robot.y)
+        self._x = self._sim.sensors.add("Gps.position", lambda: self._locate()[0], f"{self._label}.x")
+        self._y = self._sim.sensors.add("Gps.position", lambda: self._locate()[1], f"{self._label}.y")
+        self._origin = (0.0, 0.0)
+
+    def _locate(self) -> tuple[float, float]:
+        """The robot's position, or the last one seen if the camera can't see the field strip"""
+        robot = self._robot
+        if self._fix_us != self._sim.clock.us:
+            self._fix_us = self._sim.clock.us
+            hit = self._sim.geometry.raycast(robot.x, robot.y, robot.rotation + self._sensor_angle)
+            self._in_view = hit is not None and hit[1].name == PERIMETER
+            if self._in_view:
+                self._fix = (robot.x, robot.y)
+        return self._fix
+
+    def x_position(self, units=None):
+        self._sim.poll()
+        return from_mm(self._x.value - self._origin[0], units)
+
+    def y_position(self, units=None):
+        self._sim.poll()
+        return from_mm(self._y.value - self._origin[1], units)
+
+    def quality(self):
+        self._sim.poll()
+        self._locate()
+        return 100 if self._in_view else 0
+
+    def set_origin(self, x=0, y=0, units=None):
+        self._origin = (to_mm(x, units), to_mm(y, units))
+
+    def set_location(self, x, y, units=None, angle=0, units_r=None):
+        # the simulated sensor knows where it is whenever it sees the strip, so the hint is not needed
+        pass
+
+    def set_sensor_rotation(self, value, units=None):
+        """Which way the camera faces, in degrees clockwise from the robot's front"""
+        self._sensor_angle = to_degrees(value, units)
+        self._fix_us = None
+
+
+def _wheel_degrees(robot, wheel: TrackingWheel) -> Callable[[], float]:
+    """How far a tracking wheel's sensor has turned, in degrees, as the robot moves"""
+    scale = 360 * wheel.gear_ratio / (math.pi * wheel.diameter)
+    start_distance, start_rotation = robot.distance, robot.rotation
+    if wheel.sideways:
+        # a point in front of the centre moves right as the robot turns clockwise
+        return lambda: math.radians(robot.rotation - start_rotation) * wheel.offset * scale
+    # a wheel right of the centre rolls less than the centre as the robot turns clockwise
+    return lambda: (
+        robot.distance - start_distance - math.radians(robot.rotation - start_rotation) * wheel.offset
+    ) * scale
+
+
+class TrackingSensor:
+    """What `Rotation` and `Encoder` share: a sensor turned by a tracking wheel"""
+
+    _kind = "Rotation"
+
+    def _track(self, key):
+        wheel = self._sim.mounts.get(key, TrackingWheel())
+        label = f"{type(self).__name__.lower()}{key}.position"
+        self._reading = self._sim.sensors.add(self._kind, _wheel_degrees(self._sim.robot, wheel), label)
+        self._offset = 0.0
+        self._sign = 1
+
+    def _degrees(self) -> float:
+        return self._sign * self._reading.value + self._offset
+
+    def reset_position(self):
+        self.set_position(0)
+
+    def set_position(self, value, units=None):
+        self._offset = to_degrees(value, units) - self._sign * self._reading.value
+
+    def position(self, units=None):
+        self._sim.poll()
+        return from_degrees(self._degrees(), units)
+
+    def velocity(self, units=None):
+        self._sim.poll()
+        reading = self._reading
+        interval = max(reading.spec.rate_ms, self._sim.step_us / 1000) / 1000
+        rpm = self._sign * (reading.value - reading.previous) / interval / 6
+        return from_rpm(rpm, units, 600)
+
+
+class Rotation(TrackingSensor):
+    def __init__(self, port, reverse=False):
+        super().__init__(port, reverse)
+        self._track(port + 1)
+        self.set_reversed(reverse)
+
+    def set_reversed(self, value):
+        position = self._degrees()
+        self._sign = -1 if value else 1
+        self._offset = position - self._sign * self._reading.value
+
+    def angle(self, units=None):
+        self._sim.poll()
+        return from_degrees(self._degrees() % 360, units)
+
+    def changed(self, callback, arg=()):
+        reading = self._reading
+        return _watch(self, "changed", lambda: reading.value, callback, arg)
+
+
+class Encoder(TrackingSensor):
+    _kind = "Encoder"
+
+    def __init__(self, port):
+        super().__init__(port)
+        self._track(getattr(port, "_letter", None))
+
+    def value(self):
+        self._sim.poll()
+        return int(self._degrees())
+
+
+class TriportPort:
+    def __init__(self, port, index):
+        super().__init__(port, index)
+        self._letter = "ABCDEFGH"[index]
+
+
+class Triport:
+    _nested = {"TriportPort": TriportPort}
+
+
+class Distance:
+    def __init__(self, port):
+        super().__init__(port)
+        mount = self._sim.mounts.get(port + 1, SensorMount())
+        robot = self._sim.robot
+
+        def truth():
+            heading = math.radians(robot.rotation)
+            x = robot.x + mount.x * math.cos(heading) + mount.y * math.sin(heading)
+            y = robot.y - mount.x * math.sin(heading) + mount.y * math.cos(heading)
+            hit = self._sim.geometry.raycast(x, y, robot.rotation + mount.angle, DISTANCE_RANGE)
+            self._target = None if hit is None else hit[1]
+            return NOTHING_DETECTED if hit is None else hit[0]
+
+        self._target = None
+        self._reading = self._sim.sensors.add("Distance", truth, f"distance{port + 1}.distance")
+
+    def _mm(self) -> float:
+        distance = self._reading.value
+        return distance if distance <= DISTANCE_RANGE else NOTHING_DETECTED
+
+    def object_distance(self, units=None):
+        self._sim.poll()
+        return from_mm(self._mm(), units)
+
+    def _size(self) -> str:
+        target = self._target
+        if target is None or self._mm() > DISTANCE_RANGE:
+            return "NONE"
+        if target.radius:
+            return "SMALL" if target.radius < 60 else "MEDIUM"
+        # walls fill the sensor's view
+        return "LARGE" if len(target.points) == 2 else "MEDIUM"
+
+    def object_size(self):
+        self._sim.poll()
+        return getattr(self._vex.ObjectSizeType, self._size())
+
+    def object_rawsize(self):
+        self._sim.poll()
+        return RAW_SIZES[self._size()]
+
+    def object_velocity(self):
+        """Speed the object is approaching at, in m/s"""
+        self._sim.poll()
+        reading = self._reading
+        if self._mm() > DISTANCE_RANGE:
+            return 0.0
+        interval = max(reading.spec.rate_ms, self._sim.step_us / 1000)
+        return (reading.previous - reading.value) / interval
+
+    def is_object_detected(self):
+        self._sim.poll()
+        return self._mm() <= DISTANCE_RANGE
+
+    def changed(self, callback, arg=()):
+        return _watch(self, "changed", self._mm, callback, arg)
+
+
+class Optical:
+    # the gray foam tiles of the field, the only thing the simulated sensor sees
+    TILE_HUE = 30.0
+    TILE_BRIGHTNESS = 12.0
+
+    def __init__(self, port):
+        super().__init__(port)
+        self._hue = self._sim.sensors.add("Optical.hue", lambda: self.TILE_HUE, f"optical{port + 1}.hue")
+        self._brightness = self._sim.sensors.add(
+            "Optical.brightness", lambda: self.TILE_BRIGHTNESS, f"optical{port + 1}.brightness"
+        )
+
+    def hue(self):
+        self._sim.poll()
+        return self._hue.value % 360
+
+    def brightness(self, readraw=False):
+        self._sim.poll()
+        return self._brightness.value * 10.23 if readraw else self._brightness.value
+
+    def color(self):
+        hue = self.hue()
+        colors = self._vex.Color
+        for limit, name in ((15, "RED"), (45, "ORANGE"), (75, "YELLOW"), (165, "GREEN"), (195, "CYAN"), (255, "BLUE")):
+            if hue < limit:
+                return getattr(colors, name)
+        if hue < 315:
+            return colors.PURPLE
+        return colors.RED
+
+    def is_near_object(self):
+        self._sim.poll()
+        return False
+
+
+class SerialLink:
+    def __init__(self, port, name, linktype, wired=False):
+        super().__init__(port, name, linktype, wired)
+        self._link = self._sim.radio.connect(self._sim, name, _name(linktype), wired)
+
+    def is_linked(self):
+        return self._link.peer is not None
+
+    def send(self, buffer):
+        self._sim.poll()
+        return self._link.send(buffer.encode() if isinstance(buffer, str) else bytes(buffer))
+
+    def receive(self, length, timeout=300000):
+        inbox = self._link.inbox
+        self._sim.wait_until(lambda: len(inbox) >= length, timeout)
+        data = inbox.read(length)
+        return bytearray(data) if data else None
+
+    def received(self, callback):
+        inbox = self._link.inbox
+
+        def deliver():
+            data = inbox.read(len(inbox))
+            self._sim.events.start([(callback, (bytearray(data), len(data)))])
+
+        self._link.on_receive = deliver
+
+
+class MessageLink:
+    def __init__(self, port, name, linktype, wired=False):
+        super().__init__(port, name, linktype, wired)
+        self._link = self._sim.radio.connect(self._sim, name, _name(linktype), wired)
+        self._handlers = []
+
+    def is_linked(self):
+        return self._link.peer is not None
+
+    def send(self, message, *args):
+        self._sim.poll()
+        # a message is only ever sent whole
+        return len(message) if self._link.send(pack_message(message, args), whole=True) else None
+
+    def _next(self):
+        inbox = self._link.inbox
+        if not inbox:
+            return None
+        return unpack_message(inbox.read(1 + inbox.peek(1)[0])[1:])
+
+    def receive(self, timeout=300000):
+        inbox = self._link.inbox
+        self._sim.wait_until(lambda: len(inbox) > 0, timeout)
+        message = self._next()
+        return None if message is None else message[0]
+
+    def received(self, *args):
+        message, callback = (None, args[0]) if len(args) == 1 else args[:2]
+        self._handlers.append((message, callback))
+        self._link.on_receive = self._dispatch
+
+    def _dispatch(self):
+        while (message := self._next()) is not None:
+            name, index, value = message
+            args = (name, self._link.name, index, value)
+            self._sim.events.start([(callback, args) for m, callback in self._handlers if m in (None, name)])
+
+
+SIMULATED = {
+    "Timer": Timer,
+    "Thread": Thread,
+    "Event": Event,
+    "Color": Color,
+    "Brain": Brain,
+    "Competition": Competition,
+    "Controller": Controller,
+    "Motor": Motor,
+    "MotorGroup": MotorGroup,
+    "DriveTrain": DriveTrain,
+    "SmartDrive": SmartDrive,
+    "Inertial": Inertial,
+    "Gps": Gps,
+    "Rotation": Rotation,
+    "Encoder": Encoder,
+    "Triport": Triport,
+    "Distance": Distance,
+    "Optical": Optical,
+    "SerialLink": SerialLink,
+    "MessageLink": MessageLink,
+}
+
+
+def install(vex, sim):
+    """Replace the stubs in a freshly loaded `vex` module with devices simulated by `sim`"""
+    for name, mixin in SIMULATED.items():
+        stub = getattr(vex, name)
+        simulated = type(
+            name,
+            (mixin, stub),
+            {"_sim": sim, "_vex": vex, "__doc__": stub.__doc__, "__module__": vex.__name__},
+        )
+        for nested, nested_mixin in getattr(mixin, "_nested", {}).items():
+            nested_stub = getattr(stub, nested)
+            setattr(
+                simulated,
+                nested,
+                type(
+                    nested,
+                    (nested_mixin, nested_stub),
+                    {"_sim": sim, "_vex": vex, "__doc__": nested_stub.__doc__, "__module__": vex.__name__},
+                ),
+            )
+        setattr(vex, name, simulated)
+
+    def wait(duration, units=vex.MSEC):
+        sim.sleep(to_msec(duration, units))
+
+    def sleep(duration, units=vex.MSEC):
+        sim.sleep(to_msec(duration, units))
+
+    wait.__doc__ = vex.wait.__doc__
+    sleep.__doc__ = vex.sleep.__doc__
+    vex.wait = wait
+    vex.sleep = sleep
@@ -0,0 +1,113 @@
+from typing import Any, Callable, Hashable
+
+from .clock import to_us
+
+
+def changed(previous, value) -> bool:
+    return value != previous
+
+
+def rising(previous, value) -> bool:
+    return bool(value) and not previous
+
+
+def falling(previous, value) -> bool:
+    return bool(previous) and not value
+
+
+class Watch:
+    """
+    A device value sampled once per physics step. When `trigger(previous, value)` holds,
+    every event registered on the watch is broadcast.
+    """
+
+    def __init__(self, sample: Callable[[], Any], trigger: Callable[[Any, Any], bool]):
+        self.sample = sample
+        self.trigger = trigger
+        self.value = sample()
+        self.events = []
+
+
+class Broadcast:
+    """Tracks the callbacks started by one broadcast, for `Event.broadcast_and_wait`"""
+
+    def __init__(self, count: int):
+        self.remaining = count
+
+    @property
+    def done(self) -> bool:
+        return self.remaining == 0
+
+    def run(self, callback: Callable, args: tuple):
+        try:
+            callback(*args)
+        finally:
+            self.remaining -= 1
+
+
+class Events:
+    """
+    Timer callbacks, broadcasts and device callbacks for a `Simulation`.
+
+    Like on the brain, each callback behaves as if it ran in a thread of its own, but
+    callbacks fired together share a task until one of them sleeps. Timer callbacks
+    wait on the scheduler's priority queue, and device values are only sampled if
+    something watches them, once per step however many callbacks are registered on them.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.watches: dict[Hashable, Watch] = {}
+        self._timers: dict[int, list[tuple[Callable, tuple]]] = {}
+        self._polling = False
+
+    def start(self, handlers: list[tuple[Callable, tuple]]) -> "Broadcast":
+        """Run each `(callback, args)` handler as if it had a thread of its own"""
+        broadcast = Broadcast(len(handlers))
+        if handlers:
+            self.sim.scheduler.start([(broadcast.run, handler) for handler in handlers])
+        return broadcast
+
+    def call_later(self, ms: float, callback: Callable, args: tuple = ()):
+        """Start `callback` in a new thread `ms` milliseconds from now"""
+        due = self.sim.clock.us + max(0, to_us(ms))
+        # timers due at the same time share one alarm and start together
+        timers = self._timers.get(due)
+        if timers is None:
+            timers = self._timers[due] = []
+            self.sim.scheduler.call_at(due, lambda: self.start(self._timers.pop(due)))
+        timers.append((callback, args))
+
+    def watch(
+        self, key: Hashable, sample: Callable[[], Any], trigger: Callable[[Any, Any], bool] = changed
+    ) -> Watch:
+        """
+        The watch for `key`, created from `sample` and `trigger` the first time it is
+        asked for. `sample` reads the models directly, as it runs outside of any thread.
+        """
+        watch = self.watches.get(key)
+        if watch is None:
+            watch = self.watches[key] = Watch(sample, trigger)
+            if not self._polling:
+                self._polling = True
+                self._schedule_poll()
+        return watch
+
+    def _schedule_poll(self):
+        self.sim.scheduler.call_at(self.sim.next_step_us, self._poll)
+
+    def _poll(self):
+        handlers = []
+        for watch in self.watches.values():
+            value = watch.sample()
+            if watch.trigger(watch.value, value):
+                for event in watch.events:
+                    handlers += event._handlers
+            watch.value = value
+        if handlers:
+            self.start(handlers)
+        # keep sampling while anything can still react, or until the run's deadline
+        if self.sim.scheduler.live or self.sim.deadline_us is not None:
+            self._schedule_poll()
+        else:
+            self._polling = False
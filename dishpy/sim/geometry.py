@@ -0,0 +1,315 @@
+"""
+Field geometry: the walls, goals and game objects on the field, and the robot bumping
+into them.
+
+Every element is a convex shape, a polygon (a wall is a two point one) swept by a
+radius (a circle is a one point one), so one separating axis test handles any pair of
+them. Elements are kept in a uniform grid of cells, and a collision check or a sensor's
+raycast only looks at the elements in the cells it passes through, so adding more game
+objects doesn't make a physics step slower.
+"""
+
+import math
+from typing import Iterable
+
+FIELD_HALF = 1828.8  # mm from the centre of the field to each wall, 12ft square
+PERIMETER = "perimeter"  # name of the field's outer walls, which carry the GPS strip
+CELL_MM = 300.0
+
+
+class Element:
+    """A convex shape on the field: its corner points, swept by `radius`"""
+
+    __slots__ = ("name", "points", "radius", "movable", "_cells", "_bounds")
+
+    def __init__(self, points: list[tuple[float, float]], radius: float = 0.0, name: str = "", movable: bool = False):
+        self.name = name
+        self.points = points
+        self.radius = radius
+        self.movable = movable
+        self._cells: list[tuple[int, int]] = []
+        self._bounds = self.bounds()
+
+    @property
+    def center(self) -> tuple[float, float]:
+        n = len(self.points)
+        return sum(p[0] for p in self.points) / n, sum(p[1] for p in self.points) / n
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        r = self.radius
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        return min(xs) - r, min(ys) - r, max(xs) + r, max(ys) + r
+
+    def translate(self, dx: float, dy: float):
+        self.points = [(x + dx, y + dy) for x, y in self.points]
+        self._bounds = self.bounds()
+
+    def overlaps(self, bounds: tuple[float, float, float, float]) -> bool:
+        x0, y0, x1, y1 = self._bounds
+        return x0 <= bounds[2] and bounds[0] <= x1 and y0 <= bounds[3] and bounds[1] <= y1
+
+
+class Wall(Element):
+    """A thin wall or barrier from (`x1`, `y1`) to (`x2`, `y2`)"""
+
+    __slots__ = ()
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float, name: str = "wall"):
+        super().__init__([(x1, y1), (x2, y2)], name=name)
+
+
+class Box(Element):
+    """A `width` by `length` rectangle centred on `x`, `y`, turned `angle` degrees clockwise"""
+
+    __slots__ = ()
+
+    def __init__(self, x: float, y: float, width: float, length: float, angle: float = 0.0, name: str = "box"):
+        super().__init__(footprint(x, y, angle, width, length), name=name)
+
+
+class Circle(Element):
+    """A round game object (or, with `movable=False`, a post), pushed around by the robot"""
+
+    __slots__ = ()
+
+    def __init__(self, x: float, y: float, radius: float, name: str = "object", movable: bool = True):
+        super().__init__([(x, y)], radius, name, movable)
+
+
+def footprint(x: float, y: float, heading: float, width: float, length: float) -> list[tuple[float, float]]:
+    """The corners of a `width` by `length` rectangle centred on `x`, `y` facing `heading`"""
+    h = math.radians(heading)
+    fx, fy = math.sin(h) * length / 2, math.cos(h) * length / 2
+    rx, ry = math.cos(h) * width / 2, -math.sin(h) * width / 2
+    return [
+        (x + fx + rx, y + fy + ry),
+        (x + fx - rx, y + fy - ry),
+        (x - fx - rx, y - fy - ry),
+        (x - fx + rx, y - fy + ry),
+    ]
+
+
+def _axes(a: Element, b: Element) -> Iterable[tuple[float, float]]:
+    for shape, other in ((a, b), (b, a)):
+        points = shape.points
+        edges = len(points) if len(points) > 2 else len(points) - 1
+        for i in range(edges):
+            (x1, y1), (x2, y2) = points[i], points[(i + 1) % len(points)]
+            yield y1 - y2, x2 - x1
+        if shape.radius:
+            # a rounded shape can also be separated along the line to the other's nearest corner
+            cx, cy = shape.center
+            yield min(((px - cx, py - cy) for px, py in other.points), key=lambda d: d[0] ** 2 + d[1] ** 2)
+
+
+def _project(shape: Element, ax: float, ay: float) -> tuple[float, float]:
+    dots = [x * ax + y * ay for x, y in shape.points]
+    return min(dots) - shape.radius, max(dots) + shape.radius
+
+
+def penetration(a: Element, b: Element) -> tuple[float, float] | None:
+    """The shortest move of `a` that separates it from `b`, or None if they don't touch"""
+    best = None
+    for ax, ay in _axes(a, b):
+        length = math.hypot(ax, ay)
+        if length < 1e-9:
+            continue
+        ax, ay = ax / length, ay / length
+        min_a, max_a = _project(a, ax, ay)
+        min_b, max_b = _project(b, ax, ay)
+        overlap = min(max_a - min_b, max_b - min_a)
+        if overlap <= 0:
+            return None
+        if best is None or overlap < best[0]:
+            best = (overlap, ax, ay)
+    if best is None:
+        return None
+    depth, ax, ay = best
+    (acx, acy), (bcx, bcy) = a.center, b.center
+    if (acx - bcx) * ax + (acy - bcy) * ay < 0:
+        ax, ay = -ax, -ay
+    return depth * ax, depth * ay
+
+
+def _ray_hit(element: Element, x: float, y: float, dx: float, dy: float) -> float | None:
+    """How far along the ray from `x`, `y` in direction `dx`, `dy` it first meets `element`"""
+    if element.radius:
+        cx, cy = element.points[0]
+        ox, oy = x - cx, y - cy
+        b = ox * dx + oy * dy
+        c = ox * ox + oy * oy - element.radius**2
+        disc = b * b - c
+        if disc < 0:
+            return None
+        t = -b - math.sqrt(disc)
+        return t if t >= 0 else (0.0 if c <= 0 else None)
+    best = None
+    points = element.points
+    edges = len(points) if len(points) > 2 else 1
+    for i in range(edges):
+        (x1, y1), (x2, y2) = points[i], points[(i + 1) % len(points)]
+        ex, ey = x2 - x1, y2 - y1
+        denom = dx * ey - dy * ex
+        if abs(denom) < 1e-12:
+            continue
+        t = ((x1 - x) * ey - (y1 - y) * ex) / denom
+        s = ((x1 - x) * dy - (y1 - y) * dx) / denom
+        if t >= 0 and 0 <= s <= 1 and (best is None or t < best):
+            best = t
+    return best
+
+
+class Grid:
+    """A uniform grid of square cells, each listing the elements that overlap it"""
+
+    def __init__(self, cell: float = CELL_MM):
+        self.cell = cell
+        self.cells: dict[tuple[int, int], list[Element]] = {}
+
+    def keys(self, bounds: tuple[float, float, float, float]) -> list[tuple[int, int]]:
+        x0, y0, x1, y1 = (math.floor(v / self.cell) for v in bounds)
+        return [(i, j) for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)]
+
+    def insert(self, element: Element):
+        element._cells = self.keys(element._bounds)
+        for key in element._cells:
+            self.cells.setdefault(key, []).append(element)
+
+    def remove(self, element: Element):
+        for key in element._cells:
+            cell = self.cells[key]
+            cell.remove(element)
+            if not cell:
+                del self.cells[key]
+        element._cells = []
+
+    def query(self, bounds: tuple[float, float, float, float]) -> list[Element]:
+        found = {}
+        for key in self.keys(bounds):
+            for element in self.cells.get(key, ()):
+                found[id(element)] = element
+        return list(found.values())
+
+
+class FieldGeometry:
+    """
+    Everything on the field the robot can hit or a sensor can see. A new one has just
+    the perimeter walls, and game elements are added with `add`:
+
+    ```python
+    sim.geometry.add(Box(0, 0, 600, 600, name="goal"))
+    sim.geometry.add(Circle(600, 600, 90, name="ring"))
+    ```
+
+    Movable elements (the default for `Circle`) are pushed out of the robot's way and
+    stay where they are pushed, everything else stops the robot.
+    """
+
+    def __init__(self, walls: bool = True, cell: float = CELL_MM):
+        self.grid = Grid(cell)
+        self.elements: list[Element] = []
+        self.contacts = 0
+        self.version = 0  # changes whenever an element is added, removed or moved
+        if walls:
+            h = FIELD_HALF
+            for corners in (((-h, -h), (h, -h)), ((h, -h), (h, h)), ((h, h), (-h, h)), ((-h, h), (-h, -h))):
+                self.add(Wall(*corners[0], *corners[1], name=PERIMETER))
+
+    def add(self, element: Element) -> Element:
+        self.elements.append(element)
+        self.grid.insert(element)
+        self.version += 1
+        return element
+
+    def remove(self, element: Element):
+        self.elements.remove(element)
+        self.grid.remove(element)
+        self.version += 1
+
+    def move(self, element: Element, dx: float, dy: float):
+        self.grid.remove(element)
+        element.translate(dx, dy)
+        self.grid.insert(element)
+        self.version += 1
+
+    def collide(self, robot, dt: float, push_objects: bool = True) -> tuple[float, float]:
+        """
+        Push `robot` out of whatever it overlaps (or, with `push_objects`, push movable
+        elements out of its way), returning how far the robot was moved
+        """
+        reach = math.hypot(robot.width, robot.length) / 2
+        nearby = self.grid.query((robot.x - reach, robot.y - reach, robot.x + reach, robot.y + reach))
+        if not nearby:
+            return 0.0, 0.0
+        body = Element(footprint(robot.x, robot.y, robot.rotation, robot.width, robot.length))
+        total_x = total_y = 0.0
+        for element in nearby:
+            if not element.overlaps(body._bounds):
+                continue
+            push = penetration(body, element)
+            if push is None:
+                continue
+            self.contacts += 1
+            if element.movable and push_objects:
+                self.move(element, -push[0], -push[1])
+                self._settle(element)
+                continue
+            body.translate(*push)
+            total_x += push[0]
+            total_y += push[1]
+        if total_x or total_y:
+            robot.x += total_x
+            robot.y += total_y
+            # the wheels slip instead of rolling while the robot is held back, and the
+            # sudden stop is what the inertial sensor feels as a collision
+            heading = math.radians(robot.rotation)
+            along = total_x * math.sin(heading) + total_y * math.cos(heading)
+            robot.distance += along
+            robot.acceleration += along / dt / dt
+        return total_x, total_y
+
+    def _settle(self, element: Element):
+        """Push a moved element back out of anything fixed it was pushed into"""
+        for other in self.grid.query(element._bounds):
+            if other is element or other.movable or not other.overlaps(element._bounds):
+                continue
+            push = penetration(element, other)
+            if push is not None:
+                self.move(element, *push)
+
+    def raycast(self, x: float, y: float, angle: float, max_distance: float = 2 * FIELD_HALF * math.sqrt(2)):
+        """
+        The first element hit by a ray from `x`, `y` heading `angle` degrees clockwise
+        from +Y, as `(distance, element)`, or None if nothing is within `max_distance`
+        """
+        dx, dy = math.sin(math.radians(angle)), math.cos(math.radians(angle))
+        cell = self.grid.cell
+        i, j = math.floor(x / cell), math.floor(y / cell)
+        step_i, step_j = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        # walk the cells the ray passes through, nearest first
+        next_x = ((i + (dx > 0)) * cell - x) / dx if abs(dx) > 1e-12 else math.inf
+        next_y = ((j + (dy > 0)) * cell - y) / dy if abs(dy) > 1e-12 else math.inf
+        delta_x = cell / abs(dx) if abs(dx) > 1e-12 else math.inf
+        delta_y = cell / abs(dy) if abs(dy) > 1e-12 else math.inf
+        seen = set()
+        best = None
+        travelled = 0.0
+        while travelled <= max_distance:
+            for element in self.grid.cells.get((i, j), ()):
+                if id(element) in seen:
+                    continue
+                seen.add(id(element))
+                t = _ray_hit(element, x, y, dx, dy)
+                if t is not None and t <= max_distance and (best is None or t < best[0]):
+                    best = (t, element)
+            exit_distance = min(next_x, next_y)
+            if best is not None and best[0] <= exit_distance:
+                return best
+            if next_x < next_y:
+                i += step_i
+                travelled, next_x = next_x, next_x + delta_x
+            else:
+                j += step_j
+                travelled, next_y = next_y, next_y + delta_y
+        return best
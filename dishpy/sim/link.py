@@ -0,0 +1,160 @@
+"""
+VEXlink between simulated robots: `vex.SerialLink` and `vex.MessageLink` connected
+in-process, through the same radio of an `Alliance`.
+
+Links pair up by name, a `MANAGER` with a `WORKER` (or two `GENERIC` links), like real
+radios do. Each direction of a link is a byte stream with a limited bandwidth and a
+fixed latency: sent data leaves the sender at the link's rate and arrives `latency_ms`
+later in the receiver's bounded ring buffer. A sender can only get as far ahead of the
+radio as its own buffer allows, and data that arrives at a full receive buffer is lost,
+so a program that sends faster than the link can carry sees it happen.
+"""
+
+import struct
+from typing import Callable
+
+from .clock import to_us
+
+BUFFER_BYTES = 512
+WIRELESS = (1000.0, 20.0)  # bytes per second and latency in ms of a radio link
+WIRED = (11520.0, 1.0)  # and of a cable between the radios, 115200 baud
+
+
+class RingBuffer:
+    """A fixed-size FIFO of bytes"""
+
+    def __init__(self, capacity: int = BUFFER_BYTES):
+        self._data = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return len(self._data) - self._size
+
+    def write(self, data: bytes) -> int:
+        """Append as much of `data` as fits, returning how many bytes that was"""
+        capacity = len(self._data)
+        count = min(len(data), self.free)
+        end = (self._start + self._size) % capacity
+        first = min(count, capacity - end)
+        self._data[end : end + first] = data[:first]
+        self._data[: count - first] = data[first:count]
+        self._size += count
+        return count
+
+    def peek(self, count: int) -> bytes:
+        count = min(count, self._size)
+        first = min(count, len(self._data) - self._start)
+        return bytes(self._data[self._start : self._start + first] + self._data[: count - first])
+
+    def read(self, count: int) -> bytes:
+        data = self.peek(count)
+        self._start = (self._start + len(data)) % len(self._data)
+        self._size -= len(data)
+        return data
+
+
+class LinkEnd:
+    """One robot's side of a link"""
+
+    def __init__(self, radio: "Radio", sim, name: str, kind: str, wired: bool):
+        self.radio = radio
+        self.sim = sim
+        self.name = name
+        self.kind = kind
+        self.bandwidth, self.latency_ms = radio.wired if wired else radio.wireless
+        self.inbox = RingBuffer(radio.buffer_bytes)
+        self.peer: LinkEnd | None = None
+        self.on_receive: Callable[[], None] | None = None
+        self.sent = self.received = self.dropped = 0
+        self._free_us = 0  # when the radio has sent everything queued so far
+
+    def queued(self) -> int:
+        """Bytes waiting in the send buffer for the radio to transmit them"""
+        return max(0, round((self._free_us - self.sim.clock.us) * self.bandwidth / 1e6))
+
+    def send(self, data: bytes, whole: bool = False) -> int:
+        """
+        Queue as much of `data` as the send buffer has room for (all or nothing if
+        `whole`), returning how many bytes were queued
+        """
+        if self.peer is None:
+            return 0
+        room = self.radio.buffer_bytes - self.queued()
+        count = min(len(data), room)
+        if count <= 0 or (whole and count < len(data)):
+            return 0
+        data = bytes(data[:count])
+        now = self.sim.clock.us
+        self._free_us = max(self._free_us, now) + to_us(count / self.bandwidth * 1000)
+        self.sent += count
+        self.sim.scheduler.call_at(self._free_us + to_us(self.latency_ms), lambda: self.peer._deliver(data, whole))
+        return count
+
+    def _deliver(self, data: bytes, whole: bool):
+        if whole and self.inbox.free < len(data):
+            self.dropped += len(data)
+            return
+        count = self.inbox.write(data)
+        self.received += count
+        self.dropped += len(data) - count
+        if count and self.on_receive is not None:
+            self.on_receive()
+
+
+class Radio:
+    """
+    The VEXlink radios of every robot in an `Alliance`, pairing links by name.
+    `wireless` and `wired` are `(bytes per second, latency in ms)`.
+    """
+
+    def __init__(self, wireless=WIRELESS, wired=WIRED, buffer_bytes: int = BUFFER_BYTES):
+        self.wireless = wireless
+        self.wired = wired
+        self.buffer_bytes = buffer_bytes
+        self.links: dict[str, list[LinkEnd]] = {}
+
+    def connect(self, sim, name: str, kind: str, wired: bool = False) -> LinkEnd:
+        end = LinkEnd(self, sim, name, kind, wired)
+        ends = self.links.setdefault(name, [])
+        for other in ends:
+            pair = {other.kind, kind}
+            if other.peer is None and other.sim is not sim and pair in ({"MANAGER", "WORKER"}, {"GENERIC"}):
+                end.peer, other.peer = other, end
+                break
+        ends.append(end)
+        return end
+
+
+def pack_message(message: str, args: tuple) -> bytes:
+    """A `MessageLink` message as a frame: its length, name, which values follow and them"""
+    # the frame's length has to fit in its first byte
+    name = message.encode()[:240]
+    flags = 0
+    values = b""
+    if len(args) > 0 and args[0] is not None:
+        flags |= 1
+        values += struct.pack("<i", int(args[0]))
+    if len(args) > 1 and args[1] is not None:
+        flags |= 2
+        values += struct.pack("<f", float(args[1]))
+    body = bytes([len(name)]) + name + bytes([flags]) + values
+    return bytes([len(body)]) + body
+
+
+def unpack_message(frame: bytes) -> tuple[str, int | None, float | None]:
+    name_length = frame[0]
+    name = frame[1 : 1 + name_length].decode(errors="replace")
+    flags = frame[1 + name_length]
+    offset = 2 + name_length
+    index = value = None
+    if flags & 1:
+        (index,) = struct.unpack_from("<i", frame, offset)
+        offset += 4
+    if flags & 2:
+        (value,) = struct.unpack_from("<f", frame, offset)
+    return name, index, value
@@ -0,0 +1,238 @@
+import math
+
+# free speed of each cartridge at the output shaft
+CARTRIDGE_RPM = {"RATIO36_1": 100, "RATIO18_1": 200, "RATIO6_1": 600}
+MAX_VOLTAGE = 12.0
+STALL_CURRENT = 2.5  # amps
+STALL_TORQUE_100RPM = 2.1  # Nm, scales inversely with the cartridge speed
+# seconds added to each drive motor's time constant per kg of robot it pushes
+MASS_TIME_CONSTANT = 0.025
+
+
+def clamp(value: float, low: float, high: float) -> float:
+    return low if value < low else high if value > high else value
+
+
+def approach_speed(
+    error: float, velocity: float, rate: float, tau: float, max_rpm: float, speed: float
+) -> float:
+    """
+    Velocity command in rpm that closes `error` as fast as possible without overshoot.
+    `rate` converts rpm into error units per second, and the command anticipates the
+    motor's lag `tau` so braking starts early enough.
+    """
+    predicted = error - rate * velocity * tau
+    decel = rate * max_rpm / (2 * tau)
+    return math.copysign(min(speed, math.sqrt(2 * decel * abs(predicted)) / rate), predicted)
+
+
+class MotorModel:
+    """
+    A V5 smart motor together with its on-board velocity and position controllers.
+
+    State is kept in the motor's physical frame (before `reverse` is applied) at the
+    output shaft: `position` in degrees and `velocity` in rpm. The velocity follows the
+    command with a first-order lag whose time constant grows with whatever the motor drives.
+    """
+
+    time_constant = 0.03
+    coast_time_constant = 0.5
+    brake_time_constant = 0.02
+    settle_tolerance = 1.0  # degrees
+
+    def __init__(self, port: int, max_rpm: int = 200):
+        self.port = port
+        self.max_rpm = max_rpm
+        self.stall_torque = STALL_TORQUE_100RPM * 100 / max_rpm
+        self.friction = 0.0  # fraction of the free speed lost to friction
+        self.load_time_constant = 0.0
+        self.torque_limit = 1.0
+        self.disabled = False  # the field controller cuts motor power while disabled
+
+        self.mode = "stop"  # "velocity", "voltage", "position" or "stop"
+        self.target = 0.0  # rpm, volts or degrees depending on the mode
+        self.max_speed = float(max_rpm)
+        self.brake = "COAST"
+        self.hold = 0.0
+        self.stop_at: int | None = None  # clock microseconds that end a timed spin
+
+        self.position = 0.0
+        self.velocity = 0.0
+        self.command = 0.0
+        self.voltage = 0.0
+        self.current = 0.0
+        self.temperature = 25.0
+
+    @property
+    def done(self) -> bool:
+        """Whether no position move or timed spin is in progress"""
+        return self.mode != "position" and self.stop_at is None
+
+    def spin(self, rpm: float):
+        self.mode = "velocity"
+        self.target = rpm
+        self.stop_at = None
+
+    def spin_voltage(self, volts: float):
+        self.mode = "voltage"
+        self.target = clamp(volts, -MAX_VOLTAGE, MAX_VOLTAGE)
+        self.stop_at = None
+
+    def move_to(self, position: float, speed: float):
+        self.mode = "position"
+        self.target = position
+        self.max_speed = abs(speed)
+        self.stop_at = None
+
+    def stop(self, brake: str | None = None):
+        if brake:
+            self.brake = brake
+        self.mode = "stop"
+        self.hold = self.position
+        self.stop_at = None
+
+    def update(self, dt: float, now_us: int):
+        if self.stop_at is not None and now_us >= self.stop_at:
+            self.stop()
+
+        tau = self.time_constant + self.load_time_constant
+        limit = self.max_rpm * (1 - self.friction)
+        mode = self.mode
+        if mode == "velocity":
+            desired = clamp(self.target, -limit, limit)
+        elif mode == "voltage":
+            desired = self.target / MAX_VOLTAGE * limit
+        elif mode == "position":
+            error = self.target - self.position
+            if abs(error) <= self.settle_tolerance:
+                self.stop()
+                desired = None
+            else:
+                speed = min(self.max_speed, limit)
+                desired = approach_speed(error, self.velocity, 6, tau, limit, speed)
+        else:
+            desired = None
+        if self.mode == "stop":
+            if self.brake == "HOLD":
+                error = self.hold - self.position
+                desired = approach_speed(error, self.velocity, 6, tau, limit, limit)
+            elif self.brake == "BRAKE":
+                tau = self.brake_time_constant + self.load_time_constant
+                desired = 0.0
+            else:
+                tau = self.coast_time_constant + self.load_time_constant
+
+        if self.disabled:
+            desired = None
+            tau = self.coast_time_constant + self.load_time_constant
+        tau /= self.torque_limit if self.torque_limit > 0 else 1e-9
+        previous = self.velocity
+        target = 0.0 if desired is None else desired
+        self.velocity += (target - previous) * (1 - math.exp(-dt / tau))
+        self.position += (previous + self.velocity) * 3 * dt  # 1 rpm = 6 deg/s
+
+        self.command = target if desired is not None else 0.0
+        self.voltage = self.command / self.max_rpm * MAX_VOLTAGE
+        if desired is None:
+            self.current = 0.0
+        else:
+            effort = abs(target - self.velocity) / self.max_rpm * 4 + self.friction
+            self.current = STALL_CURRENT * min(effort, self.torque_limit)
+        # copper losses heat the motor, the case cools towards room temperature
+        self.temperature += (self.current**2 * 0.5 - (self.temperature - 25) * 0.01) * dt
+
+    @property
+    def torque(self) -> float:
+        return self.current / STALL_CURRENT * self.stall_torque
+
+    @property
+    def power(self) -> float:
+        return abs(self.torque * self.velocity * 2 * math.pi / 60)
+
+    @property
+    def efficiency(self) -> float:
+        electrical = abs(self.voltage) * self.current
+        return clamp(self.power / electrical * 100, 0, 100) if electrical else 0.0
+
+
+class Robot:
+    """
+    The simulated robot's pose on the field, in millimetres with the heading in degrees
+    clockwise from the +Y axis, which is the convention of the GPS sensor.
+    """
+
+    width = 457.2  # mm, the 18" size limit
+    length = 457.2
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, heading: float = 0.0, mass: float = 6.8):
+        self.x = x
+        self.y = y
+        self.rotation = heading  # unwrapped heading
+        self.mass = mass
+        self.velocity = 0.0  # mm/s along the heading
+        self.angular_velocity = 0.0  # deg/s, clockwise
+        self.acceleration = 0.0  # mm/s^2 along the heading
+        self.distance = 0.0  # mm travelled along the heading, backwards counting negative
+
+    @property
+    def heading(self) -> float:
+        return self.rotation % 360
+
+    def move(self, left: float, right: float, track_width: float, dt: float):
+        """Integrate a differential drive with wheel speeds in mm/s over `dt` seconds"""
+        velocity = (left + right) / 2
+        omega = math.degrees((left - right) / track_width)
+        # integrate along the mid-step heading, exact for constant-curvature arcs
+        mid = math.radians(self.rotation + omega * dt / 2)
+        self.x += velocity * math.sin(mid) * dt
+        self.y += velocity * math.cos(mid) * dt
+        self.rotation += omega * dt
+        self.distance += velocity * dt
+        self.acceleration = (velocity - self.velocity) / dt
+        self.velocity = velocity
+        self.angular_velocity = omega
+
+
+class DrivetrainModel:
+    """
+    Couples left and right motors to the robot through their wheels. Right side motors
+    are mounted mirrored, so like on a real robot they need to be reversed in the program
+    for the robot to drive straight.
+    """
+
+    def __init__(
+        self,
+        robot: Robot,
+        left: list[MotorModel],
+        right: list[MotorModel],
+        wheel_travel: float = 300,
+        track_width: float = 320,
+        wheel_base: float = 320,
+        gear_ratio: float = 1.0,
+    ):
+        self.robot = robot
+        self.left = left
+        self.right = right
+        self.wheel_travel = wheel_travel
+        self.track_width = track_width
+        self.wheel_base = wheel_base
+        self.gear_ratio = gear_ratio
+        motors = left + right
+        for motor in motors:
+            motor.load_time_constant = robot.mass * MASS_TIME_CONSTANT * 2 / len(motors)
+
+    @property
+    def turn_rate(self) -> float:
+        """Degrees per second the robot turns per rpm of opposite wheel motion"""
+        return math.degrees(2 * self.wheel_travel / 60 / self.gear_ratio / self.track_width)
+
+    def wheel_speeds(self) -> tuple[float, float]:
+        """Left and right wheel surface speeds in mm/s"""
+        scale = self.wheel_travel / 60 / self.gear_ratio
+        left = sum(m.velocity for m in self.left) / len(self.left)
+        right = -sum(m.velocity for m in self.right) / len(self.right)
+        return left * scale, right * scale
+
+    def update(self, dt: float):
+        left, right = self.wheel_speeds()
+        self.robot.move(left, right, self.track_width, dt)
@@ -0,0 +1,198 @@
+"""
+Where a simulated program spends its time: host CPU time and simulated time for each
+thread, how fast each of its loops actually runs, and which of its functions cost the
+most.
+
+A brain runs one thread at a time until it waits, so a thread that does too much work
+between waits holds up every other thread, and a control loop runs slower than its
+`wait()` suggests. Simulated time doesn't pass while code runs, so the profiler measures
+that work in host CPU time instead: every time a thread gets to run until it waits again
+is a slice, charged to that thread. Physics steps and timers run between slices, so they
+are never charged to the program. A loop is a `wait()` that the same thread reaches over
+and over from the same line, and the simulated time between two visits plus the work
+done in between, scaled by how much slower the brain is, is one period of it.
+"""
+
+import cProfile
+import math
+import pstats
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# upper edges, in ms, of the bins of how much later than its wait a loop came around
+JITTER_BINS = (0.5, 1, 2, 5, 10, 20, 50, math.inf)
+# roughly how much longer MicroPython on the brain's 667MHz Cortex-A9 takes to run the
+# same code than CPython on a desktop core
+SLOWDOWN = 25.0
+
+
+@dataclass
+class ThreadStats:
+    """One thread's share of the run"""
+
+    name: str
+    cpu_s: float = 0.0  # host CPU time spent running the thread's code
+    slices: int = 0  # times it ran until it waited
+    longest_slice_s: float = 0.0
+    read_us: int = 0  # simulated time charged to it for reading devices
+    waits: int = 0
+
+
+@dataclass
+class LoopStats:
+    """A `wait()` some thread reaches repeatedly, and how regularly it does"""
+
+    thread: str
+    site: str  # file:line of the wait in the program
+    wait_us: int = 0  # the last wait's length, what the loop is meant to take
+    periods: list[float] = field(default_factory=list)  # estimated time between visits on the brain, in µs
+    cpu_s: float = 0.0  # host CPU time spent in the thread between visits
+
+    @property
+    def hz(self) -> float:
+        return 1e6 / statistics.fmean(self.periods) if self.periods else 0.0
+
+    @property
+    def target_hz(self) -> float:
+        return 1e6 / self.wait_us if self.wait_us else math.inf
+
+    @property
+    def jitter_ms(self) -> float:
+        return statistics.pstdev(self.periods) / 1000 if len(self.periods) > 1 else 0.0
+
+    @property
+    def slow(self) -> bool:
+        """Whether the loop runs noticeably below the rate its wait asks for"""
+        return bool(self.periods) and self.hz < self.target_hz * 0.9
+
+    def histogram(self) -> list[int]:
+        """How many periods overran the wait by up to each of `JITTER_BINS` ms"""
+        counts = [0] * len(JITTER_BINS)
+        for period in self.periods:
+            late = max(0.0, period - self.wait_us) / 1000
+            counts[next(i for i, edge in enumerate(JITTER_BINS) if late <= edge)] += 1
+        return counts
+
+
+class Profiler:
+    """
+    Profiles a simulation while it runs. Attach it before running the program:
+
+    ```python
+    sim = Simulation()
+    profiler = Profiler(sim)
+    sim.run(".out/main.py", duration=15)
+    for loop in profiler.loops():
+        print(loop.thread, loop.site, loop.hz, loop.target_hz)
+    ```
+
+    Loop rates are estimated for the brain, as if the code ran `slowdown` times slower
+    than it does on this computer. With `functions`, each slice is also run under
+    `cProfile` to find the most expensive functions, which slows the program down enough
+    to throw the loop rates off. Runs are deterministic, so profile functions in a second
+    run of the same program.
+    """
+
+    def __init__(self, sim, functions: bool = False, slowdown: float = SLOWDOWN):
+        self.sim = sim
+        self.slowdown = slowdown
+        self.threads: dict[str, ThreadStats] = {}
+        self._loops: dict[tuple[str, str], LoopStats] = {}
+        self._visits: dict[tuple[int, str], tuple[int, float]] = {}  # last clock and CPU time per task and site
+        self._slices: dict[int, float] = {}  # CPU time each running task's slice started at
+        self._cpu: dict[int, float] = {}  # CPU time used by each task so far
+        self._charging = False
+        self.functions = cProfile.Profile() if functions else None
+        sim.scheduler.profiler = self
+
+    def _thread(self, task) -> ThreadStats:
+        stats = self.threads.get(task.name)
+        if stats is None:
+            stats = self.threads[task.name] = ThreadStats(task.name)
+        return stats
+
+    def resume(self, task):
+        """`task` got to run"""
+        self._slices[id(task)] = time.thread_time()
+        if self.functions is not None:
+            self.functions.enable()
+
+    def charge(self, us: int):
+        """The running task is about to wait `us` because of the devices it read"""
+        self._charging = True
+        task = self.sim.scheduler.current
+        if task is not None:
+            self._thread(task).read_us += us
+
+    def suspend(self, task, wait_us: int | None = None):
+        """`task` gave up running, to wait `wait_us` if it called `wait()`"""
+        start = self._slices.pop(id(task), None)
+        if start is None:
+            return
+        if self.functions is not None:
+            self.functions.disable()
+        spent = time.thread_time() - start
+        stats = self._thread(task)
+        stats.cpu_s += spent
+        stats.slices += 1
+        stats.longest_slice_s = max(stats.longest_slice_s, spent)
+        cpu = self._cpu[id(task)] = self._cpu.get(id(task), 0.0) + spent
+        charging, self._charging = self._charging, False
+        if wait_us is None or charging:
+            return
+        stats.waits += 1
+        site = self._site()
+        if site is None:
+            return
+        key = (task.name, site)
+        loop = self._loops.get(key)
+        if loop is None:
+            loop = self._loops[key] = LoopStats(task.name, site)
+        loop.wait_us = wait_us
+        now = self.sim.clock.us
+        previous = self._visits.get((id(task), site))
+        if previous is not None:
+            work = cpu - previous[1]
+            loop.periods.append(now - previous[0] + work * self.slowdown * 1e6)
+            loop.cpu_s += work
+        self._visits[(id(task), site)] = (now, cpu)
+
+    def _site(self) -> str | None:
+        """Where in the program the running task called `wait()`"""
+        program = self.sim.globals.get("__file__")
+        if program is None:
+            return None
+        directory = str(Path(program).parent)
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(directory):
+                return f"{Path(filename).name}:{frame.f_lineno}"
+            frame = frame.f_back
+        return None
+
+    def loops(self) -> list[LoopStats]:
+        """Every loop that came around at least twice, the slowest compared to its wait first"""
+        loops = [loop for loop in self._loops.values() if loop.periods]
+        return sorted(loops, key=lambda loop: loop.hz / loop.target_hz)
+
+    def top_functions(self, count: int = 10) -> list[tuple[str, int, float, float]]:
+        """
+        The program's `count` most expensive functions as `(name, calls, own seconds,
+        total seconds)`, by the CPU time spent in their own code
+        """
+        if self.functions is None or self.sim.globals.get("__file__") is None:
+            return []
+        directory = str(Path(self.sim.globals["__file__"]).parent)
+        try:
+            stats = pstats.Stats(self.functions)
+        except TypeError:  # nothing was profiled
+            return []
+        rows = []
+        for (filename, line, name), (_, calls, own, total, _) in stats.stats.items():
+            if filename.startswith(directory):
+                rows.append((f"{name} ({Path(filename).name}:{line})", calls, own, total))
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:count]
@@ -0,0 +1,178 @@
+"""
+Recording controller input from a real brain, and replaying it in the simulator.
+
+A program on the brain prints one line per sample to the user serial port:
+
+```
+@ctl <milliseconds> <controller> <axis1> <axis2> <axis3> <axis4> <buttons>
+```
+
+with the controller as 0 (primary) or 1 (partner), the axes in percent and the buttons
+as a bitmask in the order of `competition.BUTTONS`. `ControllerRecorder` turns those
+lines into a compact binary log, and `ControllerLog` plays one back.
+
+The log is an 8 byte header followed by one record per sample that changed anything:
+
+- a flags byte: bits 0-3 for each axis that changed, bit 4 if any button changed and
+  bit 5 for the partner controller
+- the milliseconds since the previous record, as a varint
+- the new value of each changed axis, as a signed byte
+- the buttons that changed, as a varint bitmask XORed onto the previous buttons
+
+so a match of a driver moving one stick at a time takes about 3 bytes per change.
+"""
+
+import mmap
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+from .competition import AXES, BUTTONS, ControllerScript
+
+MAGIC = b"DPYCTL\x01\x00"
+PREFIX = "@ctl "
+CONTROLLERS = ("PRIMARY", "PARTNER")
+BUTTONS_CHANGED = 1 << 4
+PARTNER = 1 << 5
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+
+def parse_line(line: str) -> tuple[int, int, tuple[int, ...], int] | None:
+    """`(milliseconds, controller, axes, buttons)` for a sample line, None for anything else"""
+    if not line.startswith(PREFIX):
+        return None
+    try:
+        ms, controller, *axes, buttons = (int(field) for field in line[len(PREFIX) :].split())
+    except ValueError:
+        return None
+    if len(axes) != len(AXES) or controller not in (0, 1):
+        return None
+    return ms, controller, tuple(max(-100, min(100, axis)) for axis in axes), buttons
+
+
+class ControllerRecorder:
+    """Writes controller samples to a binary log, keeping only what changed"""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.samples = 0
+        self.records = 0
+        self._file: IO[bytes] | None = None
+        self._start: int | None = None
+        self._last_ms = self._end_ms = 0
+        self._state = [((0,) * len(AXES), 0) for _ in CONTROLLERS]
+
+    def __enter__(self) -> "ControllerRecorder":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("wb")
+        self._file.write(MAGIC)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first sample to the last"""
+        return 0.0 if self._start is None else (self._end_ms - self._start) / 1000
+
+    def feed(self, line: str) -> bool:
+        """Record a line of terminal output if it is a sample, returning whether it was"""
+        sample = parse_line(line)
+        if sample is not None:
+            self.add(*sample)
+        return sample is not None
+
+    def add(self, ms: int, controller: int, axes: tuple[int, ...], buttons: int):
+        if self._start is None:
+            self._start = self._last_ms = self._end_ms = ms
+        self.samples += 1
+        previous_axes, previous_buttons = self._state[controller]
+        flags = PARTNER if controller else 0
+        changed = []
+        for i, (axis, previous) in enumerate(zip(axes, previous_axes)):
+            if axis != previous:
+                flags |= 1 << i
+                changed.append(axis)
+        if buttons != previous_buttons:
+            flags |= BUTTONS_CHANGED
+        self._end_ms = max(ms, self._end_ms)
+        if not flags & ~PARTNER:
+            return
+        record = bytearray([flags])
+        _write_varint(record, max(0, ms - self._last_ms))
+        record += bytes(axis & 0xFF for axis in changed)
+        if flags & BUTTONS_CHANGED:
+            _write_varint(record, buttons ^ previous_buttons)
+        self._file.write(record)
+        self.records += 1
+        self._last_ms = max(ms, self._last_ms)
+        self._state[controller] = (axes, buttons)
+
+
+class ControllerLog:
+    """
+    A recorded log, read through a memory map so that replaying it costs no more than
+    decoding the records the simulation actually reaches.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a controller log")
+
+    def frames(self) -> Iterator[tuple[float, str, dict[str, Any]]]:
+        """`(seconds, controller, changed values)` for each record, in order"""
+        data = self._data
+        offset = len(MAGIC)
+        ms = 0
+        buttons = [0, 0]
+        while offset < len(data):
+            flags = data[offset]
+            offset += 1
+            delta, offset = _read_varint(data, offset)
+            ms += delta
+            controller = 1 if flags & PARTNER else 0
+            values: dict[str, Any] = {}
+            for i, name in enumerate(AXES):
+                if flags & (1 << i):
+                    value = data[offset]
+                    offset += 1
+                    values[name] = value - 256 if value > 127 else value
+            if flags & BUTTONS_CHANGED:
+                changed, offset = _read_varint(data, offset)
+                buttons[controller] ^= changed
+                for i, name in enumerate(BUTTONS):
+                    if changed & (1 << i):
+                        values[name] = bool(buttons[controller] & (1 << i))
+            yield ms / 1000, CONTROLLERS[controller], values
+
+    @property
+    def duration(self) -> float:
+        return max((seconds for seconds, _, _ in self.frames()), default=0.0)
+
+
+def load_input(path: Path | str) -> ControllerLog | ControllerScript:
+    """A recorded log or a JSON lines script, whichever `path` holds"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            return ControllerLog(path)
+    return ControllerScript.load(path)
@@ -0,0 +1,224 @@
+import ast
+import functools
+import importlib.util
+import sys
+from pathlib import Path
+from typing import Callable
+
+from .clock import SimulationEnd, VirtualClock, to_us
+from .competition import ControllerInput, ControllerScript, Field
+from .devices import install
+from .events import Events
+from .geometry import FieldGeometry
+from .link import Radio
+from .models import DrivetrainModel, MotorModel, Robot
+from .recording import ControllerLog
+from .scheduler import Scheduler
+from .screen import Screen
+from .sensors import SensorBank, SensorMount, TrackingWheel
+from .trajectory import TrajectoryRecorder
+
+VEX_STUB = Path(__file__).parent.parent / "resources" / "vex.py"
+
+# virtual time charged for each device read, so busy-wait loops such as
+# `while motor.is_spinning(): pass` still see the simulation move forward
+READ_COST_US = 10
+
+
+@functools.cache
+def _stub_code():
+    return compile(VEX_STUB.read_text(), str(VEX_STUB), "exec")
+
+
+def load_vex(sim: "Simulation"):
+    """Load a private copy of the `vex` stubs with devices simulated by `sim`"""
+    spec = importlib.util.spec_from_file_location("vex", VEX_STUB)
+    module = importlib.util.module_from_spec(spec)
+    exec(_stub_code(), module.__dict__)
+    install(module, sim)
+    return module
+
+
+class Simulation:
+    """
+    Runs DishPy programs on the host against simulated devices.
+
+    Time only moves when the program waits (or busy-polls a device), and physics
+    advances in fixed `step_ms` increments. `vex.Thread`s run one at a time on a
+    cooperative scheduler, so runs are deterministic and go as fast as the host can
+    execute the program.
+
+    ```python
+    sim = Simulation()
+    sim.run(".out/main.py", duration=15)
+    print(sim.robot.x, sim.robot.y, sim.robot.heading)
+    ```
+    """
+
+    def __init__(
+        self,
+        step_ms: float = 10,
+        x: float = 0.0,
+        y: float = 0.0,
+        heading: float = 0.0,
+        mass: float = 6.8,
+        seed: int = 0,
+    ):
+        self.clock = VirtualClock()
+        self.step_us = to_us(step_ms)
+        self.robot = Robot(x, y, heading, mass)
+        self.motors: list[MotorModel] = []
+        self.drivetrains: list[DrivetrainModel] = []
+        self.devices = []
+        self.controllers: list[Callable[[], bool]] = []
+        self.deadline_us: int | None = None
+        self._next_step_us = self.step_us
+        self._read_cost_us = 0
+        self.scheduler = Scheduler(self)
+        self.events = Events(self)
+        self.field: "Field | None" = None
+        self.enabled = True
+        self.inputs: dict[str, ControllerInput] = {}
+        self.screen = Screen(self)
+        self.geometry = FieldGeometry()
+        # a robot on its own has nobody to link with, see `Alliance`
+        self.radio = Radio()
+        self.sensors = SensorBank(self, seed)
+        # where tracking wheels and other sensors sit, by port number or three-wire port letter
+        self.mounts: dict[int | str, "TrackingWheel | SensorMount"] = {}
+        self.globals: dict = {}  # the running program's module globals
+        self.recorder: TrajectoryRecorder | None = None
+        self.vex = load_vex(self)
+
+    @property
+    def next_step_us(self) -> int:
+        """Clock time of the next physics step"""
+        return self._next_step_us
+
+    def add_motor(self, port: int, max_rpm: int, device=None) -> MotorModel:
+        model = MotorModel(port, max_rpm)
+        model.disabled = not self.enabled
+        self.motors.append(model)
+        if device is not None:
+            self.devices.append(device)
+        return model
+
+    def add_drivetrain(self, model: DrivetrainModel) -> DrivetrainModel:
+        # only the first drivetrain moves the robot, any others spin freely
+        if not self.drivetrains:
+            self.drivetrains.append(model)
+        return model
+
+    def add_controller(self, controller: Callable[[], bool]):
+        """Run `controller` before every physics step until it returns True"""
+        self.controllers.append(controller)
+
+    def controller_input(self, controller: str = "PRIMARY") -> ControllerInput:
+        """The state of the `PRIMARY` or `PARTNER` controller"""
+        if controller not in self.inputs:
+            self.inputs[controller] = ControllerInput()
+        return self.inputs[controller]
+
+    def play(self, script: "ControllerScript | ControllerLog"):
+        """
+        Play back scripted or recorded controller input, starting now. Each frame is only
+        read once the previous one is due, so a long recording is never decoded further
+        than the simulation gets.
+        """
+        start = self.clock.us
+        frames = iter(script.frames())
+
+        def apply(controller, values):
+            self.controller_input(controller).set(**values)
+            schedule()
+
+        def schedule():
+            frame = next(frames, None)
+            if frame is not None:
+                seconds, controller, values = frame
+                self.scheduler.call_at(start + to_us(seconds * 1000), lambda: apply(controller, values))
+
+        schedule()
+
+    def step(self):
+        """Advance the physics by one step"""
+        dt = self.step_us / 1_000_000
+        if self.controllers:
+            self.controllers = [c for c in self.controllers if not c()]
+        now = self.clock.us
+        for motor in self.motors:
+            motor.update(dt, now)
+        for drivetrain in self.drivetrains:
+            drivetrain.update(dt)
+        self.geometry.collide(self.robot, dt)
+        self.sensors.sample(now)
+        if self.recorder is not None:
+            self.recorder.record()
+
+    def advance_to(self, us: int):
+        """Move the clock forward to `us`, running every physics step on the way"""
+        end = self.deadline_us is not None and us >= self.deadline_us
+        if end:
+            us = self.deadline_us
+        while self._next_step_us <= us:
+            self.clock.us = self._next_step_us
+            self.step()
+            self._next_step_us += self.step_us
+        self.clock.us = max(self.clock.us, us)
+        if end:
+            raise SimulationEnd()
+
+    def sleep(self, ms: float):
+        """Block the running thread for `ms` milliseconds of simulated time"""
+        self._read_cost_us = 0
+        self.scheduler.sleep(max(0, to_us(ms)))
+
+    def poll(self):
+        """Charge the cost of a device read to the virtual clock"""
+        self._read_cost_us += READ_COST_US
+        if self._read_cost_us >= 1000:
+            if self.scheduler.profiler is not None:
+                self.scheduler.profiler.charge(self._read_cost_us)
+            self.sleep(self._read_cost_us / 1000)
+
+    def wait_until(self, condition: Callable[[], bool], timeout_ms: float | None = None) -> bool:
+        """Block the running thread until `condition` holds or the timeout passes"""
+        if condition():
+            return True
+        self._read_cost_us = 0
+        if not timeout_ms or timeout_ms <= 0:
+            self.scheduler.block_until(condition)
+            return True
+        deadline = self.clock.us + to_us(timeout_ms)
+        self.scheduler.block_until(lambda: condition() or self.clock.us >= deadline)
+        return condition()
+
+    def run(
+        self, program: Path | str, duration: float | None = None, source: str | ast.Module | None = None
+    ) -> "Simulation":
+        """
+        Run a program, and every thread it starts, until they all finish or `duration`
+        simulated seconds pass. The program's directory is importable, so both
+        `.out/main.py` and a multi-file `src/main.py` work. `source` (code or a syntax
+        tree) runs in place of the file's contents.
+        """
+        program = Path(program).resolve()
+        if source is None:
+            source = program.read_text()
+        code = compile(source, str(program), "exec")
+        if duration is not None:
+            self.deadline_us = self.clock.us + to_us(duration * 1000)
+        previous = sys.modules.get("vex")
+        sys.modules["vex"] = self.vex
+        sys.path.insert(0, str(program.parent))
+        # kept so that a branch of the run (see `snapshot.explore`) can change them
+        self.globals = namespace = {"__name__": "__main__", "__file__": str(program)}
+        try:
+            self.scheduler.run(lambda: exec(code, namespace))
+        finally:
+            sys.path.remove(str(program.parent))
+            if previous is None:
+                sys.modules.pop("vex", None)
+            else:
+                sys.modules["vex"] = previous
+        return self
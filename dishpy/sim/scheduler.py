@@ -0,0 +1,264 @@
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Callable
+
+from .clock import SimulationEnd
+from .profiler import Profiler
+
+
+class TaskExit(BaseException):
+    """Raised inside a task to unwind it when it is stopped or the simulation ends"""
+
+
+class Task:
+    """
+    One `vex.Thread` (or the program's main thread). Each task has an OS thread so
+    it can block anywhere in user code, but only the task holding the scheduler's
+    baton ever runs; all others wait on their own lock.
+
+    A task can also be given several `(target, args)` jobs that should each behave
+    like a thread of their own, such as the callbacks of an event. They run one after
+    the other, and whichever jobs are left over move to a new task as soon as one of
+    them sleeps, which is exactly the order separate threads would have run in.
+    """
+
+    def __init__(self, scheduler: "Scheduler", jobs: deque, name: str):
+        self.scheduler = scheduler
+        self.jobs = jobs
+        self.name = name
+        self.wake_us = 0
+        self.stopped = False
+        self.done = False
+        self._go = threading.Lock()
+        self._go.acquire()
+        self.thread = threading.Thread(target=self._main, name=f"sim:{name}", daemon=True)
+
+    def _main(self):
+        self._go.acquire()
+        self.scheduler._resumed(self)
+        try:
+            while self.jobs and not self.stopped:
+                target, args = self.jobs.popleft()
+                target(*args)
+        except TaskExit:
+            pass
+        except BaseException as e:
+            self.scheduler._fail(e)
+        finally:
+            self.done = True
+            if self.scheduler.profiler is not None:
+                self.scheduler.profiler.suspend(self)
+            self.scheduler._exit(self)
+
+    def resume(self):
+        self._go.release()
+
+    def block(self):
+        self._go.acquire()
+        if self.stopped:
+            raise TaskExit()
+
+
+class Scheduler:
+    """
+    Cooperative scheduler on the simulation's virtual clock.
+
+    Tasks only give up control when they sleep, and the next task to run is always the
+    one with the earliest wake time (ties go to whichever went to sleep first), so
+    thread interleavings are identical on every run. A task that sleeps while nothing
+    else is due before it wakes keeps running without any thread switch.
+
+    Alarms (see `call_at`) share the same priority queue, so timed events cost
+    O(log n) to schedule and nothing at all until they are due.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.tasks: list[Task] = []
+        self.current: Task | None = None
+        self.live = 0
+        self.error: BaseException | None = None
+        self._queue: list[tuple[int, int, Task | Callable[[], None]]] = []
+        self._waiting: list[tuple[Task, Callable[[], bool]]] = []
+        self._seq = itertools.count()
+        self._host = threading.Lock()
+        self._host.acquire()
+        self._ending = False
+        self.profiler: Profiler | None = None
+
+    def spawn(self, target: Callable, args: tuple = (), name: str | None = None) -> Task:
+        """Start a task at the current time; it first runs when the running task sleeps"""
+        return self.start([(target, args)], name or getattr(target, "__name__", "thread"))
+
+    def start(self, jobs, name: str = "event") -> Task:
+        """Start `(target, args)` jobs that each behave as if they had a task of their own"""
+        task = Task(self, deque(jobs), name)
+        self.tasks.append(task)
+        self.live += 1
+        self._push(task, self.sim.clock.us)
+        task.thread.start()
+        return task
+
+    def stop(self, task: Task):
+        """Stop a task; it unwinds with `TaskExit` the next time it is resumed"""
+        if task.done or task.stopped:
+            return
+        task.stopped = True
+        if task is self.current:
+            raise TaskExit()
+        self._push(task, self.sim.clock.us)
+
+    def end(self):
+        """End the run as if its time was up, once the running alarm or task gives up the baton"""
+        self._ending = True
+
+    def call_at(self, us: int, alarm: Callable[[], None]):
+        """
+        Call `alarm` once the clock reaches `us`. Alarms run on the scheduler rather than
+        in a task, so they must not sleep; they start tasks for anything that should.
+        """
+        heapq.heappush(self._queue, (max(us, self.sim.clock.us), next(self._seq), alarm))
+
+    def _push(self, task: Task, wake_us: int):
+        task.wake_us = wake_us
+        heapq.heappush(self._queue, (wake_us, next(self._seq), task))
+
+    def _advance(self, us: int) -> bool:
+        """Advance the simulation, returning False once its time is up"""
+        try:
+            self.sim.advance_to(us)
+            return True
+        except SimulationEnd:
+            self._ending = True
+            return False
+
+    def _dispatch(self):
+        """Hand the baton to the next task that is due, or back to the host when done"""
+        while self._queue and not self._ending:
+            wake, _, task = heapq.heappop(self._queue)
+            if not isinstance(task, Task):
+                if self._advance(wake):
+                    self.current = None
+                    try:
+                        task()
+                    except BaseException as e:
+                        self._fail(e)
+                continue
+            if task.done:
+                continue
+            if not self._advance(wake):
+                break
+            self.current = task
+            task.resume()
+            return
+        self.current = None
+        self._host.release()
+
+    def _exit(self, task: Task):
+        self.live -= 1
+        if self._ending:
+            self._host.release()
+        else:
+            self._dispatch()
+
+    def _fail(self, error: BaseException):
+        if self.error is None:
+            self.error = error
+        self._ending = True
+
+    def _resumed(self, task: Task):
+        if self.profiler is not None:
+            self.profiler.resume(task)
+
+    def _suspending(self, task: Task, wait_us: int | None = None):
+        if self.profiler is not None:
+            self.profiler.suspend(task, wait_us)
+        if self._ending or task.stopped:
+            raise TaskExit()
+        if task.jobs:
+            # the remaining jobs would have started by now if they had their own tasks
+            self.start(task.jobs, task.name)
+            task.jobs = deque()
+
+    def sleep(self, us: int):
+        """Suspend the running task for `us` microseconds of simulated time"""
+        task = self.current
+        if task is None:
+            # outside of any task, e.g. driving the simulation by hand
+            self.sim.advance_to(self.sim.clock.us + us)
+            return
+        self._suspending(task, us)
+        wake = self.sim.clock.us + us
+        if not self._queue or wake < self._queue[0][0]:
+            if self._advance(wake):
+                self._resumed(task)
+                return
+            self.current = None
+            self._host.release()
+        else:
+            self._push(task, wake)
+            self._dispatch()
+        task.block()
+        self._resumed(task)
+
+    def block_until(self, ready: Callable[[], bool]):
+        """
+        Suspend the running task until `ready()` holds after a physics step. Every
+        waiting task is checked by one alarm per step, so waiting on a device costs no
+        thread switches.
+        """
+        task = self.current
+        if task is None:
+            while not ready():
+                self.sim.advance_to(self.sim.next_step_us)
+            return
+        self._suspending(task)
+        if not self._waiting:
+            self.call_at(self.sim.next_step_us, self._check_waiting)
+        self._waiting.append((task, ready))
+        self._dispatch()
+        task.block()
+        self._resumed(task)
+
+    def _check_waiting(self):
+        waiting = []
+        for task, ready in self._waiting:
+            if task.done or task.stopped:
+                continue
+            if ready():
+                self._push(task, self.sim.clock.us)
+            else:
+                waiting.append((task, ready))
+        self._waiting = waiting
+        if waiting:
+            self.call_at(self.sim.next_step_us, self._check_waiting)
+
+    def run(self, target: Callable, name: str = "main"):
+        """Run `target` as the main task until every task finishes or time runs out"""
+        self._ending = False
+        self.spawn(target, name=name)
+        self._dispatch()
+        self.finish()
+
+    def finish(self):
+        """
+        Wait for the tasks to hand the baton back to the host, then unwind whatever is
+        still running. Called from the host thread, or from a new one in a forked process.
+        """
+        self._host.acquire()
+
+        # unwind whatever is still running, one task at a time
+        self._ending = True
+        for task in self.tasks:
+            if not task.done:
+                task.stopped = True
+                self.current = task
+                task.resume()
+                self._host.acquire()
+        self.current = None
+        self.tasks = [task for task in self.tasks if not task.done]
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
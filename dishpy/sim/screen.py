@@ -0,0 +1,515 @@
+"""
+The brain's 480x240 screen: a framebuffer that `Brain.Lcd` draws into, and sinks that
+dump its frames as PNG files or a terminal preview whenever they change.
+
+Drawing calls are recorded rather than rasterized, and only turned into pixels when
+something looks at the screen (a sink, `pixel()` or `save_png()`). Each one also records its bounding box as a dirty
+rectangle, so presenting a frame (or copying the back buffer once a program uses
+`render()`) only looks at what changed since the last one.
+"""
+
+import functools
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import IO, Callable
+
+from .clock import to_us
+
+WIDTH = 480
+HEIGHT = 240
+REFRESH_MS = 1000 / 60
+MAX_DIRTY = 16  # past this many rectangles, they are merged into their bounding box
+MAX_OPS = 1024  # drawing operations a framebuffer holds before rasterizing them anyway
+
+# (cell width, cell height) of each font, in pixels
+FONT_CELLS = {
+    "MONO12": (6, 12),
+    "MONO15": (8, 15),
+    "MONO20": (10, 20),
+    "MONO30": (15, 30),
+    "MONO40": (20, 40),
+    "MONO60": (30, 60),
+    "PROP20": (10, 20),
+    "PROP30": (15, 30),
+    "PROP40": (20, 40),
+    "PROP60": (30, 60),
+    "CJK16": (8, 16),
+}
+
+# classic 5x7 font for ASCII 32-126, one byte per column with the top row in bit 0
+FONT = bytes.fromhex(
+    "0000000000" "00005f0000" "0007000700" "147f147f14" "242a7f2a12" "2313086462" "3649552250" "0005030000"
+    "001c224100" "0041221c00" "082a1c2a08" "08083e0808" "0050300000" "0808080808" "0060600000" "2010080402"
+    "3e5149453e" "00427f4000" "4261514946" "2141454b31" "1814127f10" "2745454539" "3c4a494930" "0171090503"
+    "3649494936" "064949291e" "0036360000" "0056360000" "0814224100" "1414141414" "0041221408" "0201510906"
+    "324979413e" "7e1111117e" "7f49494936" "3e41414122" "7f4141221c" "7f49494941" "7f09090101" "3e41415132"
+    "7f0808087f" "00417f4100" "2040413f01" "7f08142241" "7f40404040" "7f0204027f" "7f0408107f" "3e4141413e"
+    "7f09090906" "3e4151215e" "7f09192946" "4649494931" "01017f0101" "3f4040403f" "1f2040201f" "7f2018207f"
+    "6314081463" "0304780403" "6151494543" "00007f4141" "0204081020" "41417f0000" "0402010204" "4040404040"
+    "0001020400" "2054545478" "7f48444438" "3844444420" "384444487f" "3854545418" "087e090102" "081454543c"
+    "7f08040478" "00447d4000" "2040443d00" "007f102844" "00417f4000" "7c04180478" "7c08040478" "3844444438"
+    "7c14141408" "081414187c" "7c08040408" "4854545420" "043f444020" "3c4040207c" "1c2040201c" "3c4030403c"
+    "4428102844" "0c5050503c" "4464544c44" "0008364100" "00007f0000" "0041360800" "1008081008"
+)
+
+
+@functools.cache
+def glyph_runs(char: str, width: int, height: int) -> tuple[tuple[int, int, int], ...]:
+    """The `(row, start, end)` pixel runs of `char` scaled to a `width` x `height` cell"""
+    code = ord(char) - 32
+    if not 0 <= code < len(FONT) // 5:
+        code = ord("?") - 32
+    columns = FONT[code * 5 : code * 5 + 5]
+    runs = []
+    for py in range(height):
+        # the 5x7 glyph sits in a 6x8 cell, leaving a column and a row of spacing
+        gy = py * 8 // height
+        start = None
+        for px in range(width + 1):
+            gx = px * 6 // width if px < width else 5
+            on = gx < 5 and gy < 7 and columns[gx] >> gy & 1
+            if on and start is None:
+                start = px
+            elif not on and start is not None:
+                runs.append((py, start, px))
+                start = None
+    return tuple(runs)
+
+
+def write_png(path: Path | str, width: int, height: int, rgb: bytes):
+    """Write 8-bit RGB pixels to a PNG file"""
+    stride = width * 3
+    raw = b"".join(b"\x00" + rgb[y * stride : (y + 1) * stride] for y in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+Rect = tuple[int, int, int, int]  # x0, y0, x1, y1 with the end exclusive
+
+# a drawing operation: the Framebuffer method that rasterizes it and its arguments, the
+# rectangle it can touch, and whether it paints every pixel of that rectangle
+Op = tuple[Callable[..., None], Rect, bool, tuple]
+
+
+@functools.lru_cache(maxsize=4096)
+def glyph_rows(char: str, width: int, height: int, pen: bytes | None, fill: bytes) -> tuple[bytes, ...]:
+    """The RGB rows of `char` drawn opaquely in a `width` x `height` cell"""
+    rows = [bytearray(fill * width) for _ in range(height)]
+    if pen is not None:
+        for row, start, end in glyph_runs(char, width, height):
+            rows[row][start * 3 : end * 3] = pen * (end - start)
+    return tuple(bytes(row) for row in rows)
+
+
+def _intersect(a: Rect, b: Rect) -> Rect | None:
+    x0, y0, x1, y1 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+class Framebuffer:
+    """
+    RGB pixels, the drawing operations not rasterized into them yet and the rectangles
+    drawn since they were last taken. Operations are only rasterized when the pixels are
+    read, and one is dropped once a later opaque one covers it.
+
+    A framebuffer with a `base` starts out as a copy of it rather than black.
+    """
+
+    def __init__(self, width: int = WIDTH, height: int = HEIGHT, base: "Framebuffer | None" = None):
+        self.width = width
+        self.height = height
+        self.base = base
+        self._pixels: bytearray | None = None
+        self.ops: list[Op] = []
+        self.dirty: list[Rect] = []
+
+    @property
+    def pixels(self) -> bytearray:
+        self.flush()
+        return self._pixels
+
+    @property
+    def materialized(self) -> bool:
+        return self._pixels is not None
+
+    def flush(self):
+        """Rasterize the pending operations"""
+        if self._pixels is None:
+            if self.base is not None:
+                self._pixels = bytearray(self.base.pixels)
+            else:
+                self._pixels = bytearray(self.width * self.height * 3)
+        ops, self.ops = self.ops, []
+        for rasterize, _, _, args in ops:
+            rasterize(self, *args)
+
+    def forget(self):
+        """Go back to being a copy of `base`, which has caught up with everything drawn here"""
+        self._pixels = None
+        self.ops = []
+
+    def draw(self, op: Op):
+        _, (x0, y0, x1, y1), opaque, _ = op
+        if opaque:
+            self.ops = [
+                other
+                for other in self.ops
+                if not (x0 <= other[1][0] and y0 <= other[1][1] and other[1][2] <= x1 and other[1][3] <= y1)
+            ]
+        self.ops.append(op)
+        if len(self.ops) > MAX_OPS:
+            self.flush()
+
+    def mark(self, rect: Rect):
+        x0, y0, x1, y1 = rect
+        if x0 >= x1 or y0 >= y1:
+            return
+        for i, (a0, b0, a1, b1) in enumerate(self.dirty):
+            if a0 <= x0 and b0 <= y0 and x1 <= a1 and y1 <= b1:
+                return
+            if x0 <= a0 and y0 <= b0 and a1 <= x1 and b1 <= y1:
+                self.dirty[i] = rect
+                return
+        self.dirty.append(rect)
+        if len(self.dirty) > MAX_DIRTY:
+            self.dirty = [
+                (
+                    min(r[0] for r in self.dirty),
+                    min(r[1] for r in self.dirty),
+                    max(r[2] for r in self.dirty),
+                    max(r[3] for r in self.dirty),
+                )
+            ]
+
+    def take_dirty(self) -> list[Rect]:
+        dirty, self.dirty = self.dirty, []
+        return dirty
+
+    def copy_from(self, other: "Framebuffer", rect: Rect):
+        x0, y0, x1, y1 = rect
+        source, pixels = other.pixels, self.pixels
+        for y in range(y0, y1):
+            start = (y * self.width + x0) * 3
+            end = start + (x1 - x0) * 3
+            pixels[start:end] = source[start:end]
+        self.mark(rect)
+
+    # rasterizing, with absolute coordinates and the clip rectangle in effect when drawn
+
+    def fill(self, x0: int, y0: int, x1: int, y1: int, rgb: bytes | None, clip: Rect):
+        rect = _intersect((x0, y0, x1, y1), clip)
+        if rgb is None or rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        row = rgb * (x1 - x0)
+        for y in range(y0, y1):
+            start = (y * self.width + x0) * 3
+            self._pixels[start : start + len(row)] = row
+
+    def line(self, x0: int, y0: int, x1: int, y1: int, pen_width: int, pen: bytes, clip: Rect):
+        low = (pen_width - 1) // 2
+        high = pen_width - low
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+        error = dx + dy
+        while True:
+            self.fill(x0 - low, y0 - low, x0 + high, y0 + high, pen, clip)
+            if x0 == x1 and y0 == y1:
+                break
+            twice = 2 * error
+            if twice >= dy:
+                error += dy
+                x0 += sx
+            if twice <= dx:
+                error += dx
+                y0 += sy
+
+    def rectangle(
+        self, x: int, y: int, width: int, height: int, pen_width: int, pen: bytes | None, fill: bytes | None, clip: Rect
+    ):
+        w = pen_width
+        self.fill(x + w, y + w, x + width - w, y + height - w, fill, clip)
+        if w > 0:
+            self.fill(x, y, x + width, y + w, pen, clip)
+            self.fill(x, y + height - w, x + width, y + height, pen, clip)
+            self.fill(x, y + w, x + w, y + height - w, pen, clip)
+            self.fill(x + width - w, y + w, x + width, y + height - w, pen, clip)
+
+    def circle(self, x: int, y: int, radius: int, pen_width: int, pen: bytes | None, fill: bytes | None, clip: Rect):
+        inner = radius - pen_width
+        for dy in range(-radius, radius + 1):
+            outer = int((radius * radius - dy * dy) ** 0.5)
+            if abs(dy) <= inner:
+                middle = int((inner * inner - dy * dy) ** 0.5)
+                self.fill(x - middle, y + dy, x + middle + 1, y + dy + 1, fill, clip)
+                self.fill(x - outer, y + dy, x - middle, y + dy + 1, pen, clip)
+                self.fill(x + middle + 1, y + dy, x + outer + 1, y + dy + 1, pen, clip)
+            else:
+                self.fill(x - outer, y + dy, x + outer + 1, y + dy + 1, pen, clip)
+
+    def text(self, text: str, x: int, y: int, font: tuple[int, int], pen: bytes | None, fill: bytes | None, clip: Rect):
+        width, height = font
+        rect = _intersect((x, y, x + width * len(text), y + height), clip)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        if fill is None:
+            if pen is not None:
+                for i, char in enumerate(text):
+                    left = x + i * width
+                    for row, start, end in glyph_runs(char, width, height):
+                        self.fill(left + start, y + row, left + end, y + row + 1, pen, clip)
+            return
+        # blit whole rows of the cached glyph bitmaps
+        glyphs = [glyph_rows(char, width, height, pen, fill) for char in text]
+        cut = slice((x0 - x) * 3, (x1 - x) * 3)
+        for py in range(y0, y1):
+            start = (py * self.width + x0) * 3
+            self._pixels[start : start + (x1 - x0) * 3] = b"".join(glyph[py - y] for glyph in glyphs)[cut]
+
+
+class Screen:
+    """
+    The simulated brain screen. `Brain.Lcd` calls land here with colors already turned
+    into RGB bytes (None for transparent) and coordinates relative to the origin.
+
+    Until the program first calls `render()` drawing shows up directly, and changed
+    frames are presented to the `sinks` at the screen's 60Hz refresh. After that the
+    program draws into a back buffer, and each `render()` copies what changed to the
+    screen and presents it.
+
+    Drawing calls are recorded, not rasterized: pixels are only worked out when a sink,
+    `pixel()` or `save_png()` reads them, so a simulation nobody watches spends next to
+    nothing on the screen. With `rasterize=False` (used by batch simulations) the
+    drawing state is tracked but nothing is recorded.
+    """
+
+    def __init__(self, sim, rasterize: bool = True):
+        self.sim = sim
+        self.rasterize = rasterize
+        self.sinks: list[Callable[["Screen", list[Rect]], None]] = []
+        self.frames = 0
+        self._front: Framebuffer | None = None
+        self._back: Framebuffer | None = None
+        self._refresh_pending = False
+        self.row, self.column = 1, 1
+        self.origin = (0, 0)
+        self.font = FONT_CELLS["MONO20"]
+        self.pen_width = 1
+        self.pen: bytes | None = b"\xff\xff\xff"
+        self.fill: bytes | None = b"\x00\x00\x00"
+        self.clip: Rect = (0, 0, WIDTH, HEIGHT)
+
+    @property
+    def front(self) -> Framebuffer:
+        """What is currently on the screen, allocated on first use"""
+        if self._front is None:
+            self._front = Framebuffer()
+        return self._front
+
+    @property
+    def _target(self) -> Framebuffer:
+        return self._back if self._back is not None else self.front
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        """The color on the screen at `x`, `y`"""
+        start = (y * WIDTH + x) * 3
+        return tuple(self.front.pixels[start : start + 3])
+
+    def save_png(self, path: Path | str):
+        write_png(path, WIDTH, HEIGHT, bytes(self.front.pixels))
+
+    # drawing, with coordinates relative to the origin
+
+    def _draw(self, rasterize: Callable[..., None], bounds: Rect, opaque: bool, *args):
+        """Record a drawing call that stays inside `bounds`, relative to the origin, and mark it as changed"""
+        ox, oy = self.origin
+        x0, y0, x1, y1 = bounds
+        rect = _intersect((x0 + ox, y0 + oy, x1 + ox, y1 + oy), self.clip)
+        if rect is None:
+            return
+        self._target.draw((rasterize, rect, opaque, (*args, self.clip)))
+        self._changed(rect)
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, rgb: bytes | None):
+        """Fill from `x0`, `y0` up to `x1`, `y1` (exclusive)"""
+        if rgb is None or not self.rasterize:
+            return
+        ox, oy = self.origin
+        self._draw(Framebuffer.fill, (x0, y0, x1, y1), True, x0 + ox, y0 + oy, x1 + ox, y1 + oy, rgb)
+
+    def draw_pixel(self, x: int, y: int):
+        self.fill_rect(x, y, x + 1, y + 1, self.pen)
+
+    def draw_line(self, x0: int, y0: int, x1: int, y1: int):
+        if self.pen is None or not self.rasterize:
+            return
+        low = (self.pen_width - 1) // 2
+        high = self.pen_width - low
+        ox, oy = self.origin
+        self._draw(
+            Framebuffer.line,
+            (min(x0, x1) - low, min(y0, y1) - low, max(x0, x1) + high, max(y0, y1) + high),
+            False,
+            *(x0 + ox, y0 + oy, x1 + ox, y1 + oy, self.pen_width, self.pen),
+        )
+
+    def draw_rectangle(self, x: int, y: int, width: int, height: int, fill: bytes | None):
+        if not self.rasterize:
+            return
+        ox, oy = self.origin
+        w = self.pen_width
+        if w > 0:
+            # a rectangle narrower than its border still draws all of the border
+            bounds = (min(x, x + width - w), min(y, y + height - w), max(x + width, x + w), max(y + height, y + w))
+            opaque = fill is not None and self.pen is not None and min(width, height) >= 2 * w
+        else:
+            bounds = (x + w, y + w, x + width - w, y + height - w)
+            opaque = fill is not None
+        self._draw(
+            Framebuffer.rectangle,
+            bounds,
+            opaque,
+            *(x + ox, y + oy, width, height, self.pen_width, self.pen, fill),
+        )
+
+    def draw_circle(self, x: int, y: int, radius: int, fill: bytes | None):
+        if not self.rasterize:
+            return
+        ox, oy = self.origin
+        self._draw(
+            Framebuffer.circle,
+            (x - radius, y - radius, x + radius + 1, y + radius + 1),
+            False,
+            *(x + ox, y + oy, radius, self.pen_width, self.pen, fill),
+        )
+
+    def clear(self, rgb: bytes | None):
+        self.fill_rect(-self.origin[0], -self.origin[1], WIDTH - self.origin[0], HEIGHT - self.origin[1], rgb)
+
+    def clear_row(self, row: int, rgb: bytes | None):
+        _, height = self.font
+        top = (row - 1) * height - self.origin[1]
+        self.fill_rect(-self.origin[0], top, WIDTH - self.origin[0], top + height, rgb)
+
+    def text(self, text: str, x: int, y: int, opaque: bool = True):
+        """Draw `text` with its top left corner at `x`, `y`"""
+        if not self.rasterize or not text:
+            return
+        width, height = self.font
+        fill = self.fill if opaque else None
+        ox, oy = self.origin
+        self._draw(
+            Framebuffer.text,
+            (x, y, x + width * len(text), y + height),
+            fill is not None,
+            *(text, x + ox, y + oy, self.font, self.pen, fill),
+        )
+
+    def print(self, text: str):
+        """Print at the cursor, moving it along (and down at each newline)"""
+        width, height = self.font
+        for i, line in enumerate(text.split("\n")):
+            if i:
+                self.row, self.column = self.row + 1, 1
+            # the cursor is in screen coordinates, whatever the origin
+            self.text(
+                line,
+                (self.column - 1) * width - self.origin[0],
+                (self.row - 1) * height - self.origin[1],
+            )
+            self.column += len(line)
+
+    # presenting frames
+
+    def render(self):
+        """Switch to double buffering, or copy what changed in the back buffer to the screen"""
+        if not self.rasterize:
+            return
+        if self._back is None:
+            self._back = Framebuffer(base=self.front)
+        back = self._back
+        if back.materialized:
+            for rect in back.take_dirty():
+                self.front.copy_from(back, rect)
+        else:
+            # the back buffer is still the screen plus what was drawn since, so draw that on the screen too
+            for op in back.ops:
+                self.front.draw(op)
+            for rect in back.take_dirty():
+                self.front.mark(rect)
+        back.forget()
+        self.present()
+
+    def _changed(self, rect: Rect):
+        self._target.mark(rect)
+        if self._back is None and self.sinks and not self._refresh_pending:
+            self._refresh_pending = True
+            refresh = to_us(REFRESH_MS)
+            self.sim.scheduler.call_at((self.sim.clock.us // refresh + 1) * refresh, self._refresh)
+
+    def _refresh(self):
+        self._refresh_pending = False
+        self.present()
+
+    def present(self):
+        """Hand the screen to every sink, if anything on it changed"""
+        dirty = self.front.take_dirty()
+        if not dirty:
+            return
+        self.frames += 1
+        for sink in self.sinks:
+            sink(self, dirty)
+
+
+class PngFrames:
+    """A sink that writes every frame to `directory` as `frame_00001.png`, `frame_00002.png`..."""
+
+    def __init__(self, directory: Path | str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.written: list[tuple[float, Path]] = []
+
+    def __call__(self, screen: Screen, dirty: list[Rect]):
+        path = self.directory / f"frame_{screen.frames:05d}.png"
+        screen.save_png(path)
+        self.written.append((screen.sim.clock.seconds, path))
+
+
+class TerminalPreview:
+    """
+    A sink that prints a downscaled preview of every frame with 24-bit color, each
+    character showing two pixels stacked. Only the characters under the dirty rectangles
+    are sampled again.
+    """
+
+    def __init__(self, stream: IO[str] | None = None, columns: int = 80):
+        self.stream = stream or sys.stdout
+        self.columns = columns
+        self.scale = WIDTH / columns
+        self.rows = int(HEIGHT / self.scale / 2)
+        self._cells: list[list[str]] = [[" "] * columns for _ in range(self.rows)]
+
+    def __call__(self, screen: Screen, dirty: list[Rect]):
+        pixels = screen.front.pixels
+        for x0, y0, x1, y1 in dirty:
+            for row in range(int(y0 / self.scale / 2), min(self.rows, int((y1 - 1) / self.scale / 2) + 1)):
+                top = int((row * 2 + 0.5) * self.scale) * WIDTH
+                bottom = int((row * 2 + 1.5) * self.scale) * WIDTH
+                for column in range(int(x0 / self.scale), min(self.columns, int((x1 - 1) / self.scale) + 1)):
+                    x = int((column + 0.5) * self.scale)
+                    r, g, b = pixels[(top + x) * 3 : (top + x) * 3 + 3]
+                    br, bg, bb = pixels[(bottom + x) * 3 : (bottom + x) * 3 + 3]
+                    self._cells[row][column] = f"\x1b[38;2;{r};{g};{b}m\x1b[48;2;{br};{bg};{bb}m▀"
+        self.stream.write(f"frame {screen.frames} at {screen.sim.clock.seconds:.2f}s\n")
+        self.stream.write("".join("".join(cells) + "\x1b[0m\n" for cells in self._cells))
+        self.stream.flush()
@@ -0,0 +1,155 @@
+"""
+Sensor models: what a sensor reports rather than what is true.
+
+Each reading a sensor makes is the true value plus Gaussian noise and a drift that grows
+over time, rounded to the sensor's resolution. Readings are only made at the sensor's
+own update rate, and each one is reported a little late.
+
+All of a simulation's sensor channels live in one `SensorBank`. Once per physics step it
+samples every channel that is due, a whole update rate's worth of channels at a time, so
+device reads in a tight loop only return the latest published reading.
+"""
+
+import dataclasses
+import random
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+DISTANCE_RANGE = 2000.0  # mm, past which the distance sensor sees nothing
+NOTHING_DETECTED = 9999.0  # mm, what the distance sensor reports when it sees nothing
+
+
+@dataclass(frozen=True)
+class SensorSpec:
+    """How one kind of sensor channel reports, in the units of that channel"""
+
+    noise: float = 0.0  # standard deviation of each reading
+    relative_noise: float = 0.0  # more standard deviation, as a fraction of the reading
+    drift: float = 0.0  # how far readings wander per minute, in a direction picked per sensor
+    latency_ms: float = 0.0  # how old a reading is when it is reported
+    rate_ms: float = 10.0  # time between readings, 0 for every physics step
+    resolution: float = 0.0  # readings are rounded to multiples of this
+
+
+IDEAL = SensorSpec(rate_ms=0)
+
+DEFAULT_SPECS = {
+    "Inertial.rotation": SensorSpec(noise=0.02, drift=0.5, latency_ms=10, rate_ms=10, resolution=0.01),  # deg
+    "Inertial.rate": SensorSpec(noise=0.3, latency_ms=10, rate_ms=10, resolution=0.01),  # deg/s
+    "Gps.position": SensorSpec(noise=5.0, latency_ms=20, rate_ms=20, resolution=0.1),  # mm
+    "Gps.heading": SensorSpec(noise=0.3, latency_ms=20, rate_ms=20, resolution=0.01),  # deg
+    "Rotation": SensorSpec(rate_ms=10, resolution=360 / 4096),  # deg
+    "Encoder": SensorSpec(rate_ms=10, resolution=1.0),  # deg, 360 counts a turn
+    "Distance": SensorSpec(noise=5.0, relative_noise=0.015, latency_ms=33, rate_ms=33, resolution=1.0),  # mm
+    "Optical.hue": SensorSpec(noise=1.0, rate_ms=20, resolution=1.0),  # deg
+    "Optical.brightness": SensorSpec(noise=0.5, rate_ms=20, resolution=0.1),  # percent
+}
+
+
+@dataclass(frozen=True)
+class TrackingWheel:
+    """
+    Where the wheel a `Rotation` sensor or `Encoder` measures is mounted: `offset` mm to
+    the right of the robot's centre (or in front of it for a `sideways` wheel, which rolls
+    as the robot slides or turns). The default is a 2.75" wheel under the centre.
+    """
+
+    diameter: float = 69.85  # mm
+    offset: float = 0.0
+    sideways: bool = False
+    gear_ratio: float = 1.0  # sensor turns per wheel turn
+
+
+@dataclass(frozen=True)
+class SensorMount:
+    """Where a `Distance` or `Optical` sensor sits: mm right of and in front of the robot's
+    centre, facing `angle` degrees clockwise from the robot's front"""
+
+    x: float = 0.0
+    y: float = 0.0
+    angle: float = 0.0
+
+
+class Channel:
+    """One value a sensor reports, such as a gyro's rotation or a GPS's x position"""
+
+    __slots__ = ("truth", "spec", "label", "value", "previous", "_drift", "_start_us", "_history")
+
+    def __init__(self, truth: Callable[[], float], spec: SensorSpec, drift: float, start_us: int, label: str = ""):
+        self.truth = truth
+        self.label = label  # what the channel is called in recordings, like "inertial5.rotation"
+        self.spec = spec
+        self._drift = drift
+        self._start_us = start_us
+        self.value = self.previous = truth()
+        # a reading is published once the readings made after it fill the history
+        delay = round(spec.latency_ms / spec.rate_ms) if spec.rate_ms else 0
+        self._history = deque([self.value] * (delay + 1), maxlen=delay + 1)
+
+
+class SensorBank:
+    """
+    Every sensor channel of a simulation (or of all robots in a batch). Channels are
+    grouped by update rate, and each group is sampled together when it is due, drawing
+    its noise from a shared block of normal samples.
+    """
+
+    NOISE_BLOCK = 4096
+
+    def __init__(self, sim, seed: int = 0):
+        self.sim = sim
+        self.specs = dict(DEFAULT_SPECS)
+        self._random = random.Random(seed)
+        self._groups: dict[int, list[Channel]] = {}
+        self.channels: list[Channel] = []
+        self._due: dict[int, int] = {}
+        self._noise: list[float] = []
+
+    def configure(self, kind: str, **changes):
+        """Change how channels of `kind` (a key of `specs`) created from now on report"""
+        self.specs[kind] = dataclasses.replace(self.specs[kind], **changes)
+
+    def ideal(self):
+        """Make every sensor created from now on report the true value at every step"""
+        self.specs = {kind: IDEAL for kind in self.specs}
+
+    def add(self, kind: str, truth: Callable[[], float], label: str = "") -> Channel:
+        spec = self.specs[kind]
+        drift = spec.drift * self._random.choice((-1, 1)) / 60e6  # per microsecond
+        channel = Channel(truth, spec, drift, self.sim.clock.us, label)
+        rate = max(1, round(spec.rate_ms * 1000))
+        if rate not in self._groups:
+            self._groups[rate] = []
+            self._due[rate] = self.sim.clock.us
+        self._groups[rate].append(channel)
+        self.channels.append(channel)
+        return channel
+
+    def _normals(self, count: int) -> list[float]:
+        if len(self._noise) < count:
+            gauss = self._random.gauss
+            self._noise += [gauss(0.0, 1.0) for _ in range(max(count, self.NOISE_BLOCK))]
+        normals = self._noise[-count:]
+        del self._noise[-count:]
+        return normals
+
+    def sample(self, now_us: int):
+        """Take a reading on every channel that is due by `now_us`"""
+        for rate, channels in self._groups.items():
+            if now_us < self._due[rate]:
+                continue
+            self._due[rate] += rate
+            if self._due[rate] <= now_us:
+                # a rate slower than the physics step can only be kept on average
+                self._due[rate] = now_us + rate
+            for channel, normal in zip(channels, self._normals(len(channels))):
+                spec = channel.spec
+                value = channel.truth()
+                value += channel._drift * (now_us - channel._start_us)
+                value += (spec.noise + spec.relative_noise * abs(value)) * normal
+                if spec.resolution:
+                    value = round(value / spec.resolution) * spec.resolution
+                channel._history.append(value)
+                channel.previous = channel.value
+                channel.value = channel._history[0]
@@ -0,0 +1,174 @@
+"""
+Branching runs: simulate the part that many variations of a run share once, then
+continue each variation from where it leaves off.
+
+The whole state of a simulation (clock, scheduler queues, devices, physics and the
+program's own globals) lives in the host process, so the cheapest snapshot of it is
+`os.fork`: each branch is a copy-on-write child process that picks the run up exactly
+where the parent stopped. Program threads are OS threads that a fork doesn't copy, so a
+run is only forked while the program has at most one thread alive. Otherwise (or where
+there is no `os.fork`) each branch is simulated from the start, which gives the same
+results because runs are deterministic, just without the saving.
+"""
+
+import os
+import pickle
+import sys
+import threading
+import warnings
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from .clock import to_us
+from .runtime import Simulation
+
+
+@dataclass
+class Outcome:
+    """How one branch ended: what `result` returned for it, or the error it raised"""
+
+    value: Any = None
+    error: str | None = None
+    forked: bool = False  # whether the branch was forked rather than simulated from the start
+
+
+def pose(sim: Simulation) -> dict[str, float]:
+    robot = sim.robot
+    return {"x": robot.x, "y": robot.y, "heading": robot.heading}
+
+
+def _error(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def can_fork(sim: Simulation) -> bool:
+    """Whether a running simulation can be forked right now"""
+    return hasattr(os, "fork") and sim.scheduler.live <= 1
+
+
+def explore(
+    make_sim: Callable[[], Simulation],
+    program: Path | str,
+    at: float,
+    branches: list[Callable[[Simulation], None]],
+    duration: float | None = None,
+    result: Callable[[Simulation], Any] = pose,
+    jobs: int | None = None,
+    on_result: Callable[[int, Outcome], None] | None = None,
+) -> list[Outcome]:
+    """
+    Run `program` on `make_sim()` for `at` seconds, then call each of `branches` on a
+    copy of the simulation and run that copy on to the end. Returns the `Outcome` of
+    each branch, in order, and also passes each one to `on_result` as soon as it is in.
+
+    ```python
+    def gain(kp):
+        return lambda sim: sim.globals.update(KP=kp)
+
+    outcomes = explore(Simulation, ".out/main.py", 10, [gain(kp) for kp in (0.5, 1, 2)], duration=15)
+    ```
+
+    At most `jobs` (by default one per CPU core) forked branches run at a time.
+    """
+    if at <= 0:
+        raise ValueError("branches have to start after the run does")
+    outcomes: list[Outcome | None] = [None] * len(branches)
+
+    def finish(index: int, outcome: Outcome):
+        outcomes[index] = outcome
+        if on_result is not None:
+            on_result(index, outcome)
+
+    sim = make_sim()
+    forked = False
+
+    def branch_here():
+        nonlocal forked
+        if not can_fork(sim):
+            return
+        forked = True
+        if _fork(sim, branches, result, jobs or os.cpu_count() or 1, finish):
+            return  # this is a branch, which carries on with the run
+        # every branch has finished, and the trunk has nothing left to do
+        sim.scheduler.end()
+
+    sim.scheduler.call_at(sim.clock.us + to_us(at * 1000), branch_here)
+    sim.run(program, duration)
+    if not forked:
+        for index, branch in enumerate(branches):
+            finish(index, _replay(make_sim, program, at, branch, duration, result))
+    return outcomes
+
+
+def _fork(sim, branches, result, jobs: int, finish) -> bool:
+    """Fork a child per branch, returning True in a child and once they are all done otherwise"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    running = deque()
+    for index, branch in enumerate(branches):
+        if len(running) >= jobs:
+            finish(running[0][0], _collect(*running.popleft()[1:]))
+        read, write = os.pipe()
+        with warnings.catch_warnings():
+            # the other threads are parked on locks and only the running one is needed
+            warnings.simplefilter("ignore", DeprecationWarning)
+            pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            for _, _, fd in running:
+                os.close(fd)
+            _become_branch(sim, branch, result, write)
+            return True
+        os.close(write)
+        running.append((index, pid, read))
+    while running:
+        finish(running[0][0], _collect(*running.popleft()[1:]))
+    return False
+
+
+def _become_branch(sim, branch, result, fd: int):
+    def report(outcome: Outcome):
+        try:
+            data = pickle.dumps(outcome)
+        except Exception as e:
+            data = pickle.dumps(Outcome(error=_error(e), forked=True))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        sys.stdout.flush()
+        os._exit(0)
+
+    def finish():
+        # stands in for the host thread, which the fork left behind
+        try:
+            sim.scheduler.finish()
+            outcome = Outcome(result(sim), forked=True)
+        except Exception as e:
+            outcome = Outcome(error=_error(e), forked=True)
+        report(outcome)
+
+    try:
+        branch(sim)
+    except Exception as e:
+        report(Outcome(error=_error(e), forked=True))
+    threading.Thread(target=finish, daemon=True).start()
+
+
+def _collect(pid: int, fd: int) -> Outcome:
+    with os.fdopen(fd, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    if not data:
+        return Outcome(error="branch exited without a result", forked=True)
+    return pickle.loads(data)
+
+
+def _replay(make_sim, program, at: float, branch, duration, result) -> Outcome:
+    sim = make_sim()
+    sim.scheduler.call_at(sim.clock.us + to_us(at * 1000), lambda: branch(sim))
+    try:
+        sim.run(program, duration)
+        return Outcome(result(sim))
+    except Exception as e:
+        return Outcome(error=_error(e))
@@ -0,0 +1,279 @@
+"""
+Parameter sweeps: run a project's built program with many values of its module-level
+constants (PID gains, speeds, timings...) on every CPU core, streaming one JSON line per
+run to disk.
+
+Values are substituted into the combined `.out/main.py`, so every simulated program is
+exactly what would be uploaded with those constants.
+"""
+
+import ast
+import contextlib
+import copy
+import functools
+import heapq
+import importlib.util
+import io
+import itertools
+import json
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from ..amalgamator import combined_name
+from .runtime import Simulation
+from .snapshot import Outcome, explore
+
+
+def _number(text: str) -> Any:
+    value = ast.literal_eval(text.strip())
+    if not isinstance(value, (int, float, str, bool)):
+        raise ValueError(f"{text!r} is not a number, string or boolean")
+    return value
+
+
+def _split(spec: str) -> tuple[str, str]:
+    name, sep, values = spec.partition("=")
+    if not sep or not name.strip():
+        raise ValueError(f"expected NAME=VALUES, got {spec!r}")
+    return name.strip(), values
+
+
+def parse_grid(spec: str) -> tuple[str, list]:
+    """`KP=0.1,0.2,0.5` for a list of values, or `KP=0:1:11` for `count` evenly spaced values"""
+    name, values = _split(spec)
+    if ":" in values:
+        start, stop, count = values.split(":")
+        start, stop, count = float(start), float(stop), int(count)
+        if count < 2:
+            return name, [start]
+        return name, [start + (stop - start) * i / (count - 1) for i in range(count)]
+    return name, [_number(value) for value in values.split(",")]
+
+
+def parse_range(spec: str) -> tuple[str, tuple[float, float]]:
+    """`KD=0:0.5` to draw values uniformly between the bounds"""
+    name, values = _split(spec)
+    low, high = values.split(":")
+    return name, (float(low), float(high))
+
+
+def load_score(spec: str) -> Callable[[Simulation], Any]:
+    """Load `path/to/file.py:function` (the function defaults to `score`)"""
+    path, _, function = spec.partition(":")
+    module_spec = importlib.util.spec_from_file_location("dishpy_sweep_score", path)
+    if module_spec is None:
+        raise ValueError(f"cannot load a scoring function from {path}")
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return getattr(module, function or "score")
+
+
+class ParameterizedProgram:
+    """A built program whose module-level constants can be replaced before each run"""
+
+    def __init__(self, source: str, names: list[str]):
+        self.tree = ast.parse(source)
+        self.slots: dict[str, list[int]] = {name: [] for name in names}
+        for i, node in enumerate(self.tree.body):
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, ast.AnnAssign):
+                targets = [node.target]
+            else:
+                continue
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id in self.slots:
+                    self.slots[target.id].append(i)
+        missing = [name for name, slots in self.slots.items() if not slots]
+        if missing:
+            raise ValueError(f"{', '.join(missing)} not assigned at the top level of the program")
+
+    def with_values(self, values: dict[str, Any]) -> ast.Module:
+        tree = copy.copy(self.tree)
+        tree.body = list(tree.body)
+        for name, value in values.items():
+            for i in self.slots[name]:
+                node = copy.copy(tree.body[i])
+                node.value = ast.Constant(value)
+                tree.body[i] = node
+        return ast.fix_missing_locations(tree)
+
+
+# per-process state of the pool's workers, set up once by `_start_worker`
+_worker: dict[str, Any] = {}
+
+
+def _start_worker(program, source, names, score, duration, step_ms):
+    _worker.update(
+        program=program,
+        parameterized=ParameterizedProgram(source, list(names.values())),
+        names=names,
+        score=load_score(score) if score else None,
+        duration=duration,
+        step_ms=step_ms,
+    )
+
+
+def _run_chunk(chunk: list[tuple[int, dict[str, Any]]]) -> list[dict[str, Any]]:
+    w = _worker
+    rows = []
+    for index, params in chunk:
+        row: dict[str, Any] = {"index": index, "params": params}
+        tree = w["parameterized"].with_values({w["names"][k]: v for k, v in params.items()})
+        try:
+            # the programs' own output would only interleave across processes
+            with contextlib.redirect_stdout(io.StringIO()):
+                sim = Simulation(step_ms=w["step_ms"]).run(w["program"], w["duration"], tree)
+                score = w["score"](sim) if w["score"] else None
+            robot = sim.robot
+            row.update(score=score, x=robot.x, y=robot.y, heading=robot.heading)
+        except Exception as e:
+            row.update(score=None, error=f"{type(e).__name__}: {e}")
+        rows.append(row)
+    return rows
+
+
+class Sweep:
+    """
+    Every combination of the `grid` values, each with `samples` random draws of the
+    `ranges` parameters if there are any.
+    """
+
+    def __init__(
+        self,
+        program: Path,
+        src: Path,
+        grid: dict[str, list] | None = None,
+        ranges: dict[str, tuple[float, float]] | None = None,
+        samples: int = 100,
+        seed: int = 0,
+    ):
+        self.program = Path(program)
+        self.grid = grid or {}
+        self.ranges = ranges or {}
+        self.samples = samples if self.ranges else 1
+        self.seed = seed
+        self.names = {name: combined_name(name, src) for name in (*self.grid, *self.ranges)}
+        if not self.names:
+            raise ValueError("nothing to sweep, give at least one parameter")
+
+    def __len__(self) -> int:
+        total = self.samples
+        for values in self.grid.values():
+            total *= len(values)
+        return total
+
+    def points(self) -> Iterator[dict[str, Any]]:
+        rng = random.Random(self.seed)
+        for combination in itertools.product(*self.grid.values()):
+            point = dict(zip(self.grid, combination))
+            for _ in range(self.samples):
+                draws = {name: rng.uniform(low, high) for name, (low, high) in self.ranges.items()}
+                yield point | draws
+
+    def run(
+        self,
+        output: Path,
+        score: str | None = None,
+        duration: float = 15.0,
+        step_ms: float = 10.0,
+        jobs: int | None = None,
+        chunk_size: int | None = None,
+        best: int = 5,
+        on_progress: Callable[[int], None] | None = None,
+        fork_at: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Run every point on `jobs` processes, appending each result to `output` as a JSON
+        line as soon as its chunk finishes. Returns the `best` rows by (highest) score.
+
+        With `fork_at`, the program runs once with the constants it was built with for
+        that many seconds, and each point then changes them and continues from there
+        (see `snapshot.explore`), so only constants read after that point matter.
+        """
+        # fail here rather than in every worker
+        source = self.program.read_text()
+        ParameterizedProgram(source, list(self.names.values()))
+        if score:
+            load_score(score)
+        jobs = jobs or os.cpu_count() or 1
+        top: list[tuple[float, int, dict]] = []
+        done = 0
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with output.open("w", encoding="utf-8") as f:
+
+            def record(rows: list[dict[str, Any]]):
+                nonlocal done
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+                    if isinstance(row["score"], (int, float)):
+                        entry = (row["score"], -row["index"], row)
+                        if len(top) < best:
+                            heapq.heappush(top, entry)
+                        else:
+                            heapq.heappushpop(top, entry)
+                f.flush()
+                done += len(rows)
+                if on_progress:
+                    on_progress(done)
+
+            if fork_at is None:
+                self._run_pool(source, score, duration, step_ms, jobs, chunk_size, record)
+            else:
+                self._run_branches(score, duration, step_ms, jobs, fork_at, record)
+        return [row for _, _, row in sorted(top, key=lambda entry: entry[:2], reverse=True)]
+
+    def _run_pool(self, source, score, duration, step_ms, jobs, chunk_size, record):
+        chunk_size = chunk_size or max(1, min(64, len(self) // (jobs * 4)))
+        chunks = _chunks(enumerate(self.points()), chunk_size)
+        initargs = (self.program, source, self.names, score, duration, step_ms)
+        with ProcessPoolExecutor(jobs, initializer=_start_worker, initargs=initargs) as pool:
+            # only a few chunks are queued at a time, so huge sweeps never sit in memory
+            pending = {pool.submit(_run_chunk, chunk) for chunk in itertools.islice(chunks, jobs * 2)}
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+                    pending |= {pool.submit(_run_chunk, chunk) for chunk in itertools.islice(chunks, 1)}
+
+    def _run_branches(self, score, duration, step_ms, jobs, fork_at, record):
+        points = list(self.points())
+        scorer = load_score(score) if score else None
+
+        def result(sim: Simulation) -> dict[str, Any]:
+            robot = sim.robot
+            return {"score": scorer(sim) if scorer else None, "x": robot.x, "y": robot.y, "heading": robot.heading}
+
+        def on_result(index: int, outcome: Outcome):
+            row: dict[str, Any] = {"index": index, "params": points[index]}
+            row.update(outcome.value if outcome.error is None else {"score": None, "error": outcome.error})
+            record([row])
+
+        branches = [
+            functools.partial(_set_constants, {self.names[name]: value for name, value in point.items()})
+            for point in points
+        ]
+        # the programs' own output would only interleave across processes
+        with contextlib.redirect_stdout(io.StringIO()):
+            explore(
+                functools.partial(Simulation, step_ms=step_ms),
+                self.program,
+                fork_at,
+                branches,
+                duration,
+                result,
+                jobs,
+                on_result,
+            )
+
+
+def _set_constants(values: dict[str, Any], sim: Simulation):
+    sim.globals.update(values)
+
+
+def _chunks(items, size: int) -> Iterator[list]:
+    while chunk := list(itertools.islice(items, size)):
+        yield chunk
@@ -0,0 +1,176 @@
+"""
+Recording what happens at every physics step: the robot's pose, what each motor is
+told and does, and what each sensor reports.
+
+Each value is a column, a `.npy` file preallocated for the whole run and written in
+place through a memory map, so recording costs a few stores per step however long the
+run is and never builds up Python objects. The columns are whatever the program set up
+by its first physics step: every motor and every sensor channel it created. Analysis
+loads them without copying:
+
+```python
+import numpy as np
+
+x = np.load(".out/trajectory/x.npy", mmap_mode="r")
+```
+"""
+
+import json
+import mmap
+from pathlib import Path
+from typing import Callable
+
+HEADER_BYTES = 128  # long enough for any shape we write, so it never moves
+MOTOR_FIELDS = ("command", "voltage", "velocity", "position", "current")
+UNITS = {
+    "time": "us",
+    "x": "mm",
+    "y": "mm",
+    "heading": "deg",
+    "command": "rpm",
+    "voltage": "V",
+    "velocity": "rpm",
+    "position": "deg",
+    "current": "A",
+    "rotation": "deg",
+    "rate": "dps",
+    "distance": "mm",
+    "hue": "deg",
+    "brightness": "%",
+}
+
+
+def _header(dtype: str, length: int) -> bytes:
+    text = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({length},), }}"
+    header = b"\x93NUMPY\x01\x00" + (HEADER_BYTES - 10).to_bytes(2, "little")
+    return header + text.ljust(HEADER_BYTES - 10 - 1).encode() + b"\n"
+
+
+class NpyColumn:
+    """One column file: a `.npy` array of float64 (or int64 for `time`) in a memory map"""
+
+    def __init__(self, path: Path, length: int, typecode: str = "d"):
+        self.path = path
+        self.typecode = typecode
+        self.length = 0
+        self._file = path.open("w+b")
+        self._map = None
+        self.resize(length)
+
+    @property
+    def dtype(self) -> str:
+        return "<i8" if self.typecode == "q" else "<f8"
+
+    def resize(self, length: int):
+        """Make room for exactly `length` values, keeping the ones already written"""
+        if self._map is not None:
+            self.values.release()
+            self._map.close()
+        self.length = length
+        self._file.seek(0)
+        self._file.write(_header(self.dtype, length))
+        self._file.truncate(HEADER_BYTES + length * 8)
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.values = memoryview(self._map)[HEADER_BYTES:].cast(self.typecode)
+
+    def close(self, length: int):
+        """Unmap the file, cutting it down to its first `length` values"""
+        self.resize(length)
+        self.values.release()
+        self._map.close()
+        self._file.close()
+
+
+def schema(sim) -> dict[str, Callable[[], float]]:
+    """The columns a simulation can record right now, and how to read each one"""
+    robot = sim.robot
+    columns: dict[str, Callable[[], float]] = {
+        "time": lambda: sim.clock.us,
+        "x": lambda: robot.x,
+        "y": lambda: robot.y,
+        "heading": lambda: robot.heading,
+    }
+    for motor in sim.motors:
+        for field in MOTOR_FIELDS:
+            columns[f"motor{motor.port + 1}.{field}"] = lambda motor=motor, field=field: getattr(motor, field)
+    for channel in sim.sensors.channels:
+        if channel.label:
+            columns[channel.label] = lambda channel=channel: channel.value
+    return columns
+
+
+class TrajectoryRecorder:
+    """
+    Records a simulation into `directory` at every physics step, from the first step
+    on. Columns are allocated for `steps` values, by default enough for the run's
+    duration, and grow if the run goes on longer.
+
+    ```python
+    sim = Simulation()
+    sim.recorder = TrajectoryRecorder(sim, ".out/trajectory")
+    sim.run(".out/main.py", duration=15)
+    sim.recorder.close()
+    ```
+    """
+
+    def __init__(self, sim, directory: Path | str, steps: int | None = None):
+        self.sim = sim
+        self.directory = Path(directory)
+        self.steps = steps
+        self.rows = 0
+        self.readers: list[Callable[[], float]] = []
+        self.columns: list[NpyColumn] = []
+
+    def _start(self):
+        columns = schema(self.sim)
+        self.readers = list(columns.values())
+        if self.steps is None:
+            deadline = self.sim.deadline_us
+            self.steps = 1024 if deadline is None else (deadline - self.sim.clock.us) // self.sim.step_us + 1
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.columns = [
+            NpyColumn(self.directory / f"{name}.npy", self.steps, "q" if name == "time" else "d") for name in columns
+        ]
+        (self.directory / "schema.json").write_text(
+            json.dumps(
+                {
+                    "step_us": self.sim.step_us,
+                    "columns": {
+                        name: {"dtype": column.dtype, "unit": UNITS.get(name.rpartition(".")[2], "")}
+                        for name, column in zip(columns, self.columns)
+                    },
+                },
+                indent=2,
+            )
+        )
+
+    def record(self):
+        """Add the current values as a row, called by the simulation after each step"""
+        if not self.columns:
+            self._start()
+        if self.rows == self.steps:
+            self.steps *= 2
+            for column in self.columns:
+                column.resize(self.steps)
+        i = self.rows
+        for column, read in zip(self.columns, self.readers):
+            column.values[i] = read()
+        self.rows += 1
+
+    def close(self):
+        """Finish the files, cutting them down to the steps actually recorded"""
+        for column in self.columns:
+            column.close(self.rows)
+        self.columns = []
+
+
+def load(directory: Path | str) -> dict:
+    """Every column of a recording as a read-only NumPy array mapped from its file"""
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("loading recordings needs NumPy, install it with `pip install 'dishpy[sim]'`") from e
+    directory = Path(directory)
+    names = json.loads((directory / "schema.json").read_text())["columns"]
+    return {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in names}
@@ -133,3 +133,17 @@ def run_vexcom(*args):
 
     vexcom_exe = get_vexcom_executable()
     return subprocess.run([str(vexcom_exe)] + list(args))
+
+
+def open_vexcom(*args) -> subprocess.Popen:
+    """Start vexcom with its output piped back to us as text, installing it if necessary"""
+    if not is_vexcom_installed():
+        install_vexcom()
+
+    if not is_vexcom_installed():
+        raise RuntimeError("VEXcom installation failed")
+
+    vexcom_exe = get_vexcom_executable()
+    return subprocess.Popen(
+        [str(vexcom_exe)] + list(args), stdout=subprocess.PIPE, text=True, errors="replace", bufsize=1
+    )
@@ -0,0 +1,65 @@
+import ast
+
+import pytest
+
+from dishpy.optimizer import inline_functions
+
+
+def run(source: str) -> dict:
+    namespace = {}
+    exec(source, namespace)
+    return namespace
+
+
+def inlined(source: str) -> tuple[str, dict[str, int]]:
+    tree = ast.parse(source)
+    calls = inline_functions(tree)
+    return ast.unparse(tree), calls
+
+
+def test_unused_argument_that_raises_is_kept():
+    source = """
+def first(a, b):
+    return a
+
+d = {}
+try:
+    result = first(1, d["missing"])
+except KeyError:
+    result = "raised"
+"""
+    code, calls = inlined(source)
+    assert calls == {}
+    assert run(code)["result"] == run(source)["result"] == "raised"
+
+
+def test_argument_that_changes_a_global_runs_first():
+    source = """
+total = 1
+
+def side():
+    global total
+    total += 5
+    return 0
+
+def add2(a, b):
+    return b + a
+
+result = add2(side(), total)
+"""
+    code, calls = inlined(source)
+    assert calls == {}
+    assert run(code)["result"] == run(source)["result"] == 6
+
+
+@pytest.mark.parametrize(
+    "call, expected",
+    [
+        ("clamp(speed, -100, 100)", "max(-100, min(speed, 100))"),
+        ("clamp(read(), -100, 100)", "max(-100, min(read(), 100))"),
+    ],
+)
+def test_arguments_used_once_in_order_are_inlined(call, expected):
+    code, calls = inlined(f"def clamp(v, lo, hi):\n    return max(lo, min(v, hi))\nx = {call}")
+    assert calls == {"clamp": 1}
+    assert code.splitlines()[-1] == f"x = {expected}"
@@ -0,0 +1,23 @@
+import pytest
+
+from dishpy.precompute import precompute
+
+
+@pytest.mark.parametrize(
+    "marker_import, marker",
+    [
+        ("from dishpy import build_time", "build_time"),
+        ("from dishpy import build_time as bt", "bt"),
+        ("import dishpy", "dishpy.build_time"),
+        ("import dishpy as d", "d.build_time"),
+    ],
+)
+def test_marker_can_be_imported_any_way(marker_import, marker):
+    code = f"@{marker}\ndef table():\n    return [i * i for i in range(4)]\nT = {marker}(sum(range(5)))"
+    ((_, computed),) = precompute([("main.py", code)], [], [marker_import])
+    assert computed == "table = [0, 1, 4, 9]\nT = 10"
+
+
+def test_other_dishpy_names_fail_the_build():
+    with pytest.raises(ValueError, match="Project from dishpy"):
+        precompute([("main.py", "p = Project")], [], ["from dishpy import Project"])